@@ -0,0 +1,220 @@
+"""Benchmark do caminho de voz (audio_frontend -> Vosk -> texto).
+
+Mede, contra o modelo em config.MODEL_DIR (ou --model):
+  - tempo de carga do modelo e RSS adicionado;
+  - latencia por frase (p50/p95/p99) e fator de tempo real (RTF =
+    tempo de processamento / duracao do audio), variando o tamanho do clipe
+    (1-10 s) e a taxa de amostragem (16 kHz mono; 44.1/48 kHz estereo, como
+    o navegador manda), com 1 worker e um pedido por vez (sem espera na fila);
+  - vazao e latencia (incluindo a fila) com 1-32 decodes simultaneos (pool do
+    recognition_service) para dimensionar RECOGNITION_WORKERS.
+
+O audio vem de ref.mp3 / voz.mp3 convertidos com ffmpeg quando ele existe;
+sem ffmpeg, usa um sinal sintetico parecido com fala (rajadas moduladas a
+~4 Hz), para o benchmark rodar em qualquer maquina. O relatorio sai em JSON
+(--out) para comparar execucoes e pegar regressoes.
+
+Uso:
+    python _bench_decoder.py
+    python _bench_decoder.py --quick --out bench.json
+    python _bench_decoder.py --lengths 1 5 --rates 16000 --concurrency 1 4 16 --reps 20
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np  # noqa: E402
+
+import config  # noqa: E402
+import model_registry  # noqa: E402
+import recognition_service  # noqa: E402
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCES = ("ref.mp3", "voz.mp3")
+
+
+# ---------------------------------------------------------------------------
+# Audio de teste
+# ---------------------------------------------------------------------------
+
+def _ffmpeg_pcm(path: str, rate: int) -> np.ndarray:
+    out = subprocess.run(
+        ["ffmpeg", "-v", "error", "-i", path, "-ac", "1", "-ar", str(rate), "-f", "s16le", "-"],
+        check=True, capture_output=True,
+    ).stdout
+    return np.frombuffer(out, dtype="<i2").astype(np.float32)
+
+
+def _synthetic_pcm(seconds: float, rate: int, seed: int = 0) -> np.ndarray:
+    """Sinal com cara de fala: harmonicos + ruido, em rajadas de ~4 Hz."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * rate)) / rate
+    f0 = 120 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / rate
+    voice = sum(np.sin(k * phase) / k for k in range(1, 8))
+    envelope = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) ** 0.5
+    x = voice * envelope + 0.05 * rng.standard_normal(len(t))
+    return (x / np.abs(x).max() * 12000).astype(np.float32)
+
+
+def source_audio(rate: int, seconds: float) -> tuple[np.ndarray, str]:
+    """PCM mono de `seconds` na taxa pedida + de onde veio."""
+    n = int(seconds * rate)
+    if shutil.which("ffmpeg"):
+        for name in SOURCES:
+            path = os.path.join(BASE_DIR, name)
+            if os.path.exists(path):
+                pcm = _ffmpeg_pcm(path, rate)
+                if len(pcm):
+                    return np.resize(pcm, n), name  # repete o audio se for curto
+    return _synthetic_pcm(seconds, rate), "sintetico"
+
+
+def make_wav(pcm: np.ndarray, rate: int, channels: int) -> bytes:
+    frames = np.repeat(pcm[:, None], channels, axis=1) if channels > 1 else pcm
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(np.clip(frames, -32768, 32767).astype("<i2").tobytes())
+    return buf.getvalue()
+
+
+# ---------------------------------------------------------------------------
+# Medicoes
+# ---------------------------------------------------------------------------
+
+def _percentiles(values: list[float], digits: int = 1) -> dict:
+    if not values:
+        return {}
+    v = np.asarray(values)
+    out = {f"p{p}": round(float(np.percentile(v, p)), digits) for p in (50, 95, 99)}
+    out.update(mean=round(float(v.mean()), digits), max=round(float(v.max()), digits))
+    return out
+
+
+def run_latency(service: recognition_service.RecognitionService, wav_bytes: bytes,
+                duration_s: float, reps: int) -> dict:
+    """Um pedido por vez (sem fila): latencia por frase e RTF."""
+    latencies, rtfs = [], []
+    for _ in range(reps):
+        started = time.perf_counter()
+        res = service.recognize_result(wav_bytes)
+        latencies.append((time.perf_counter() - started) * 1000)
+        processing_ms = res["decode_ms"] + res["frontend"]["frontend_ms"]
+        rtfs.append(processing_ms / 1000 / duration_s)
+    return {"latency_ms": _percentiles(latencies), "rtf": _percentiles(rtfs, digits=3)}
+
+
+def run_case(service: recognition_service.RecognitionService, wav_bytes: bytes,
+             duration_s: float, reps: int) -> dict:
+    """Dispara `reps` pedidos de uma vez no pool e mede latencia (com fila), RTF e vazao."""
+    t0 = time.perf_counter()
+    submitted = [(time.perf_counter(), service.recognize(wav_bytes)) for _ in range(reps)]
+    latencies, rtfs = [], []
+    for started, fut in submitted:
+        res = fut.result()
+        latencies.append((time.perf_counter() - started) * 1000)
+        processing_ms = res["decode_ms"] + res["frontend"]["frontend_ms"]
+        rtfs.append(processing_ms / 1000 / duration_s)
+    wall = time.perf_counter() - t0
+    return {
+        "latency_ms": _percentiles(latencies),
+        "rtf": _percentiles(rtfs, digits=3),
+        "throughput_utt_s": round(reps / wall, 2),
+        "throughput_audio_x": round(reps * duration_s / wall, 2),  # segundos de audio por segundo
+    }
+
+
+def _package_version(name: str) -> str:
+    try:
+        from importlib.metadata import version
+        return version(name)
+    except Exception:
+        return "?"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark do reconhecimento de voz.")
+    parser.add_argument("--model", default=config.MODEL_DIR)
+    parser.add_argument("--lengths", type=float, nargs="+", default=[1, 3, 5, 10])
+    parser.add_argument("--rates", type=int, nargs="+", default=[16000, 44100, 48000])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--reps", type=int, default=10, help="pedidos por caso (x concorrencia na varredura de concorrencia)")
+    parser.add_argument("--quick", action="store_true", help="varredura reduzida (1/5 s, 16/48 kHz, 1/4 workers, 3 reps)")
+    parser.add_argument("--out", default="bench_decoder.json")
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.lengths, args.rates, args.concurrency, args.reps = [1, 5], [16000, 48000], [1, 4], 3
+
+    # Carga do modelo (mesmo caminho do app)
+    config.MODEL_DIR = args.model
+    model_registry.preload(background=False)
+    load = model_registry.stats()
+    if model_registry.get_model() is None:
+        print(f"[ERR] modelo Vosk indisponivel em {args.model}: {load.get('error') or load['state']}")
+        return 1
+    model = model_registry.get_model()
+    print(f"📦 modelo carregado em {load['load_seconds']}s (+{load['rss_model_mb']} MB RSS)")
+
+    report = {
+        "env": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "vosk": _package_version("vosk"),
+            "model_dir": args.model,
+            "grammar": False,
+        },
+        "model_load": load,
+        "latency": [],
+        "concurrency": [],
+    }
+
+    # 1) Latencia x tamanho do clipe x taxa, 1 worker
+    single = recognition_service.RecognitionService(model, workers=1, max_queue=1, timeout=3600)
+    for rate in args.rates:
+        channels = 1 if rate == 16000 else 2
+        for seconds in args.lengths:
+            pcm, source = source_audio(rate, seconds)
+            wav_bytes = make_wav(pcm, rate, channels)
+            single.recognize_result(wav_bytes)  # aquece o recognizer
+            case = {"rate": rate, "channels": channels, "seconds": seconds, "source": source,
+                    **run_latency(single, wav_bytes, seconds, args.reps)}
+            report["latency"].append(case)
+            print(f"⏱️ {rate:>5} Hz x{channels} {seconds:>4}s  p50={case['latency_ms']['p50']}ms "
+                  f"p95={case['latency_ms']['p95']}ms  RTF p50={case['rtf']['p50']}")
+
+    # 2) Concorrencia: clipe de 5 s a 48 kHz estereo (o caso tipico do navegador)
+    rate, seconds = max(args.rates), 5.0
+    pcm, source = source_audio(rate, seconds)
+    wav_bytes = make_wav(pcm, rate, 1 if rate == 16000 else 2)
+    for workers in args.concurrency:
+        reps = args.reps * workers
+        service = recognition_service.RecognitionService(model, workers=workers, max_queue=reps, timeout=3600)
+        case = {"workers": workers, "requests": reps, "rate": rate, "seconds": seconds, "source": source,
+                **run_case(service, wav_bytes, seconds, reps)}
+        service.close()
+        report["concurrency"].append(case)
+        print(f"🧵 {workers:>2} workers  {case['throughput_utt_s']} frases/s  "
+              f"({case['throughput_audio_x']}x tempo real)  p95={case['latency_ms']['p95']}ms")
+
+    single.close()
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✅ Relatorio: {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
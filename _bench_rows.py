@@ -0,0 +1,144 @@
+"""Microbenchmark do decoder de linhas Turso (legado x DictRow com __slots__).
+
+Gera um resultado Hrana sintetico de 10k linhas (formato de /v2/pipeline) e
+mede, para cada decoder:
+  - fetchall           : so materializar as linhas (listagem que nao e lida)
+  - fetchall + 1 coluna: ler uma coluna de cada linha
+  - dict(row)          : converter tudo para dict (como o painel admin faz;
+                         no decoder novo via database._row_dict)
+e a memoria alocada por tracemalloc no fetchall + leitura de 1 coluna.
+
+Uso: python _bench_rows.py [n_linhas] [repeticoes]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import database  # noqa: E402
+
+
+# ---------------------------------------------------------------------------
+# Decoder legado (copia do codigo anterior, para comparacao)
+# ---------------------------------------------------------------------------
+class LegacyDictRow(dict):
+    def __init__(self, columns, values):
+        super().__init__(zip(columns, values))
+        self._values = list(values)
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self._values[key]
+        return super().__getitem__(key)
+
+
+class LegacyResultSet:
+    def __init__(self, result_dict):
+        self.columns = [c["name"] for c in result_dict.get("cols", [])]
+        self.rows = []
+        for r in result_dict.get("rows", []):
+            parsed_row = []
+            for cell in r:
+                if isinstance(cell, dict) and "type" in cell:
+                    t = cell["type"]
+                    v = cell.get("value")
+                    if t == "integer":
+                        parsed_row.append(int(v) if v is not None else None)
+                    elif t == "float":
+                        parsed_row.append(float(v) if v is not None else None)
+                    elif t == "null":
+                        parsed_row.append(None)
+                    else:
+                        parsed_row.append(v)
+                else:
+                    parsed_row.append(cell)
+            self.rows.append(tuple(parsed_row))
+
+
+def legacy_fetchall(result_dict):
+    rs = LegacyResultSet(result_dict)
+    cols = list(rs.columns)
+    return [LegacyDictRow(cols, r) for r in rs.rows]
+
+
+def new_fetchall(result_dict):
+    return database.TursoCursor(database.CustomResultSet(result_dict)).fetchall()
+
+
+# ---------------------------------------------------------------------------
+# Dados sinteticos (parecidos com get_all_users_detailed)
+# ---------------------------------------------------------------------------
+def make_result(n: int) -> dict:
+    cols = ["id", "username", "name", "email", "is_admin", "is_premium",
+            "plan_type", "premium_until", "xp", "last_payment_id"]
+    rows = []
+    for i in range(n):
+        rows.append([
+            {"type": "integer", "value": str(i)},
+            {"type": "text", "value": f"user{i}"},
+            {"type": "text", "value": f"Aluno {i}"},
+            {"type": "text", "value": f"user{i}@mail.com"},
+            {"type": "integer", "value": "0"},
+            {"type": "integer", "value": str(i % 2)},
+            {"type": "text", "value": "mensal"},
+            {"type": "null"} if i % 3 else {"type": "text", "value": "2026-12-31"},
+            {"type": "integer", "value": str(i * 10)},
+            {"type": "null"},
+        ])
+    return {"cols": [{"name": c} for c in cols], "rows": rows}
+
+
+def _best(fn, reps: int) -> float:
+    best = float("inf")
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def _alloc(fn) -> float:
+    tracemalloc.start()
+    keep = fn()  # noqa: F841 — mantem as linhas vivas na medicao
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024 / 1024
+
+
+def main(n: int = 10_000, reps: int = 5):
+    data = make_result(n)
+    cases = {
+        "fetchall": {
+            "legado": lambda: legacy_fetchall(data),
+            "novo": lambda: new_fetchall(data),
+        },
+        "fetchall + 1 coluna": {
+            "legado": lambda: [r["xp"] for r in legacy_fetchall(data)],
+            "novo": lambda: [r["xp"] for r in new_fetchall(data)],
+        },
+        "dict(row)": {
+            "legado": lambda: [dict(r) for r in legacy_fetchall(data)],
+            "novo": lambda: [database._row_dict(r) for r in new_fetchall(data)],
+        },
+    }
+
+    # Sanidade: os dois decoders devem produzir os mesmos valores
+    assert [dict(r) for r in legacy_fetchall(data)] == [dict(r) for r in new_fetchall(data)]
+
+    print(f"{n} linhas x {len(data['cols'])} colunas, melhor de {reps}")
+    print(f"{'caso':<22}{'legado (ms)':>14}{'novo (ms)':>12}{'ganho':>9}")
+    for case, fns in cases.items():
+        old_ms = _best(fns["legado"], reps)
+        new_ms = _best(fns["novo"], reps)
+        print(f"{case:<22}{old_ms:>14.1f}{new_ms:>12.1f}{old_ms / new_ms:>8.1f}x")
+
+    old_mb = _alloc(lambda: [(r, r["xp"]) for r in legacy_fetchall(data)])
+    new_mb = _alloc(lambda: [(r, r["xp"]) for r in new_fetchall(data)])
+    print(f"{'pico de memoria (MB)':<22}{old_mb:>14.1f}{new_mb:>12.1f}{old_mb / new_mb:>8.1f}x")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
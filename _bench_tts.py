@@ -0,0 +1,96 @@
+"""Benchmark dos backends de TTS (tts.py).
+
+Para cada backend disponivel, sintetiza frases reais de um modulo e mede:
+  - latencia por frase (p50/p95/max) com 1 thread;
+  - vazao (frases/s) com N sinteses simultaneas (como o prerender_tts usa);
+  - tamanho medio do audio gerado.
+
+Backends indisponiveis (sem rede para o gtts, sem espeak-ng/ffmpeg para o
+espeak) aparecem como erro no relatorio em vez de derrubar o benchmark.
+
+Uso:
+    python _bench_tts.py
+    python _bench_tts.py --backends espeak --phrases 40 --workers 1 4 8
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+import config  # noqa: E402
+import tts  # noqa: E402
+
+
+def _percentiles(values: list[float]) -> dict:
+    v = np.asarray(values)
+    return {f"p{p}": round(float(np.percentile(v, p)), 1) for p in (50, 95)} | {"max": round(float(v.max()), 1)}
+
+
+def load_phrases(arquivo: str, n: int) -> list[str]:
+    df = pd.read_csv(os.path.join(config.CSV_DIR, arquivo), on_bad_lines='skip', encoding='utf-8')
+    return df["en"].dropna().astype(str).head(n).tolist()
+
+
+def bench_backend(name: str, phrases: list[str], workers: list[int], fmt: str) -> dict:
+    backend = tts.get_backend(name)
+    if not backend.available():
+        return {"backend": name, "error": "indisponivel neste ambiente"}
+    try:
+        tts.synthesize(phrases[0], backend=name, fmt=fmt)  # aquece (import, conexao)
+    except tts.TTSError as e:
+        return {"backend": name, "error": str(e)}
+
+    latencies, sizes = [], []
+    for text in phrases:
+        t0 = time.perf_counter()
+        sizes.append(len(tts.synthesize(text, backend=name, fmt=fmt)))
+        latencies.append((time.perf_counter() - t0) * 1000)
+    out = {"backend": name, "format": fmt, "phrases": len(phrases),
+           "latency_ms": _percentiles(latencies), "mean_bytes": int(np.mean(sizes)), "throughput": []}
+
+    for n in workers:
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=n) as pool:
+            list(pool.map(lambda t: tts.synthesize(t, backend=name, fmt=fmt), phrases))
+        wall = time.perf_counter() - t0
+        out["throughput"].append({"workers": n, "phrases_s": round(len(phrases) / wall, 2)})
+    return out
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark dos backends de TTS.")
+    parser.add_argument("--backends", nargs="+", default=sorted(tts.BACKENDS))
+    parser.add_argument("--csv", default="aeroporto.csv")
+    parser.add_argument("--phrases", type=int, default=20)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--format", default="mp3", choices=["mp3", "wav"])
+    parser.add_argument("--out", default="bench_tts.json")
+    args = parser.parse_args(argv)
+
+    phrases = load_phrases(args.csv, args.phrases)
+    report = []
+    for name in args.backends:
+        res = bench_backend(name, phrases, args.workers, args.format)
+        report.append(res)
+        if "error" in res:
+            print(f"[ERR] {name}: {res['error']}")
+            continue
+        tput = "  ".join(f"{t['workers']}w={t['phrases_s']}/s" for t in res["throughput"])
+        print(f"🔊 {name:<7} p50={res['latency_ms']['p50']}ms p95={res['latency_ms']['p95']}ms  "
+              f"{res['mean_bytes'] // 1024} KB/frase  {tput}")
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✅ Relatorio: {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
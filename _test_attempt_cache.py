@@ -0,0 +1,94 @@
+"""Testes do cache de tentativas (attempt_cache): reconhece 1x e da XP 1x por gravacao."""
+import types
+
+import pytest
+
+import attempt_cache
+import config
+
+PHRASE = "I am doing well"
+
+
+@pytest.fixture
+def session(monkeypatch):
+    """session_state de uma sessao (dict puro no lugar do st.session_state)."""
+    state = {}
+    monkeypatch.setattr(attempt_cache, "st", types.SimpleNamespace(session_state=state))
+    return state
+
+
+class Recognizer:
+    """Conta as chamadas; devolve `result` (None = modelo ausente / fila cheia)."""
+
+    def __init__(self, text=PHRASE.lower()):
+        self.calls = 0
+        self.result = {"text": text, "words": [{"word": w, "conf": 0.9} for w in text.split()],
+                       "raw": {"text": text}, "pcm": b"\0" * 1000}
+
+    def __call__(self):
+        self.calls += 1
+        return self.result
+
+
+def _rerun(state, gravacao, recognize, phrase=PHRASE):
+    """O que a aula faz a cada rerun: avalia e so da XP se `claim` liberar."""
+    entry = attempt_cache.evaluate(gravacao, phrase, recognize)
+    if entry is not None and attempt_cache.claim(entry):
+        state["xp"] = state.get("xp", 0) + entry["evaluation"]["correct_count"]
+    return entry
+
+
+def test_reruns_recognize_once_and_award_xp_once(session):
+    rec = Recognizer()
+    gravacao = {"bytes": b"take-1"}
+    for _ in range(5):   # toast, expander, botao... o widget continua com a mesma gravacao
+        entry = _rerun(session, gravacao, rec)
+    assert rec.calls == 1
+    assert entry["evaluation"]["score"] == 100
+    assert session["xp"] == len(PHRASE.split())
+
+
+def test_new_recording_is_a_new_attempt(session):
+    rec = Recognizer()
+    _rerun(session, {"bytes": b"take-1"}, rec)
+    _rerun(session, {"bytes": b"take-2"}, rec)
+    _rerun(session, {"bytes": b"take-2"}, rec)
+    assert rec.calls == 2
+    assert session["xp"] == 2 * len(PHRASE.split())
+
+
+def test_same_audio_for_another_phrase_is_another_attempt(session):
+    rec = Recognizer()
+    _rerun(session, {"bytes": b"take-1"}, rec)
+    entry = _rerun(session, {"bytes": b"take-1"}, rec, phrase="Hi how are you")
+    assert rec.calls == 2
+    assert entry["evaluation"]["score"] < 100
+
+
+def test_failed_recognition_is_not_cached_nor_claimed(session):
+    rec = Recognizer()
+    rec.result = None
+    assert _rerun(session, {"bytes": b"take-1"}, rec) is None
+    rec.result = Recognizer().result            # modelo voltou: o proximo rerun tenta de novo
+    assert _rerun(session, {"bytes": b"take-1"}, rec) is not None
+    assert rec.calls == 2 and session["xp"] == len(PHRASE.split())
+
+
+def test_no_recording_does_nothing(session):
+    rec = Recognizer()
+    assert _rerun(session, None, rec) is None
+    assert rec.calls == 0 and "xp" not in session
+
+
+def test_cache_is_bounded_lru_and_light(session, monkeypatch):
+    monkeypatch.setattr(config, "ATTEMPT_CACHE_SIZE", 2)
+    rec = Recognizer()
+    for take in (b"a", b"b"):
+        _rerun(session, {"bytes": take}, rec)
+    _rerun(session, {"bytes": b"a"}, rec)       # "a" vira a mais recente
+    _rerun(session, {"bytes": b"c"}, rec)       # sai "b"
+    cache = session[attempt_cache._STATE_KEY]
+    keys = {attempt_cache.attempt_key(t, PHRASE) for t in (b"a", b"c")}
+    assert set(cache) == keys
+    # Sem audio nem resultado bruto guardados na sessao
+    assert all(set(e["recognized"]) == {"text", "words"} for e in cache.values())
@@ -0,0 +1,93 @@
+"""Testes do audio_frontend: reamostragem inteira x em pedacos (captura ao vivo) e corte de silencio."""
+import io
+import wave
+
+import numpy as np
+import pytest
+
+import audio_frontend
+import config
+
+
+def _chunked(x: np.ndarray, src: int, dst: int, sizes) -> np.ndarray:
+    r = audio_frontend.StreamResampler(src, dst)
+    out, i = [], 0
+    for n in sizes:
+        out.append(r.push(x[i:i + n]))
+        i += n
+    return np.concatenate(out + [r.finish()])
+
+
+@pytest.mark.parametrize("src", [48000, 44100, 8000, 16000])
+def test_stream_resampler_matches_whole_signal(src):
+    rng = np.random.default_rng(1)
+    x = (rng.standard_normal(src) * 3000).astype(np.float32)   # 1 s de ruido
+    whole = audio_frontend.resample(x, src, 16000)
+    frame = src * 20 // 1000                                     # quadros de 20 ms (WebRTC)
+    chunked = _chunked(x, src, 16000, [frame] * (len(x) // frame + 1))
+    assert len(chunked) == len(whole)
+    np.testing.assert_allclose(chunked, whole, atol=0.01)
+
+
+def test_stream_resampler_irregular_chunks():
+    rng = np.random.default_rng(2)
+    x = (rng.standard_normal(48000) * 3000).astype(np.float32)
+    sizes = rng.integers(1, 2000, size=200)
+    x = x[:int(sizes.sum())]
+    np.testing.assert_allclose(_chunked(x, 48000, 16000, sizes),
+                               audio_frontend.resample(x, 48000, 16000), atol=0.01)
+
+
+def test_per_frame_resample_differs_at_the_seams():
+    # O que o StreamResampler evita: filtrar cada quadro sozinho zera as bordas
+    rng = np.random.default_rng(3)
+    x = (rng.standard_normal(48000) * 3000).astype(np.float32)
+    whole = audio_frontend.resample(x, 48000, 16000)
+    naive = np.concatenate([audio_frontend.resample(x[i:i + 960], 48000, 16000)
+                            for i in range(0, len(x), 960)])
+    assert np.abs(naive - whole).max() > 100
+
+
+RATE = 16000
+
+
+def _take(seconds_noise, speech_amp, seconds_speech=1.0, noise_amp=10.0, seed=3):
+    """Ruido de fundo + tom "de fala" + ruido, como float32 na escala do PCM16."""
+    rng = np.random.default_rng(seed)
+
+    def noise(seconds):
+        return rng.standard_normal(int(seconds * RATE)) * noise_amp
+
+    t = np.arange(int(seconds_speech * RATE)) / RATE
+    speech = speech_amp * np.sin(2 * np.pi * 220 * t) + noise(seconds_speech)
+    return np.concatenate([noise(seconds_noise), speech, noise(seconds_noise)]).astype(np.float32)
+
+
+def _wav_bytes(x):
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(RATE)
+        w.writeframes(audio_frontend.to_pcm16(x))
+    return buf.getvalue()
+
+
+@pytest.mark.parametrize("speech_amp", [140.0, 3000.0])   # RMS ~100 (abaixo de AUDIO_VAD_MIN_RMS) e normal
+def test_trim_keeps_speech_and_cuts_the_ends(speech_amp):
+    x = _take(1.0, speech_amp)
+    y = audio_frontend.trim_silence(x, RATE, pad_ms=200)
+    assert 1.0 * RATE <= len(y) <= 1.5 * RATE
+
+
+def test_quiet_speech_is_not_reported_as_silence():
+    assert config.AUDIO_VAD_MIN_RMS > 140 / np.sqrt(2)
+    pcm, _, report = audio_frontend.prepare(_wav_bytes(_take(0.5, 140.0)))
+    assert len(pcm) > 0 and report["samples_out"] > 0.9 * RATE
+
+
+@pytest.mark.parametrize("noise_amp", [0.0, 10.0, 60.0])
+def test_quiet_background_only_is_silence(noise_amp):
+    x = _take(1.0, 0.0, noise_amp=noise_amp)
+    assert len(audio_frontend.trim_silence(x, RATE, pad_ms=200)) == 0
+
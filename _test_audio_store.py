@@ -0,0 +1,129 @@
+"""Testes do cache de audio enderecado por conteudo (audio_store)."""
+import json
+import os
+
+import pytest
+
+import audio_store
+import config
+import tts
+
+KB = 1024
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Store vazio em tmp_path (o modulo guarda o estado em globais)."""
+    audios = tmp_path / "audios"
+    audios.mkdir()
+    monkeypatch.setattr(config, "AUDIOS_DIR", str(audios))
+    monkeypatch.setattr(config, "AUDIO_STORE_DIR", str(audios / "store"))
+    monkeypatch.setattr(config, "CSV_DIR", str(tmp_path))
+    monkeypatch.setattr(config, "MODULOS", [])
+    monkeypatch.setattr(config, "AUDIO_STORE_MAX_MB", 1.0)
+    monkeypatch.setattr(config, "TTS_BACKEND", "gtts")
+    for name, value in [("_index", None), ("_bytes", 0), ("_pinned_bytes", 0), ("_pins", frozenset()),
+                        ("_pins_mtime", None), ("_dirty", False), ("_pending", set()),
+                        ("_counters", {"hits": 0, "misses": 0, "puts": 0, "evictions": 0, "errors": 0})]:
+        monkeypatch.setattr(audio_store, name, value)
+    return audios
+
+
+def _limit_kb(monkeypatch, kb):
+    monkeypatch.setattr(config, "AUDIO_STORE_MAX_MB", kb * KB / (1024 * 1024))
+
+
+def test_key_ignores_spacing_but_not_voice_or_text():
+    base = audio_store.key_for("Hi  how are you")
+    assert base == audio_store.key_for(" Hi how\tare you ")
+    assert base != audio_store.key_for("Hi how are you?")
+    assert base != audio_store.key_for("Hi how are you", rate=0.8)
+    assert base != audio_store.key_for("Hi how are you", backend="espeak")
+
+
+def test_same_phrase_is_synthesized_once(store, monkeypatch):
+    calls = []
+    monkeypatch.setattr(tts, "synthesize", lambda text, **kw: calls.append(text) or b"ID3" + b"x" * 10)
+    first = audio_store.get_or_create("I am doing well")
+    assert audio_store.get_or_create("I am  doing well") == first
+    assert calls == ["I am doing well"]
+    assert audio_store.stats()["hits"] == 1
+
+
+def test_lru_evicts_least_recently_used(store, monkeypatch):
+    _limit_kb(monkeypatch, 3)
+    for k in "abc":
+        audio_store.put(k * 40, b"x" * KB)
+    assert audio_store.lookup("a" * 40)          # "a" vira o mais recente
+    audio_store.put("d" * 40, b"x" * KB)         # estoura: sai "b"
+    assert audio_store.lookup("b" * 40) is None
+    assert all(audio_store.lookup(k * 40) for k in "acd")
+    assert not os.path.exists(audio_store.path_for("b" * 40))
+    stats = audio_store.stats()
+    assert stats["evictions"] == 1 and stats["bytes"] == 3 * KB
+
+
+def test_pinned_audio_is_never_evicted_nor_counted(store, monkeypatch):
+    _limit_kb(monkeypatch, 2)
+    audio_store.set_pins(["p" * 40])
+    audio_store.put("p" * 40, b"x" * 4 * KB)     # maior que o limite sozinho
+    for k in "abc":
+        audio_store.put(k * 40, b"x" * KB)
+    assert audio_store.lookup("p" * 40)
+    stats = audio_store.stats()
+    assert stats["pinned_bytes"] == 4 * KB and stats["bytes"] == 2 * KB
+
+
+def test_pins_written_by_another_process_are_picked_up(store, monkeypatch):
+    _limit_kb(monkeypatch, 1)
+    audio_store.put("p" * 40, b"x" * KB)
+    with open(os.path.join(config.AUDIO_STORE_DIR, audio_store.PINNED_NAME), "w") as f:
+        json.dump(["p" * 40], f)
+    audio_store.put("a" * 40, b"x" * KB)
+    assert audio_store.lookup("p" * 40)
+
+
+def test_files_without_index_entry_are_adopted(store):
+    os.makedirs(config.AUDIO_STORE_DIR)
+    with open(audio_store.path_for("e" * 40), "wb") as f:
+        f.write(b"x" * 100)
+    with open(os.path.join(config.AUDIO_STORE_DIR, "nao_e_chave.mp3"), "wb") as f:
+        f.write(b"x")
+    assert audio_store.lookup("e" * 40) == audio_store.path_for("e" * 40)
+    stats = audio_store.stats()
+    assert stats["entries"] == 1 and stats["bytes"] == 100
+
+
+def test_index_keeps_lru_order_across_restarts(store, monkeypatch):
+    for k in "ab":
+        audio_store.put(k * 40, b"x" * KB)
+    audio_store.lookup("a" * 40)
+    audio_store.flush()
+    monkeypatch.setattr(audio_store, "_index", None)   # "reinicia" o processo
+    _limit_kb(monkeypatch, 2)
+    audio_store.put("c" * 40, b"x" * KB)
+    assert audio_store.lookup("b" * 40) is None
+    assert audio_store.lookup("a" * 40)
+
+
+def test_file_deleted_outside_is_a_miss_and_frees_bytes(store):
+    path = audio_store.put("a" * 40, b"x" * KB)
+    os.remove(path)
+    assert audio_store.lookup("a" * 40) is None
+    assert audio_store.stats()["bytes"] == 0
+
+
+def test_legacy_module_files_are_imported(store, tmp_path, monkeypatch):
+    (tmp_path / "mini.csv").write_text("id,en,pt,img\nmini_A1_001,Hi how are you,Oi,\n", encoding="utf-8")
+    monkeypatch.setattr(config, "MODULOS", [("Mini", "mini.csv", "")])
+    (store / "mini_mini_A1_001.mp3").write_bytes(b"aula")
+    (store / "prova_mini_A1_001.mp3").write_bytes(b"prova")   # mesma frase: fica onde esta
+    (store / "outro_999.mp3").write_bytes(b"?")                 # id desconhecido: ignorado
+
+    key = audio_store.key_for("Hi how are you", backend="gtts")
+    path = audio_store.lookup(key)
+    assert path is not None
+    with open(path, "rb") as f:
+        assert f.read() in (b"aula", b"prova")
+    assert len(set(os.listdir(store)) - {"store", "outro_999.mp3"}) == 1   # so um dos dois foi movido
+    assert audio_store.stats()["entries"] == 1
@@ -0,0 +1,42 @@
+"""Testes do model_registry: o arquivo de pronto so existe com o modelo carregado."""
+import sys
+import types
+
+import pytest
+
+import model_registry
+
+
+@pytest.fixture
+def ready_file(tmp_path, monkeypatch):
+    path = tmp_path / "model_ready"
+    monkeypatch.setattr(model_registry.config, "MODEL_READY_FILE", str(path))
+    monkeypatch.setattr(model_registry, "_model", None)
+    monkeypatch.setattr(model_registry, "_stats", dict(model_registry._stats))
+    return path
+
+
+def test_missing_model_does_not_report_ready(ready_file, tmp_path, monkeypatch):
+    monkeypatch.setattr(model_registry.config, "MODEL_DIR", str(tmp_path / "nao-existe"))
+    model_registry._load()
+    assert model_registry.state() == "missing"
+    assert not ready_file.exists()
+
+
+def test_failed_load_does_not_report_ready(ready_file, tmp_path, monkeypatch):
+    def broken(path):
+        raise RuntimeError("modelo corrompido")
+
+    monkeypatch.setattr(model_registry.config, "MODEL_DIR", str(tmp_path))
+    monkeypatch.setitem(sys.modules, "vosk", types.SimpleNamespace(Model=broken))
+    model_registry._load()
+    assert model_registry.state() == "error"
+    assert not ready_file.exists()
+
+
+def test_loaded_model_writes_ready_file(ready_file, tmp_path, monkeypatch):
+    monkeypatch.setattr(model_registry.config, "MODEL_DIR", str(tmp_path))
+    monkeypatch.setitem(sys.modules, "vosk", types.SimpleNamespace(Model=lambda path: object()))
+    model_registry._load()
+    assert model_registry.state() == "ready"
+    assert '"state": "ready"' in ready_file.read_text()
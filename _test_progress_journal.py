@@ -0,0 +1,109 @@
+"""Testes do journal write-behind (progress_journal.py) sem banco real."""
+import os
+import threading
+
+import pytest
+
+import database
+import progress_journal
+from progress_journal import ProgressJournal
+
+_PROGRESS = {"pagina": "aula", "arquivo_atual": "escola.csv", "indice": 7,
+             "xp": 120, "porc_atual": 80, "tentativa": 2}
+
+
+class _Conn:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def _db_down(conn, stmts):
+    raise RuntimeError("banco fora")
+
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    """Journal temporario usado por record_attempt; o banco falha ate o teste trocar
+    database._execute_batch (as escritas ficam no journal)."""
+    monkeypatch.setattr(database, "_get_conn", lambda: _Conn())
+    monkeypatch.setattr(database, "_execute_batch", _db_down)
+    j = ProgressJournal(str(tmp_path / "j.wal"), interval=3600, threshold=10_000)
+    monkeypatch.setattr(progress_journal, "get_journal", lambda: j)
+    yield j
+    j.close()
+
+
+def test_failed_flush_then_record_xp_keeps_progress_row(journal, monkeypatch):
+    u = "ana"
+    journal.record(u, {"op": "progress", "data": dict(_PROGRESS)})
+
+    def failing(conn, stmts):
+        journal.record(u, {"op": "xp", "xp": 500})  # edicao do admin durante a descarga
+        _db_down(conn, stmts)
+
+    monkeypatch.setattr(database, "_execute_batch", failing)
+    assert journal.flush() is False
+    written = []
+    monkeypatch.setattr(database, "_execute_batch", lambda conn, stmts: written.extend(stmts))
+    assert journal.flush() is True
+
+    sqls = [sql for sql, _ in written]
+    assert len(sqls) == 1 and "pagina" in sqls[0] and "ON CONFLICT(username) DO UPDATE SET xp" not in sqls[0]
+    params = written[0][1]
+    assert params[:4] == ("ana", "aula", "escola.csv", 7)
+    assert params[4] == 500  # o XP novo por cima da linha antiga
+
+
+def test_record_attempt_is_one_fsync(journal, monkeypatch):
+    fsyncs = []
+    monkeypatch.setattr(os, "fsync", fsyncs.append)
+    progress_journal.record_attempt("ana", lesson_score=90, **_PROGRESS)
+    assert len(fsyncs) == 1
+    state = journal.overlay("ana")[-1]
+    assert state["progress"]["indice"] == 7
+    assert state["modules"] == {"escola.csv": 7}
+    assert state["scores"] == {("escola.csv", 7): 90}
+
+
+def test_replay_after_restart(journal):
+    progress_journal.record_attempt("ana", **_PROGRESS)
+    journal.close()  # banco fora: a escrita fica no disco e o flock e solto
+    j2 = ProgressJournal(journal.path, interval=3600)
+    try:
+        assert j2.overlay("ana")[-1]["progress"]["xp"] == 120
+    finally:
+        j2.close()
+
+
+def test_journal_has_a_single_owner(journal):
+    with pytest.raises(progress_journal.JournalLocked):
+        ProgressJournal(journal.path, interval=3600)
+
+
+def test_each_process_gets_its_own_slot(tmp_path, monkeypatch):
+    base = str(tmp_path / "p.wal")
+    monkeypatch.setattr(progress_journal.config, "PROGRESS_JOURNAL_PATH", base)
+    monkeypatch.setattr(progress_journal, "_journal", None)
+    other = ProgressJournal(base, interval=3600)  # "outro processo" com o slot 0
+    try:
+        mine = progress_journal.get_journal()
+        assert mine.path == base + ".1"
+        mine.close()
+    finally:
+        other.close()
+
+
+def test_delete_user_cancels_queued_word_errors():
+    database.init_db()
+    gate = threading.Event()
+    database._deferred_writer.submit(gate.wait)   # ocupa a thread de escrita
+    fut = database.record_word_errors_async("ana", ["go"], ["i", "go"])
+    try:
+        assert database.delete_user("ana")
+    finally:
+        gate.set()
+    assert fut.cancelled()
+    assert "ana" not in database._deferred_by_user
@@ -0,0 +1,87 @@
+"""Teste de planos de consulta: nenhuma consulta quente pode varrer a tabela inteira.
+
+Roda as funcoes reais de database.py contra o SQLite temporario do conftest,
+captura os SELECTs executados (trace callback) e passa cada um por EXPLAIN
+QUERY PLAN.
+Um `SCAN <tabela>` sem indice reprova o teste, exceto nas listagens completas
+do painel admin, onde a varredura da tabela principal e esperada.
+"""
+import re
+
+import database
+
+# Varreduras permitidas: (funcao, tabela/alias) — listagens de todas as linhas
+ALLOWED_SCANS = {
+    ("get_all_users", "users"),
+}
+
+_SCAN_RE = re.compile(r"^SCAN (\w+)(?: AS (\w+))?$")
+
+
+def _hot_queries():
+    """Executa as consultas quentes; retorna [(funcao, sql_expandido)]."""
+    conn = database._get_conn()
+    captured: list[str] = []
+    conn.set_trace_callback(captured.append)
+
+    calls = [
+        ("get_user", lambda: database.get_user("ana")),
+        ("is_user_admin", lambda: database.is_user_admin("ana")),
+        ("load_progress", lambda: database.load_progress("ana")),
+        ("load_module_progress", lambda: database.load_module_progress("ana", "escola.csv")),
+        ("load_all_module_progress", lambda: database.load_all_module_progress("ana")),
+        ("load_lesson_score", lambda: database.load_lesson_score("ana", "escola.csv", 1)),
+        ("get_weak_words", lambda: database.get_weak_words("ana")),
+        ("get_student_analytics", lambda: database.get_student_analytics("ana")),
+        ("get_expiring_users", lambda: database.get_expiring_users(3)),
+        ("get_all_payments", lambda: database.get_all_payments()),
+        ("get_all_users_detailed", lambda: database.get_all_users_detailed()),
+        ("get_all_users", lambda: database.get_all_users()),
+        ("get_user_credentials", lambda: database.get_user_credentials("Ana")),
+        ("get_users_page", lambda: database.get_users_page(10, 50)),
+        ("get_payments_page", lambda: database.get_payments_page(None, 50)),
+        ("get_payments_page", lambda: database.get_payments_page(("2026-01-01", 10), 50)),
+    ]
+    queries = []
+    for name, call in calls:
+        captured.clear()
+        call()
+        queries += [(name, sql) for sql in captured if sql.lstrip().upper().startswith("SELECT")]
+    conn.set_trace_callback(None)
+    return queries
+
+
+def _full_scans(name: str, sql: str) -> list[str]:
+    conn = database._get_conn()
+    bad = []
+    for row in conn.execute("EXPLAIN QUERY PLAN " + sql).fetchall():
+        detail = row["detail"]
+        m = _SCAN_RE.match(detail)
+        if m and (name, m.group(2) or m.group(1)) not in ALLOWED_SCANS:
+            bad.append(detail)
+    return bad
+
+
+def test_hot_queries_use_indexes():
+    database.init_db()
+    failures = []
+    queries = _hot_queries()
+    assert queries, "nenhuma consulta capturada"
+    for name, sql in queries:
+        bad = _full_scans(name, sql)
+        status = "❌" if bad else "✅"
+        print(f"{status} {name}: {' | '.join(bad) if bad else 'ok'}")
+        if bad:
+            failures.append((name, bad))
+    assert not failures, f"Consultas com full scan: {failures}"
+
+
+def test_migrations_are_versioned():
+    database.init_db()
+    conn = database._get_conn()
+    versions = [r["version"] for r in conn.execute("SELECT version FROM schema_version ORDER BY version")]
+    assert versions == [v for v, _, _ in database._MIGRATIONS], versions
+    # Segunda execucao nao reaplica nada
+    database.init_db()
+    assert conn.execute("SELECT COUNT(*) FROM schema_version").fetchone()[0] == len(versions)
+
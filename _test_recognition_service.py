@@ -0,0 +1,174 @@
+"""Testes do servico de reconhecimento (recognition_service) com um recognizer falso."""
+import io
+import json
+import threading
+import time
+import wave
+
+import numpy as np
+import pytest
+
+import recognition_service
+from recognition_service import RecognitionBusy, RecognitionService
+
+
+class FakeRecognizer:
+    """Interface do KaldiRecognizer; AcceptWaveform espera `gate` (decode "lento")."""
+    gate: threading.Event = None
+
+    def __init__(self, model, rate, grammar=None):
+        self.rate = rate
+        self.grammars = [grammar]
+
+    def SetWords(self, on):
+        pass
+
+    def SetGrammar(self, grammar):
+        self.grammars.append(grammar)
+
+    def AcceptWaveform(self, pcm):
+        if self.gate is not None:
+            self.gate.wait(5)
+        return False
+
+    def PartialResult(self):
+        return json.dumps({"partial": "hello"})
+
+    def FinalResult(self):
+        return json.dumps({"text": "hello world", "result": [{"word": "hello", "conf": 1.0}]})
+
+    def Reset(self):
+        pass
+
+
+@pytest.fixture
+def service_factory():
+    made = []
+
+    def make(**kw):
+        kw.setdefault("workers", 2)
+        svc = RecognitionService(None, recognizer_factory=FakeRecognizer, **kw)
+        made.append(svc)
+        return svc
+
+    yield make
+    FakeRecognizer.gate = None
+    for svc in made:
+        svc.close()
+
+
+def _wav(seconds=0.5, rate=16000):
+    t = np.arange(int(seconds * rate)) / rate
+    pcm = (8000 * np.sin(2 * np.pi * 220 * t)).astype("<i2")
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(pcm.tobytes())
+    return buf.getvalue()
+
+
+def test_admission_limit_is_workers_plus_queue(service_factory):
+    FakeRecognizer.gate = threading.Event()
+    svc = service_factory(workers=2, max_queue=1)
+    futures = [svc.recognize(_wav()) for _ in range(3)]
+    with pytest.raises(RecognitionBusy):
+        svc.recognize(_wav())
+    FakeRecognizer.gate.set()
+    assert [f.result(5)["text"] for f in futures] == ["hello world"] * 3
+    svc.recognize(_wav()).result(5)   # vagas devolvidas
+    stats = svc.stats()
+    assert (stats["rejected"], stats["completed"], stats["in_flight"]) == (1, 4, 0)
+
+
+def test_recognizers_are_reused_per_rate_and_grammar(service_factory):
+    svc = service_factory(workers=2)
+    assert svc.stats()["recognizers_created"] == 2          # aquecidos, vocabulario aberto
+    for _ in range(3):
+        svc.recognize_result(_wav())
+    assert svc.stats()["recognizers_created"] == 2
+
+    svc.recognize_result(_wav(), grammar='["hello world"]')
+    svc.recognize_result(_wav(), grammar='["good morning"]')
+    assert svc.stats()["recognizers_created"] == 3          # um com gramatica, trocada via SetGrammar
+    grammar_rec = svc._idle[(16000, True)][0][0]
+    assert grammar_rec.grammars == ['["hello world"]', '["good morning"]']
+
+    for _ in range(2):
+        svc.open_stream(8000).finish()
+    assert svc.stats()["recognizers_created"] == 4          # 8 kHz: recognizer proprio, reusado
+    assert len(svc._idle[(8000, False)]) == 1
+
+
+def test_stream_limit_and_slot_release(service_factory):
+    svc = service_factory(max_streams=1)
+    stream = svc.open_stream(16000)
+    with pytest.raises(RecognitionBusy):
+        svc.open_stream(16000)
+    assert stream.accept_chunk(b"\0\0" * 160) == "hello"
+    assert stream.finish()["text"] == "hello world"
+    svc.open_stream(16000).finish()
+    assert svc.stats()["streams_rejected"] == 1
+
+
+class _SpyLock:
+    """Lock que avisa quando alguem fica esperando por ele."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.contended = threading.Event()
+
+    def __enter__(self):
+        if self._lock.locked():
+            self.contended.set()
+        self._lock.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self._lock.release()
+
+
+def test_reclaim_skips_stream_that_got_audio_after_selection(service_factory):
+    svc = service_factory(max_streams=1, stream_idle_timeout=0.05)
+    stream = svc.open_stream(16000)
+    stream._lock = _SpyLock()
+    time.sleep(0.1)                       # parada: candidata a ser encerrada
+    outcome = []
+
+    def other_student():
+        try:
+            outcome.append(svc.open_stream(16000))
+        except RecognitionBusy as e:
+            outcome.append(e)
+
+    with stream._lock:                    # um pedaco chegando na captura
+        t = threading.Thread(target=other_student)
+        t.start()
+        assert stream._lock.contended.wait(5)
+        stream.last_chunk = time.monotonic()
+    t.join(5)
+
+    assert isinstance(outcome[0], RecognitionBusy)
+    assert stream.result is None and svc.stats()["streams_reclaimed"] == 0
+    assert stream.accept_chunk(b"\0\0" * 160) == "hello"
+
+
+def test_abandoned_stream_is_reclaimed(service_factory):
+    svc = service_factory(max_streams=1, stream_idle_timeout=0.05)
+    stream = svc.open_stream(16000)
+    time.sleep(0.1)
+    other = svc.open_stream(16000)
+    assert stream.result is not None and svc.stats()["streams_reclaimed"] == 1
+    assert stream.accept_chunk(b"\0\0" * 160) == "hello world"   # ja fechada: devolve o resultado
+    other.finish()
+    assert svc.stats()["streams_open"] == 0
+
+
+def test_module_helpers_use_phrase_grammar(service_factory, monkeypatch):
+    svc = service_factory()
+    monkeypatch.setattr(recognition_service, "get_service", lambda: svc)
+    monkeypatch.setattr(recognition_service.config, "RECOGNITION_GRAMMAR", True)
+    assert recognition_service.recognize_result(_wav(), phrase="Hello world")["grammar"] is True
+    monkeypatch.setattr(recognition_service.config, "RECOGNITION_GRAMMAR", False)
+    assert recognition_service.recognize_result(_wav(), phrase="Hello world")["grammar"] is False
@@ -0,0 +1,84 @@
+"""Testes do motor de pontuacao (scoring.py): alinhamento, confianca e nota."""
+import scoring
+from scoring import DEL, INS, MATCH, SUB
+
+
+def _ops(target: str, spoken: str) -> list[str]:
+    return [op for op, _, _ in scoring.align(target.split(), spoken.split())]
+
+
+def test_normalize():
+    assert scoring.normalize("I don't KNOW, sir!") == ["i", "dont", "know", "sir"]
+    assert scoring.normalize("   ") == []
+
+
+def test_align_identical():
+    assert _ops("i go to school", "i go to school") == [MATCH] * 4
+
+
+def test_align_inserted_word_does_not_shift_the_rest():
+    # Posicao a posicao, tudo depois do "um" estaria errado
+    assert _ops("i go to school", "um i go to school") == [INS, MATCH, MATCH, MATCH, MATCH]
+    r = scoring.score("I go to school.", "um i go to school")
+    assert r["score"] == 100
+    assert [e["word"] for e in r["extra"]] == ["um"]
+
+
+def test_align_dropped_word():
+    assert _ops("i go to school", "i to school") == [MATCH, DEL, MATCH, MATCH]
+    r = scoring.score("I go to school.", "i to school")
+    assert r["correct_count"] == 3 and r["wrong_words"] == ["go"]
+    assert r["score"] == 75
+
+
+def test_align_substitution():
+    assert _ops("i go to school", "i goes to school") == [MATCH, SUB, MATCH, MATCH]
+    r = scoring.score("I go to school", "i goes to school")
+    assert r["words"][1]["spoken"] == "goes" and not r["words"][1]["correct"]
+
+
+def test_align_empty_sides():
+    assert _ops("i go", "") == [DEL, DEL]
+    assert _ops("", "hello") == [INS]
+    r = scoring.score("", "hello")
+    assert r["score"] == 0 and r["total"] == 0
+
+
+def test_one_entry_per_target_word():
+    r = scoring.score("where is the classroom", "uh where is is the the class room")
+    assert [w["target"] for w in r["words"]] == ["where", "is", "the", "classroom"]
+    assert r["total"] == 4
+
+
+def test_vosk_words_with_confidence_and_timing():
+    recognized = {
+        "text": "i go to school",
+        "words": [
+            {"word": "i", "conf": 1.0, "start": 0.10, "end": 0.20},
+            {"word": "go", "conf": 0.95, "start": 0.20, "end": 0.45},
+            {"word": "to", "conf": 0.20, "start": 0.45, "end": 0.55},
+            {"word": "school", "conf": 0.90, "start": 0.55, "end": 1.10},
+        ],
+    }
+    r = scoring.score("I go to school", recognized, min_conf=0.5)
+    by_word = {w["target"]: w for w in r["words"]}
+    assert by_word["to"]["low_conf"] and not by_word["to"]["correct"]
+    assert by_word["school"]["correct"]
+    assert by_word["school"]["start"] == 0.55 and by_word["school"]["end"] == 1.10
+    assert r["correct_count"] == 3 and r["wrong_words"] == ["to"]
+
+
+def test_unk_keeps_its_position():
+    recognized = {"text": "i to school", "words": [
+        {"word": "i", "conf": 1.0}, {"word": "[unk]", "conf": 1.0},
+        {"word": "to", "conf": 1.0}, {"word": "school", "conf": 1.0},
+    ]}
+    r = scoring.score("I go to school", recognized)
+    assert r["words"][1]["op"] == SUB and r["words"][1]["spoken"] == "[unk]"
+    assert r["score"] == 75
+
+
+def test_falls_back_to_text_without_words():
+    r = scoring.score("I arrive early", {"text": "i arrive early", "words": []})
+    assert r["score"] == 100 and all(w["conf"] is None for w in r["words"])
+
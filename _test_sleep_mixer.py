@@ -0,0 +1,126 @@
+"""Testes da mixagem das sessoes do Neural Sleep (sleep_mixer) e da trava por sessao."""
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import config
+import sleep_mixer
+
+RATE = 8000
+
+
+def _reference(segments, rate, binaural_hz):
+    """Mixagem da sessao inteira de uma vez (envelope com o total conhecido)."""
+    voice = np.concatenate([np.concatenate([pcm, np.zeros(int(gap * rate), dtype=np.float32)])
+                            for pcm, gap in segments])
+    total = len(voice)
+    fade = int(sleep_mixer.FADE_SECONDS * rate)
+    idx = np.arange(total)
+    t = idx / rate
+    bed = np.zeros((total, 2), dtype=np.float32)
+    bed[:, 0] = config.SLEEP_BINAURAL_VOLUME * np.sin(2 * np.pi * config.SLEEP_BINAURAL_BASE_HZ * t)
+    bed[:, 1] = config.SLEEP_BINAURAL_VOLUME * np.sin(2 * np.pi * (config.SLEEP_BINAURAL_BASE_HZ + binaural_hz) * t)
+    env = np.minimum(1.0, np.minimum(idx, total - 1 - idx) / fade).astype(np.float32)
+    out = np.repeat((voice * config.SLEEP_VOICE_VOLUME)[:, None], 2, axis=1) + bed * env[:, None]
+    return (np.clip(out, -1.0, 1.0) * 32767).astype("<i2")
+
+
+def test_streamed_segments_match_whole_session_mix():
+    rng = np.random.default_rng(0)
+    segments = [(rng.uniform(-0.5, 0.5, int(s * RATE)).astype(np.float32), gap)
+                for s, gap in [(1.3, 1.0), (0.4, 2.5), (3.7, 1.0), (0.2, 0.3)]]
+    got = np.concatenate(list(sleep_mixer.render_blocks(iter(segments), RATE, binaural_hz=4.0)))
+    want = _reference(segments, RATE, 4.0)
+    assert got.shape == want.shape
+    assert np.abs(got.astype(int) - want.astype(int)).max() <= 1
+
+
+def test_session_ends_silent_and_blocks_stay_bounded():
+    segments = ((np.zeros(RATE // 2, dtype=np.float32), 1.0) for _ in range(20))
+    blocks = list(sleep_mixer.render_blocks(segments, RATE, binaural_hz=4.0))
+    assert max(len(b) for b in blocks) <= int(sleep_mixer.BLOCK_SECONDS * RATE)
+    assert abs(int(blocks[-1][-1, 1])) <= 1   # cama termina em fade-out
+
+
+def test_decode_ahead_keeps_order_and_bounds_memory(monkeypatch):
+    decoded, consumed = [], []
+
+    def fake_decode(path, rate):
+        decoded.append(path)
+        return np.full(10, float(path), dtype=np.float32)
+
+    monkeypatch.setattr(sleep_mixer, "decode", fake_decode)
+    clips = [(str(i), 0.5) for i in range(30)]
+    for pcm, gap in sleep_mixer.decode_ahead(clips, RATE, depth=3):
+        time.sleep(0.002)
+        consumed.append(int(pcm[0]))
+        assert len(decoded) - len(consumed) <= 3
+    assert consumed == list(range(30))
+
+
+def test_decode_ahead_stops_when_consumer_stops(monkeypatch):
+    decoded = []
+    monkeypatch.setattr(sleep_mixer, "decode", lambda path, rate: decoded.append(path) or np.zeros(1, np.float32))
+    gen = sleep_mixer.decode_ahead([(str(i), 0.0) for i in range(100)], RATE, depth=2)
+    next(gen)
+    gen.close()
+    assert len(decoded) <= 4
+
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path, monkeypatch):
+    """ffmpeg falso: escreve muito no stderr antes de ler o stdin (encheria um pipe)."""
+    script = tmp_path / "ffmpeg"
+    script.write_text(
+        f"#!{sys.executable}\n"
+        "import os, sys\n"
+        "sys.stderr.write('aviso ' * 40000)\n"
+        "sys.stderr.flush()\n"
+        "data = sys.stdin.buffer.read()\n"
+        "if os.environ.get('FAKE_FFMPEG_FAIL'):\n"
+        "    sys.stderr.write('\\nencoder quebrou')\n"
+        "    sys.exit(1)\n"
+        "open(sys.argv[-1], 'wb').write(data)\n"
+    )
+    script.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    return tmp_path
+
+
+def test_encode_with_chatty_stderr_does_not_block(fake_ffmpeg):
+    out = fake_ffmpeg / "sessao.mp3"
+    blocks = (np.zeros((RATE, 2), dtype="<i2") for _ in range(40))
+    assert sleep_mixer.encode(blocks, RATE, str(out)) == 40 * RATE * 2 * 2
+    assert out.exists() and not [n for n in os.listdir(fake_ffmpeg) if n.endswith(".tmp")]
+
+
+def test_encode_failure_reports_stderr_and_cleans_up(fake_ffmpeg, monkeypatch):
+    monkeypatch.setenv("FAKE_FFMPEG_FAIL", "1")
+    out = fake_ffmpeg / "sessao.mp3"
+    with pytest.raises(RuntimeError, match="ffmpeg saiu com 1: aviso"):
+        sleep_mixer.encode(iter([np.zeros((10, 2), dtype="<i2")]), RATE, str(out))
+    assert not [n for n in os.listdir(fake_ffmpeg) if n.startswith("sessao.mp3")]
+
+
+def test_session_locks_are_dropped_after_use():
+    neural_sleep = pytest.importorskip("neural_sleep")
+    inside, release = threading.Event(), threading.Event()
+
+    def hold():
+        with neural_sleep._session_lock("a.mp3"):
+            inside.set()
+            release.wait(5)
+
+    t = threading.Thread(target=hold)
+    t.start()
+    inside.wait(5)
+    assert not neural_sleep._session_locks["a.mp3"][0].acquire(blocking=False)   # mesma trava
+    release.set()
+    t.join()
+    with neural_sleep._session_lock("b.mp3"):
+        pass
+    assert neural_sleep._session_locks == {}
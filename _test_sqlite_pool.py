@@ -0,0 +1,88 @@
+"""Testes do pool de conexoes SQLite local (database.SQLitePool)."""
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import database
+
+
+@pytest.fixture
+def pool(tmp_path):
+    p = database.SQLitePool(str(tmp_path / "pool.db"), max_size=2, timeout=1.0)
+    yield p
+    p.close_all()
+
+
+def _in_thread(fn):
+    """Roda `fn` em outra thread e espera ela terminar; devolve o retorno (ou relanca o erro)."""
+    out = []
+
+    def run():
+        try:
+            out.append((fn(), None))
+        except Exception as e:
+            out.append((None, e))
+
+    t = threading.Thread(target=run)
+    t.start()
+    t.join()
+    result, error = out[0]
+    if error is not None:
+        raise error
+    return result
+
+
+def test_checkout_and_return(pool):
+    conn = pool.checkout()
+    assert conn.execute("SELECT 1").fetchone()[0] == 1
+    assert pool.stats()["in_use"] == 1
+    conn.close()  # devolve ao pool, nao fecha
+    s = pool.stats()
+    assert (s["in_use"], s["idle"], s["open"], s["misses"]) == (0, 1, 1, 1)
+    # Outra thread reaproveita a conexao ociosa (hit)
+    again = _in_thread(lambda: pool.checkout())
+    assert again is conn and pool.stats()["hits"] == 1
+
+
+def test_thread_affine_recheckout_is_not_a_hit(pool):
+    a = pool.checkout()
+    b = pool.checkout()
+    assert a is b
+    s = pool.stats()
+    assert (s["affine"], s["hits"], s["misses"]) == (1, 0, 1)
+    b.close()
+    assert pool.stats()["in_use"] == 1   # refcount: ainda com a thread
+    a.close()
+    assert pool.stats()["in_use"] == 0
+
+
+def test_waiter_reclaims_connection_of_thread_that_dies(pool):
+    pool.checkout()                                  # 1 vaga: esta thread
+    release = threading.Event()
+
+    def hold():
+        pool.checkout()                              # 2 vaga: nunca devolvida
+        release.wait()
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    while pool.stats()["in_use"] < 2:
+        time.sleep(0.01)
+    threading.Timer(0.2, release.set).start()        # a thread morre com a conexao
+
+    t0 = time.monotonic()
+    conn = _in_thread(lambda: pool.checkout())
+    assert conn is not None
+    assert time.monotonic() - t0 < 0.8               # bem antes do timeout (1 s)
+    s = pool.stats()
+    assert s["reclaimed"] == 1 and s["waits"] == 1 and s["timeouts"] == 0
+
+
+def test_timeout_when_pool_is_exhausted(tmp_path):
+    pool = database.SQLitePool(str(tmp_path / "pool.db"), max_size=1, timeout=0.2)
+    pool.checkout()
+    with pytest.raises(sqlite3.OperationalError, match="esgotado"):
+        _in_thread(lambda: pool.checkout())
+    assert pool.stats()["timeouts"] == 1
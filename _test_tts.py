@@ -0,0 +1,62 @@
+"""Testes da camada de TTS (tts.py) sem rede nem binarios instalados."""
+import subprocess
+
+import pytest
+
+import tts
+
+
+class _Proc:
+    def __init__(self, stdout=b"", returncode=0, stderr=b""):
+        self.stdout, self.returncode, self.stderr = stdout, returncode, stderr
+
+
+@pytest.fixture
+def fake_run(monkeypatch):
+    """Troca subprocess.run: devolve `outputs` em ordem e guarda (cmd, stdin) em `calls`."""
+    calls, outputs = [], []
+
+    def run(cmd, input=None, capture_output=True, timeout=None):
+        calls.append((cmd, input))
+        return outputs.pop(0)
+
+    monkeypatch.setattr(subprocess, "run", run)
+    return calls, outputs
+
+
+def test_unknown_backend():
+    with pytest.raises(tts.TTSError, match="gtts"):
+        tts.get_backend("nao-existe")
+
+
+def test_empty_text_is_rejected():
+    with pytest.raises(tts.TTSError):
+        tts.synthesize("   ", backend="espeak")
+
+
+def test_espeak_command_voice_and_rate():
+    cmd = tts.EspeakBackend("espeak-ng").command("Hello there", "pt", tts.SLOW)
+    assert cmd[:3] == ["espeak-ng", "-v", "pt-br"]
+    assert cmd[cmd.index("-s") + 1] == str(int(tts.EspeakBackend.WPM * tts.SLOW))
+    assert cmd[-1] == "Hello there"
+
+
+def test_espeak_wav_and_mp3(fake_run, monkeypatch):
+    calls, outputs = fake_run
+    outputs += [_Proc(b"RIFFwav"), _Proc(b"RIFFwav"), _Proc(b"ID3mp3")]
+    monkeypatch.setattr(tts.shutil, "which", lambda name: f"/usr/bin/{name}")
+    backend = tts.EspeakBackend("espeak-ng")
+    assert backend.synthesize("hi", fmt="wav") == b"RIFFwav"
+    assert backend.synthesize("hi", fmt="mp3") == b"ID3mp3"
+    assert calls[2][0][0] == "ffmpeg" and calls[2][1] == b"RIFFwav"  # WAV vai pelo stdin
+
+
+def test_engine_failure_becomes_tts_error(fake_run):
+    fake_run[1].append(_Proc(b"", returncode=1, stderr=b"voice not found"))
+    with pytest.raises(tts.TTSError, match="voice not found"):
+        tts.EspeakBackend("espeak-ng").synthesize("hi", fmt="wav")
+
+
+def test_gtts_rejects_wav():
+    with pytest.raises(tts.TTSError):
+        tts.GTTSBackend().synthesize("hi", fmt="wav")
@@ -0,0 +1,217 @@
+"""Testes da replica local do Turso (database.TursoReplica) e do roteamento de leitura.
+
+O "Turso" aqui e um SQLite em arquivo atras de um client falso que devolve
+CustomResultSet no formato Hrana, entao o sync, o apply e o _get_read_conn
+rodam o mesmo codigo de producao.
+"""
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import database
+
+_SCHEMA = """
+CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL, name TEXT NOT NULL,
+  password_hash TEXT NOT NULL, email TEXT UNIQUE, is_premium BOOLEAN DEFAULT 0, verification_code TEXT);
+CREATE TABLE settings (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE progress (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL, pagina TEXT,
+  arquivo_atual TEXT, indice INTEGER, xp INTEGER DEFAULT 0, porc_atual INTEGER, tentativa INTEGER, updated_at TEXT);
+CREATE TABLE module_progress (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT NOT NULL, module_file TEXT NOT NULL,
+  indice INTEGER DEFAULT 0, updated_at TEXT, UNIQUE(username, module_file));
+CREATE TABLE lesson_scores (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT NOT NULL, module_file TEXT NOT NULL,
+  lesson_idx INTEGER NOT NULL, best_score INTEGER DEFAULT 0, updated_at TEXT, UNIQUE(username, module_file, lesson_idx));
+CREATE INDEX idx_users_email_lower ON users (lower(email));
+"""
+
+
+def _cell(v):
+    if v is None:
+        return {"type": "null"}
+    if isinstance(v, int):
+        return {"type": "integer", "value": str(v)}
+    if isinstance(v, float):
+        return {"type": "float", "value": v}
+    return {"type": "text", "value": str(v)}
+
+
+class FakeTurso:
+    """Client com a interface do TursoClientCustom sobre um SQLite (o primario)."""
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.lock = threading.Lock()
+        self.fail = False
+
+    def _run(self, sql, params):
+        cur = self.db.execute(sql, params or ())
+        return database.CustomResultSet({
+            "cols": [{"name": d[0]} for d in cur.description or ()],
+            "rows": [[_cell(v) for v in r] for r in cur.fetchall()],
+        })
+
+    def execute(self, sql, params=None):
+        with self.lock:
+            if self.fail:
+                raise RuntimeError("primario fora")
+            return self._run(sql, params)
+
+    def execute_batch(self, statements):
+        with self.lock:
+            if self.fail:
+                raise RuntimeError("primario fora")
+            return [self._run(sql, params) for sql, params in statements]
+
+    def execute_transaction(self, statements):
+        with self.lock:
+            self.db.execute("BEGIN")
+            try:
+                out = [self._run(sql, params) for sql, params in statements]
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+            self.db.execute("COMMIT")
+            return out
+
+
+@pytest.fixture
+def primary(tmp_path):
+    client = FakeTurso(str(tmp_path / "primary.db"))
+    client.db.executescript(_SCHEMA)
+    database._migration_v4(client.db)
+    client.db.execute("INSERT INTO users (username, name, password_hash, verification_code) "
+                      "VALUES ('ana', 'Ana', 'HASH', '123')")
+    client.db.execute("INSERT INTO settings VALUES ('pix', 'on')")
+    for i in range(20):
+        client.db.execute(*database._xp_stmt(f"u{i}", i))
+    yield client
+    client.db.close()
+
+
+@pytest.fixture
+def replica(primary, tmp_path):
+    # sync_interval longo: a thread de fundo faz so o primeiro sync, o resto e chamado pelo teste
+    r = database.TursoReplica(primary, str(tmp_path / "replica.db"), sync_interval=3600, full_sync_every=1000)
+    deadline = time.monotonic() + 5
+    while not r.fresh():
+        assert time.monotonic() < deadline, "primeiro sync nao terminou"
+        time.sleep(0.01)
+    yield r
+    r.pool.close_all()
+
+
+def _local(replica, sql, params=()):
+    conn = replica.pool.checkout()
+    try:
+        return [tuple(r) for r in conn.execute(sql, params)]
+    finally:
+        conn.close()
+
+
+def test_first_sync_copies_tables_without_credentials(replica):
+    assert _local(replica, "SELECT COUNT(*) FROM progress") == [(20,)]
+    assert _local(replica, "SELECT value FROM settings WHERE key = 'pix'") == [("on",)]
+    assert _local(replica, "SELECT username, password_hash, verification_code FROM users") == [("ana", "", None)]
+
+
+def test_incremental_sync_only_fetches_changed_rows(primary, replica):
+    primary.db.execute(*database._xp_stmt("u3", 999))
+    primary.db.execute("UPDATE users SET is_premium = 1 WHERE username = 'ana'")
+    before = replica.stats()["rows_synced"]
+    assert replica.sync()
+    assert _local(replica, "SELECT xp FROM progress WHERE username = 'u3'") == [(999,)]
+    assert _local(replica, "SELECT is_premium FROM users") == [(1,)]
+    # Dentro da folga da marca tudo e relido; o que nao tem updated_at (settings) vem sempre
+    assert replica.stats()["rows_synced"] - before <= 20 + 1 + 1
+
+
+def test_delete_on_primary_shows_up_on_next_sync(primary, replica):
+    primary.db.execute("DELETE FROM progress WHERE username = 'u4'")
+    assert replica.sync()
+    assert _local(replica, "SELECT COUNT(*) FROM progress WHERE username = 'u4'") == [(0,)]
+    assert _local(replica, "SELECT COUNT(*) FROM progress") == [(19,)]
+    stats = replica.stats()
+    assert stats["deletes_detected"] == 1 and stats["fresh"]
+
+
+def test_delete_plus_insert_is_still_detected(primary, replica):
+    # Mesmo COUNT, ids diferentes: a soma dos ids denuncia o delete
+    primary.db.execute("DELETE FROM progress WHERE username = 'u0'")
+    primary.db.execute(*database._xp_stmt("novo", 1))
+    assert replica.sync()
+    names = {r[0] for r in _local(replica, "SELECT username FROM progress")}
+    assert "u0" not in names and "novo" in names
+
+
+def test_schema_change_rebuilds_table(primary, replica):
+    primary.db.execute("ALTER TABLE progress ADD COLUMN extra TEXT")
+    assert replica.sync()
+    cols = [r[1] for r in _local(replica, "PRAGMA table_info(progress)")]
+    assert "extra" in cols
+    assert _local(replica, "SELECT COUNT(*) FROM progress") == [(20,)]
+
+
+def test_write_is_visible_locally_without_sync(primary, replica):
+    conn = database.TursoConnection(primary)
+    conn.replica = replica
+    synced = replica.stats()["syncs"]
+    with conn:
+        conn.execute(*database._xp_stmt("ana", 42))
+        conn.execute("INSERT INTO users (username, name, password_hash, verification_code) VALUES (?, ?, ?, ?)",
+                     ("bob", "Bob", "H2", "9"))
+    assert replica.stats()["syncs"] == synced
+    assert _local(replica, "SELECT xp FROM progress WHERE username = 'ana'") == [(42,)]
+    # A escrita reaplicada nao deixa credencial na replica
+    assert _local(replica, "SELECT password_hash, verification_code FROM users WHERE username = 'bob'") == [("", None)]
+
+
+def test_failed_write_invalidates_replica(primary, replica):
+    conn = database.TursoConnection(primary)
+    conn.replica = replica
+    primary.fail = True
+    with pytest.raises(RuntimeError):
+        conn.execute(*database._xp_stmt("ana", 1))
+    assert not replica.fresh()
+    primary.fail = False
+    assert replica.sync() and replica.fresh()
+
+
+def test_sync_crossing_a_write_is_discarded(replica):
+    replica.begin_write()
+    try:
+        assert not replica.sync()
+    finally:
+        replica.end_write()
+    assert replica.stats()["syncs_discarded"] == 1
+
+
+def test_read_routing_follows_freshness(primary, replica, monkeypatch):
+    conn = database.TursoConnection(primary)
+    conn.replica = replica
+    monkeypatch.setattr(database, "_get_conn", lambda: conn)
+
+    local = database._get_read_conn()
+    assert isinstance(local, database.PooledSQLiteConnection)
+    assert local.execute("SELECT COUNT(*) FROM progress").fetchone()[0] == 20
+    local.close()
+
+    replica.invalidate()
+    assert database._get_read_conn() is conn
+    stats = replica.stats()
+    assert (stats["reads_local"], stats["reads_primary"]) == (1, 1)
+
+
+def test_read_counters_do_not_wait_for_sync_lock(replica, monkeypatch):
+    conn = database.TursoConnection(None)
+    conn.replica = replica
+    monkeypatch.setattr(database, "_get_conn", lambda: conn)
+    with replica._lock:   # sync em andamento
+        threads = [threading.Thread(target=lambda: [database._get_read_conn().close() for _ in range(50)])
+                   for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(timeout=5)
+        assert not any(t.is_alive() for t in threads)
+    assert replica.stats()["reads_local"] == 200
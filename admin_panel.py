@@ -1,9 +1,31 @@
 from __future__ import annotations
 import streamlit as st
 import database
+import progress_journal
 import config
 import streamlit_authenticator as stauth
 
+# Linhas por pagina nas listagens (paginacao por chave direto no banco)
+ADMIN_PAGE_SIZE = 50
+
+
+def _render_pager(state_key: str, page: list, next_cursor):
+    """Botoes Anterior/Proxima para uma listagem paginada por chave.
+
+    `st.session_state[state_key]` guarda a pilha de cursores das paginas ja
+    visitadas; o topo e o cursor da pagina atual.
+    """
+    cursors = st.session_state[state_key]
+    c_prev, c_info, c_next = st.columns([1, 2, 1])
+    if len(cursors) > 1 and c_prev.button("⬅️ Anterior", key=f"{state_key}_prev"):
+        cursors.pop()
+        st.rerun()
+    c_info.caption(f"Página {len(cursors)}")
+    if len(page) == ADMIN_PAGE_SIZE and c_next.button("Próxima ➡️", key=f"{state_key}_next"):
+        cursors.append(next_cursor)
+        st.rerun()
+
+
 def render_admin_panel(username: str, test_oral_callback=None):
     """Renderiza o painel ADM completo."""
 
@@ -51,17 +73,17 @@ def _render_user_management(current_admin_user: str):
     
     # Botao para forcar refresh da lista
     if st.button("🔄 Atualizar Lista", key="refresh_users"):
-        database.get_all_users_detailed.clear()
+        database.get_users_page.clear()
         st.rerun()
     
-    users = database.get_all_users_detailed()
-    if not users:
+    stats = database.get_user_stats()
+    if not stats["total"]:
         st.info("Nenhum usuário encontrado.")
         return
 
     # --- SUMMARY METRICS ---
-    total_users = len(users)
-    premium_count = sum(1 for u in users if u.get('is_premium'))
+    total_users = stats["total"]
+    premium_count = stats["premium"]
     trial_count = total_users - premium_count
     
     m1, m2, m3 = st.columns(3)
@@ -81,6 +103,10 @@ def _render_user_management(current_admin_user: str):
     c7.markdown("**Ações**")
     st.divider()
 
+    # Pagina atual: usuarios com id > cursor (topo da pilha)
+    st.session_state.setdefault("_admin_users_cursors", [0])
+    users = database.get_users_page(st.session_state["_admin_users_cursors"][-1], ADMIN_PAGE_SIZE)
+
     for u in users:
         c1, c2, c3, c4, c5, c6, c7 = st.columns([1, 2, 2, 2, 1, 2, 2])
         is_self = (u['username'] == current_admin_user)
@@ -96,10 +122,11 @@ def _render_user_management(current_admin_user: str):
              new_xp = st.number_input("XP", value=current_xp, key=f"xp_{u['username']}", label_visibility="collapsed")
              if new_xp != current_xp:
                  if st.button("💾", key=f"save_xp_{u['username']}"):
-                     database.update_user_xp(u['username'], int(new_xp))
+                     progress_journal.record_xp(u['username'], int(new_xp))
+                     progress_journal.flush(u['username'])
                      if is_self:
                         st.session_state['xp'] = int(new_xp)
-                     database.get_all_users_detailed.clear()
+                     database.get_users_page.clear()
                      st.rerun()
 
         # Plan Info
@@ -137,7 +164,7 @@ def _render_user_management(current_admin_user: str):
             new_adm = st.checkbox("Adm", value=is_adm, key=f"is_adm_{_uname}", disabled=is_self)
             if new_adm != is_adm:
                 database.update_user_role(_uname, new_adm)
-                database.get_all_users_detailed.clear()
+                database.get_users_page.clear()
                 st.rerun()
 
             # Plan selector
@@ -161,6 +188,7 @@ def _render_user_management(current_admin_user: str):
                 _delete_user_dialog(_uname)
 
     st.divider()
+    _render_pager("_admin_users_cursors", users, users[-1]['id'] if users else 0)
 
 
 @st.dialog("Excluir Usuário")
@@ -169,6 +197,7 @@ def _delete_user_dialog(target_username: str):
     st.warning("Essa ação não pode ser desfeita. Todo o progresso será perdido.")
     
     if st.button("Sim, excluir permanentemente"):
+        progress_journal.discard(target_username)
         if database.delete_user(target_username):
             st.success(f"Usuário {target_username} excluído.")
             st.rerun()
@@ -229,13 +258,12 @@ def _reset_password_dialog(target_username: str):
 def _render_student_analytics():
     st.markdown("### 📊 Acompanhamento Individual de Alunos")
 
-    users = database.get_all_users_detailed()
-    if not users:
+    # Dropdown para selecionar aluno (lido em paginas, guarda so os rotulos)
+    user_options = {f"{u['username']} — {u['name']}": u['username'] for u in database.iter_users()}
+    if not user_options:
         st.info("Nenhum usuário encontrado.")
         return
 
-    # Dropdown para selecionar aluno
-    user_options = {f"{u['username']} — {u['name']}": u['username'] for u in users}
     selected_label = st.selectbox("Selecione o aluno:", list(user_options.keys()), key="analytics_user_select")
     selected_user = user_options[selected_label]
 
@@ -425,7 +453,7 @@ def _render_tester_tools(test_oral_callback=None):
             st.session_state['porc_atual'] = 0
             st.session_state['tentativa'] = 0
             # Salva auto
-            database.save_module_progress(st.session_state.get('username'), sel_mod, idx)
+            progress_journal.record_module_progress(st.session_state.get('username'), sel_mod, idx)
             st.rerun()
 
 def _render_sales_reports():
@@ -434,14 +462,14 @@ def _render_sales_reports():
     if st.button("🔄 Atualizar Vendas", key="refresh_sales"):
         st.rerun()
     
-    payments = database.get_all_payments()
-    if not payments:
+    totals = database.get_payment_totals()
+    if not totals["count"]:
         st.info("Nenhum pagamento registrado ainda.")
         return
 
-    # Sumário rápido
-    total_sales = len(payments)
-    total_revenue = sum(p['amount'] for p in payments if p['status'] == 'approved' or p['status'] == 'success')
+    # Sumário rápido (agregado no banco)
+    total_sales = totals["count"]
+    total_revenue = totals["revenue"]
     
     c1, c2 = st.columns(2)
     c1.metric("Total de Transações", total_sales)
@@ -459,6 +487,10 @@ def _render_sales_reports():
     cols[5].markdown("**Referência**")
     st.divider()
 
+    # Pagina atual: pagamentos anteriores ao cursor (created_at, id) do topo da pilha
+    st.session_state.setdefault("_admin_payments_cursors", [None])
+    payments = database.get_payments_page(st.session_state["_admin_payments_cursors"][-1], ADMIN_PAGE_SIZE)
+
     for p in payments:
         cols = st.columns([2, 2, 2, 1, 1, 2])
         # Formatar data simplificada
@@ -479,6 +511,12 @@ def _render_sales_reports():
             
         cols[5].write(p['external_reference'] or "-")
 
+    st.divider()
+    _render_pager(
+        "_admin_payments_cursors", payments,
+        (payments[-1]['created_at'], payments[-1]['id']) if payments else None,
+    )
+
 def _render_plan_settings():
     st.markdown("### ⚙️ Configuração de Planos e Preços")
     
@@ -5,22 +5,22 @@ from __future__ import annotations
 # ====================================================================
 
 import streamlit as st
-from gtts import gTTS
 import os
 import base64
-from streamlit_mic_recorder import mic_recorder
 import string
-import json
-import io
-import wave
 import random
 import time
 import pandas as pd
-from vosk import Model, KaldiRecognizer
 from typing import Optional
 
 import config
 import database
+import progress_journal
+import model_registry
+import recognition_service
+import live_capture
+import attempt_cache
+import audio_store
 import auth
 import icons
 import admin_panel
@@ -1212,7 +1212,7 @@ if st.query_params.get("nav") == "aula":
     if _mod_target:
         st.session_state['arquivo_atual'] = _mod_target
         # Carrega indice salvo
-        _saved_idx = database.load_module_progress(st.session_state.get('username', ''), _mod_target)
+        _saved_idx = progress_journal.load_module_progress(st.session_state.get('username', ''), _mod_target)
         st.session_state['indice'] = _saved_idx
         st.session_state['porc_atual'] = 0
         st.session_state['tentativa'] = 0
@@ -1225,13 +1225,62 @@ if st.query_params.get("nav") == "aula":
 aplicar_estilo()
 
 
-@st.cache_resource
-def carregar_vosk():
-    if os.path.exists(config.MODEL_DIR):
-        return Model(config.MODEL_DIR)
-    return None
+# Modelo Vosk unico do processo: comeca a carregar em background enquanto o
+# aluno ainda esta no login (sem MODEL_PRELOAD, carrega no primeiro uso)
+if config.MODEL_PRELOAD:
+    model_registry.preload(background=True)
+
+
+def reconhecer_audio(wav_bytes: bytes, frase: Optional[str] = None) -> Optional[dict]:
+    """Resultado do reconhecimento ({"text", "words"}) ou None, com aviso na tela, se nao deu.
+
+    Com `frase`, o decode usa a gramatica restrita da frase alvo.
+    """
+    if not recognition_service.available():
+        st.error("⚠️ Modelo de reconhecimento de voz não encontrado. Verifique a pasta 'model'.")
+        return None
+    try:
+        return recognition_service.recognize_result(wav_bytes, phrase=frase)
+    except (recognition_service.RecognitionBusy, recognition_service.RecognitionTimeout) as e:
+        st.warning(f"⏳ {e}")
+        return None
+
+
+def ouvir_gravacao(gravacao: Optional[dict], frase: str) -> Optional[dict]:
+    """Reconhecimento da gravacao: a captura ao vivo ja traz pronto; o WAV do mic_recorder e decodificado."""
+    if not gravacao:
+        return None
+    if "text" in gravacao:
+        return {"text": gravacao["text"], "words": gravacao.get("words", [])}
+    return reconhecer_audio(gravacao["bytes"], frase)
 
-model_vosk = carregar_vosk()
+
+@st.fragment(run_every=config.TTS_POLL_SECONDS)
+def aguardar_audio(frase: str, rotulo: Optional[str] = None) -> None:
+    """Aviso enquanto o audio da frase e gerado em background; rerun quando ficar pronto.
+
+    So o fragmento roda a cada TTS_POLL_SECONDS (o resto da pagina nao). Passado
+    TTS_WAIT_SECONDS sem o audio (ex.: TTS fora do ar), para de pedir a sintese.
+    """
+    inicio = st.session_state.setdefault(f"_audio_wait_{frase}", time.monotonic())
+    if time.monotonic() - inicio > config.TTS_WAIT_SECONDS:
+        st.caption("🔇 Áudio indisponível no momento.")
+        return
+    if audio_store.serve(frase):
+        st.session_state.pop(f"_audio_wait_{frase}", None)
+        st.rerun()  # a pagina inteira redesenha com o player no lugar do aviso
+    if rotulo:
+        st.markdown(rotulo)
+    st.caption("🔊 Preparando o áudio desta frase...")
+
+
+def feedback_html(avaliacao: dict) -> str:
+    """Palavras da frase alvo em verde/vermelho, conforme o alinhamento do scoring."""
+    html = '<div class="fb-container">'
+    for w in avaliacao["words"]:
+        cls = "fb-correct" if w["correct"] else "fb-wrong"
+        html += f'<span class="fb-word {cls}">{w["target"].upper()}</span>'
+    return html + '</div>'
 
 
 
@@ -1257,7 +1306,8 @@ if "payment_status" in query_params:
                 # Preco pago
                 amount_paid = float(p_data.get("transaction_amount", 97.90))
                 
-                # Ativa no banco
+                # Ativa no banco (antes, grava o progresso ainda na fila)
+                progress_journal.flush(user_ref)
                 database.update_user_premium(user_ref, True, plan_type=plan_ref)
                 database.log_payment(user_ref, payment_id, "success", amount_paid, "BRL", plan_ref)
                 
@@ -1293,8 +1343,14 @@ if username is None:
 # -----------------------------------------------------------
 # CARREGAR DADOS DO USUÁRIO (CRÍTICO: ANTES DA RENDERIZAÇÃO)
 # -----------------------------------------------------------
-def salvar_progresso():
-    database.save_progress(
+def salvar_progresso(lesson_score: Optional[int] = None, wrong_words: Optional[list[str]] = None,
+                     all_words: Optional[list[str]] = None):
+    """Enfileira progresso global + indice do modulo (e, se dados, nota e erros).
+
+    O progresso vai para o journal write-behind (descarregado em background);
+    os erros por palavra sao gravados pela thread de escrita adiada.
+    """
+    progress_journal.record_attempt(
         username=username,
         pagina=st.session_state['pagina'],
         arquivo_atual=st.session_state['arquivo_atual'],
@@ -1302,15 +1358,13 @@ def salvar_progresso():
         xp=st.session_state['xp'],
         porc_atual=st.session_state['porc_atual'],
         tentativa=st.session_state['tentativa'],
+        lesson_score=lesson_score,
     )
-    database.save_module_progress(
-        username=username,
-        module_file=st.session_state['arquivo_atual'],
-        indice=st.session_state['indice'],
-    )
+    if all_words:
+        database.record_word_errors_async(username, wrong_words or [], all_words)
 
 def carregar_progresso():
-    dados = database.load_progress(username)
+    dados = progress_journal.load_progress(username)
     if dados:
         for k, v in dados.items():
             st.session_state[k] = v
@@ -1590,7 +1644,7 @@ elif st.session_state['pagina'] == 'assinatura':
 
 elif st.session_state['pagina'] == 'inicio':
     # Calculate dynamic stats
-    _all_progress = database.load_all_module_progress(username)
+    _all_progress = progress_journal.load_all_module_progress(username)
     _total_modules = len(config.MODULOS)
     _completed_modules = sum(1 for mod_file in [m[1] for m in config.MODULOS] if _all_progress.get(mod_file, 0) > 0 and carregar_banco_especifico(mod_file) and _all_progress.get(mod_file, 0) >= len(carregar_banco_especifico(mod_file)))
     _total_lessons = sum(len(carregar_banco_especifico(m[1])) for m in config.MODULOS if carregar_banco_especifico(m[1]))
@@ -1727,7 +1781,7 @@ elif st.session_state['pagina'] == 'metricas':
 """, unsafe_allow_html=True)
 
     modulos = config.MODULOS
-    all_mod_progress = database.load_all_module_progress(username)
+    all_mod_progress = progress_journal.load_all_module_progress(username)
     
     for titulo, arquivo, _url in modulos:
         cur_idx = all_mod_progress.get(arquivo, 0)
@@ -1778,7 +1832,7 @@ elif st.session_state['pagina'] == 'selecao_modulos':
     # OTIMIZACAO: Cache de progresso (TTL curto para nao ficar obsoleto, mas rapido no rerun)
     @st.cache_data(ttl=5, show_spinner=False)
     def _load_all_progress_cached(username_val):
-        return database.load_all_module_progress(username_val)
+        return progress_journal.load_all_module_progress(username_val)
 
     all_mod_progress = _load_all_progress_cached(username)
 
@@ -1838,7 +1892,7 @@ elif st.session_state['pagina'] == 'selecao_modulos':
                     st.session_state['pagina'] = 'aula'
                     st.session_state['arquivo_atual'] = arquivo
                     # Reseta indice para o progresso salvo DESTE módulo (0 se novo)
-                    _saved = database.load_module_progress(username, arquivo)
+                    _saved = progress_journal.load_module_progress(username, arquivo)
                     st.session_state['indice'] = _saved
                     st.session_state['porc_atual'] = 0
                     st.session_state['tentativa'] = 0
@@ -1947,7 +2001,7 @@ elif st.session_state['pagina'] == 'aula':
 
 
     # Max indice = fronteira do progresso (a licao mais avancada ja alcancada)
-    max_indice = database.load_module_progress(username, st.session_state['arquivo_atual'])
+    max_indice = progress_journal.load_module_progress(username, st.session_state['arquivo_atual'])
 
     # Topo da Aula — Header premium com Botão de Fechar
     c_head_title, c_head_close = st.columns([5, 1])
@@ -1995,7 +2049,7 @@ elif st.session_state['pagina'] == 'aula':
         # Se estamos revisitando uma licao ja concluida, busca melhor nota do DB
         # Alterado: Busca sempre se score atual for 0 (mesmo na fronteira), para mostrar medalha se ja passamos
         if user_score == 0:
-            saved_score = database.load_lesson_score(
+            saved_score = progress_journal.load_lesson_score(
                 username, st.session_state['arquivo_atual'], int(st.session_state['indice'])
             )
             if saved_score > 0:
@@ -2078,11 +2132,11 @@ elif st.session_state['pagina'] == 'aula':
 """, unsafe_allow_html=True)
 
         # Audio Playback
-        modulo = os.path.splitext(st.session_state['arquivo_atual'])[0]
-        path_ref = os.path.join(config.AUDIOS_DIR, f"{modulo}_{atual['id']}.mp3")
-        if not os.path.exists(path_ref):
-            gTTS(text=str(atual['en']), lang='en').save(path_ref)
-        st.audio(path_ref)
+        path_ref = audio_store.serve(atual['en'])
+        if path_ref:
+            st.audio(path_ref)
+        else:
+            aguardar_audio(str(atual['en']))
 
         # Gravador e Botão de Repetir - Layout Toolbar Profissional
         # CSS para alinhar verticalmente o botão do Streamlit com o componente mic_recorder
@@ -2102,11 +2156,9 @@ elif st.session_state['pagina'] == 'aula':
 
         c_mic, c_rep = st.columns([3, 1], gap="small")
         with c_mic:
-            gravacao = mic_recorder(
-                start_prompt="🔴 GRAVAR",
-                stop_prompt="⏹️ PARAR",
-                format="wav",
-                key=f"mic_{st.session_state['indice']}_{st.session_state['tentativa']}"
+            gravacao = live_capture.recorder(
+                key=f"mic_{st.session_state['indice']}_{st.session_state['tentativa']}",
+                phrase=str(atual['en']),
             )
         with c_rep:
             # Botão de Repetir (Texto + Icone) - Visual de Toolbar
@@ -2115,12 +2167,11 @@ elif st.session_state['pagina'] == 'aula':
                 st.session_state['tentativa'] = int(st.session_state.get('tentativa', 0)) + 1
                 st.rerun()
 
-        if gravacao:
-            audio_data = io.BytesIO(gravacao['bytes'])
-            with wave.open(audio_data, 'rb') as wf:
-                rec = KaldiRecognizer(model_vosk, wf.getframerate())
-                rec.AcceptWaveform(wf.readframes(wf.getnframes()))
-                ouvida = json.loads(rec.FinalResult()).get("text", "").lower()
+        # Reconhece + pontua uma vez por gravacao; reruns reaproveitam (attempt_cache)
+        tentativa_aula = attempt_cache.evaluate(
+            gravacao, str(atual['en']), lambda: ouvir_gravacao(gravacao, str(atual['en'])))
+        if tentativa_aula is not None:
+            ouvida = tentativa_aula["recognized"]["text"]
 
             # Caixa mostrando o que o sistema ouviu
             _ouvi_display = ouvida.upper() if ouvida.strip() else "(silêncio detectado)"
@@ -2131,34 +2182,23 @@ elif st.session_state['pagina'] == 'aula':
 </div>
 """, unsafe_allow_html=True)
 
-            alvo = limpar(atual['en']).split()
-            dito = limpar(ouvida).split()
+            # Alinhamento frase alvo x fala (scoring) e feedback com animação staggered
+            avaliacao = tentativa_aula["evaluation"]
+            alvo = avaliacao["target"]
+            acertos = avaliacao["correct_count"]
+            st.markdown(feedback_html(avaliacao), unsafe_allow_html=True)
 
-            # Renderiza HTML do feedback com animação staggered
-            fb_html = '<div class="fb-container">'
-            acertos_list = []
-            for idx, p in enumerate(alvo):
-                if idx < len(dito) and dito[idx] == p:
-                    fb_html += f'<span class="fb-word fb-correct">{p.upper()}</span>'
-                    acertos_list.append(p)
-                else:
-                    fb_html += f'<span class="fb-word fb-wrong">{p.upper()}</span>'
-            fb_html += '</div>'
-            acertos = len(acertos_list)
-            st.markdown(fb_html, unsafe_allow_html=True)
+            # Rastreamento de erros por palavra (aprendizado adaptativo) — gravado junto com o progresso
+            _wrong_words = avaliacao["wrong_words"]
 
-            # Rastreamento de erros por palavra (aprendizado adaptativo)
-            _wrong_words = [p for i, p in enumerate(alvo) if i >= len(dito) or dito[i] != p]
-            database.record_word_errors(username, _wrong_words, alvo)
+            st.session_state['porc_atual'] = avaliacao["score"]
+            primeira_vez = attempt_cache.claim(tentativa_aula)
 
-            # Logica de XP e Sons
-            if acertos > 0:
+            # Logica de XP e Sons (uma vez por gravacao)
+            if primeira_vez and acertos > 0:
                 current_xp: int = int(st.session_state['xp'])
                 st.session_state['xp'] = int(current_xp + acertos)
                 st.toast(f"+{acertos} XP", icon="⭐")
-
-            val_total = int(len(alvo))
-            st.session_state['porc_atual'] = int((acertos / val_total) * 100) if val_total > 0 else 0
             
             # SHOW RESULT (Premium animated — sem som, sem balloons)
             _pct_class = "success" if st.session_state['porc_atual'] >= 80 else "fail"
@@ -2167,14 +2207,14 @@ elif st.session_state['pagina'] == 'aula':
     {st.session_state['porc_atual']}%
 </div>
 """, unsafe_allow_html=True)
-            salvar_progresso()
-
-            # Salva score da licao no DB (persiste para badges)
-            database.save_lesson_score(
-                username, st.session_state['arquivo_atual'],
-                int(st.session_state['indice']),
-                st.session_state['porc_atual']
-            )
+            # Progresso + score da licao (badges) vao para o journal (um fsync so);
+            # erros por palavra vao para a thread de escrita adiada
+            if primeira_vez:
+                salvar_progresso(
+                    lesson_score=st.session_state['porc_atual'],
+                    wrong_words=_wrong_words,
+                    all_words=alvo,
+                )
 
             # --- AUTO-NEXT FLOW (Dinâmica Melhorada) ---
             if st.session_state['porc_atual'] == 100:
@@ -2228,7 +2268,7 @@ elif st.session_state['pagina'] == 'aula':
         # Verifica se tem score salvo suficiente para habilitar (caso max_indice tenha corrompido ou edge case)
         # Proteção contra falha de leitura do DB
         try:
-             _saved_best = database.load_lesson_score(username, st.session_state['arquivo_atual'], int(st.session_state['indice']))
+             _saved_best = progress_journal.load_lesson_score(username, st.session_state['arquivo_atual'], int(st.session_state['indice']))
         except:
              _saved_best = 0
         
@@ -2372,35 +2412,27 @@ elif st.session_state['pagina'] == 'prova_oral':
 """, unsafe_allow_html=True)
 
     # TTS "Como se fala" + Audio
-    _prova_audio_id = atual_q.get('id', f'prova_{prova_idx}')
-    _prova_ref = os.path.join(config.AUDIOS_DIR, f"prova_{_prova_audio_id}.mp3")
-    if not os.path.exists(_prova_ref):
-        try:
-            gTTS(text=str(atual_q['en']), lang='en').save(_prova_ref)
-        except Exception:
-            _prova_ref = None
+    _prova_ref = audio_store.serve(atual_q['en'])
 
     c_tts, c_mic_p = st.columns([1, 2])
     with c_tts:
         if _prova_ref and os.path.exists(_prova_ref):
             st.markdown("**🔊 Como se fala:**")
             st.audio(_prova_ref)
+        else:
+            aguardar_audio(str(atual_q['en']), "**🔊 Como se fala:**")
 
     # Gravacao
     with c_mic_p:
-        gravacao_prova = mic_recorder(
-            start_prompt="🔴 GRAVAR",
-            stop_prompt="⏹️ PARAR",
-            format="wav",
-            key=f"prova_mic_{prova_idx}_{st.session_state.get('prova_tentativa', 0)}"
+        gravacao_prova = live_capture.recorder(
+            key=f"prova_mic_{prova_idx}_{st.session_state.get('prova_tentativa', 0)}",
+            phrase=str(atual_q['en']),
         )
 
-    if gravacao_prova:
-        audio_data_p = io.BytesIO(gravacao_prova['bytes'])
-        with wave.open(audio_data_p, 'rb') as wf_p:
-            rec_p = KaldiRecognizer(model_vosk, wf_p.getframerate())
-            rec_p.AcceptWaveform(wf_p.readframes(wf_p.getnframes()))
-            ouvida_p = json.loads(rec_p.FinalResult()).get("text", "").lower()
+    tentativa_prova = attempt_cache.evaluate(
+        gravacao_prova, str(atual_q['en']), lambda: ouvir_gravacao(gravacao_prova, str(atual_q['en'])))
+    if tentativa_prova is not None:
+        ouvida_p = tentativa_prova["recognized"]["text"]
 
         # O sistema entendeu
         _ouvi_p = ouvida_p.upper() if ouvida_p.strip() else "(silêncio detectado)"
@@ -2412,30 +2444,19 @@ elif st.session_state['pagina'] == 'prova_oral':
 """, unsafe_allow_html=True)
 
         # Feedback verde/vermelho
-        alvo_p = limpar(atual_q['en']).split()
-        dito_p = limpar(ouvida_p).split()
-
-        fb_html_p = '<div class="fb-container">'
-        acertos_p = 0
-        for idx_p, p in enumerate(alvo_p):
-            if idx_p < len(dito_p) and dito_p[idx_p] == p:
-                fb_html_p += f'<span class="fb-word fb-correct">{p.upper()}</span>'
-                acertos_p += 1
-            else:
-                fb_html_p += f'<span class="fb-word fb-wrong">{p.upper()}</span>'
-        fb_html_p += '</div>'
-        st.markdown(fb_html_p, unsafe_allow_html=True)
-
-        # Rastrear erros na prova tambem
-        _wrong_p = [p for i, p in enumerate(alvo_p) if i >= len(dito_p) or dito_p[i] != p]
-        database.record_word_errors(username, _wrong_p, alvo_p)
+        avaliacao_p = tentativa_prova["evaluation"]
+        alvo_p = avaliacao_p["target"]
+        acertos_p = avaliacao_p["correct_count"]
+        st.markdown(feedback_html(avaliacao_p), unsafe_allow_html=True)
 
-        # Acumuladores
-        st.session_state['prova_acertos'] = int(st.session_state.get('prova_acertos', 0)) + acertos_p
-        st.session_state['prova_total_palavras'] = int(st.session_state.get('prova_total_palavras', 0)) + len(alvo_p)
+        # Erros por palavra + acumuladores: uma vez por gravacao (reruns nao somam de novo)
+        if attempt_cache.claim(tentativa_prova):
+            database.record_word_errors_async(username, avaliacao_p["wrong_words"], alvo_p)
+            st.session_state['prova_acertos'] = int(st.session_state.get('prova_acertos', 0)) + acertos_p
+            st.session_state['prova_total_palavras'] = int(st.session_state.get('prova_total_palavras', 0)) + len(alvo_p)
 
         # Score parcial
-        _pct_q = int((acertos_p / len(alvo_p)) * 100) if len(alvo_p) > 0 else 0
+        _pct_q = avaliacao_p["score"]
         _pct_cls = "success" if _pct_q >= 80 else "fail"
         st.markdown(f"""
 <div class="result-pct {_pct_cls}" style="text-align:center;">
@@ -0,0 +1,76 @@
+# attempt_cache.py — Cache por sessao das tentativas ja reconhecidas
+#
+# O Streamlit reexecuta o script inteiro a cada interacao (toast, botao,
+# expander). Enquanto a gravacao continua no widget, cada rerun voltaria a
+# decodificar os mesmos bytes, gravar de novo os erros por palavra e dar XP
+# de novo. Aqui cada tentativa e guardada em um LRU da sessao, pela chave
+# SHA-1(bytes da gravacao) + frase alvo, com transcricao, alinhamento e nota:
+#   - `evaluate()` so chama o reconhecimento na primeira vez;
+#   - `claim()` devolve True uma unica vez por tentativa, para os efeitos
+#     colaterais (XP, progresso, erros por palavra) acontecerem exatamente 1x.
+
+import hashlib
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import streamlit as st
+
+import config
+import scoring
+
+_STATE_KEY = "_attempt_cache"
+
+
+def _session_cache() -> OrderedDict:
+    cache = st.session_state.get(_STATE_KEY)
+    if cache is None:
+        cache = st.session_state[_STATE_KEY] = OrderedDict()
+    return cache
+
+
+def attempt_key(audio: bytes, phrase: str) -> str:
+    h = hashlib.sha1(audio)
+    h.update(b"\0")
+    h.update(str(phrase).encode("utf-8"))
+    return h.hexdigest()
+
+
+def evaluate(gravacao: Optional[dict], phrase: str,
+             recognize: Callable[[], Optional[dict]]) -> Optional[dict]:
+    """Tentativa reconhecida e pontuada ({"recognized", "evaluation", ...}) ou None.
+
+    `recognize` so roda se a gravacao ainda nao esta no cache; se ele devolver
+    None (modelo ausente, fila cheia...), nada e guardado e o proximo rerun tenta
+    de novo.
+    """
+    if not gravacao:
+        return None
+    key = attempt_key(gravacao["bytes"], phrase)
+    cache = _session_cache()
+    entry = cache.get(key)
+    if entry is not None:
+        cache.move_to_end(key)
+        return entry
+
+    recognized = recognize()
+    if recognized is None:
+        return None
+    entry = {
+        "key": key,
+        # So o que as paginas usam (sem audio/raw: o cache fica leve na sessao)
+        "recognized": {"text": recognized.get("text", ""), "words": recognized.get("words", [])},
+        "evaluation": scoring.score(phrase, recognized),
+        "applied": False,
+    }
+    cache[key] = entry
+    while len(cache) > config.ATTEMPT_CACHE_SIZE:
+        cache.popitem(last=False)
+    return entry
+
+
+def claim(entry: dict) -> bool:
+    """True so na primeira chamada para a tentativa (efeitos colaterais 1x)."""
+    if entry["applied"]:
+        return False
+    entry["applied"] = True
+    return True
@@ -0,0 +1,198 @@
+# audio_frontend.py — Normalizacao do audio antes do reconhecimento
+#
+# O WAV do navegador chega na taxa que ele escolheu (quase sempre 44.1/48 kHz,
+# as vezes estereo) e com silencio antes e depois da fala. Antes de qualquer
+# decode, o audio passa por aqui (tudo vetorizado com NumPy):
+#   1. estereo -> mono (media dos canais)
+#   2. corte do silencio das pontas por energia (VAD simples por quadros)
+#   3. limite de duracao (AUDIO_MAX_SECONDS)
+#   4. reamostragem para a taxa do modelo (AUDIO_TARGET_RATE, 16 kHz)
+# O corte e o limite vem antes da reamostragem para so filtrar o que sobra.
+# O relatorio diz quantas amostras o decoder deixou de processar.
+#
+# A captura ao vivo chega em quadros de 20 ms: `StreamResampler` reamostra
+# pedaco a pedaco com o mesmo resultado de `resample()` no sinal inteiro (sem
+# o transitorio que filtrar cada quadro isolado poria em toda emenda).
+
+import io
+import time
+import wave
+from typing import Optional
+
+import numpy as np
+
+import config
+
+_FRAME_MS = 20
+_LOWPASS_TAPS = 63
+
+
+def decode_wav(wav_bytes: bytes) -> tuple[np.ndarray, int, int]:
+    """WAV PCM -> (amostras float32 [n, canais] na escala do int16, taxa, canais)."""
+    with wave.open(io.BytesIO(wav_bytes), "rb") as wf:
+        rate = wf.getframerate()
+        channels = wf.getnchannels()
+        width = wf.getsampwidth()
+        raw = wf.readframes(wf.getnframes())
+    if width == 1:
+        x = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) * 256
+    elif width == 2:
+        x = np.frombuffer(raw, dtype="<i2").astype(np.float32)
+    elif width == 4:
+        x = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 65536
+    else:
+        raise ValueError(f"WAV com {width * 8} bits nao suportado")
+    return x[: len(x) - len(x) % channels].reshape(-1, channels), rate, channels
+
+
+def downmix(x: np.ndarray) -> np.ndarray:
+    """[n, canais] -> [n] (media dos canais)."""
+    if x.ndim == 1:
+        return x
+    return x[:, 0] if x.shape[1] == 1 else x.mean(axis=1)
+
+
+def _lowpass_kernel(cutoff: float) -> np.ndarray:
+    """FIR sinc com janela de Hamming; `cutoff` em ciclos por amostra (< 0.5)."""
+    n = np.arange(_LOWPASS_TAPS) - (_LOWPASS_TAPS - 1) / 2
+    h = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(_LOWPASS_TAPS)
+    h /= h.sum()
+    return h.astype(np.float32)
+
+
+def _lowpass(x: np.ndarray, cutoff: float) -> np.ndarray:
+    return np.convolve(x, _lowpass_kernel(cutoff), mode="same")
+
+
+def resample(x: np.ndarray, src_rate: int, dst_rate: int) -> np.ndarray:
+    """Reamostragem linear; ao reduzir a taxa, filtra antes para nao gerar aliasing."""
+    if src_rate == dst_rate or len(x) == 0:
+        return x
+    if dst_rate < src_rate:
+        x = _lowpass(x, 0.45 * dst_rate / src_rate)
+    n_out = int(len(x) * dst_rate / src_rate)
+    t = np.arange(n_out, dtype=np.float64) * (src_rate / dst_rate)
+    return np.interp(t, np.arange(len(x)), x).astype(np.float32)
+
+
+class StreamResampler:
+    """`resample()` em pedacos, com estado entre eles.
+
+    Guarda as ultimas taps-1 amostras de entrada (o filtro de cada emenda ve
+    o pedaco anterior, nao zeros) e a fase da interpolacao (indice absoluto
+    da proxima amostra de saida). `push()` devolve o que ja pode sair;
+    `finish()` fecha a borda final como o mode="same" e devolve o resto.
+    A concatenacao das saidas e igual a `resample()` do sinal inteiro.
+    """
+
+    def __init__(self, src_rate: int, dst_rate: int):
+        self.src_rate, self.dst_rate = src_rate, dst_rate
+        self._step = src_rate / dst_rate
+        self._h = _lowpass_kernel(0.45 * dst_rate / src_rate) if dst_rate < src_rate \
+            else np.ones(1, dtype=np.float32)
+        self._half = (len(self._h) - 1) // 2
+        self._raw = np.zeros(self._half, dtype=np.float32)  # borda esquerda do mode="same"
+        self._y = np.zeros(0, dtype=np.float32)   # saida do filtro ainda usada na interpolacao
+        self._y0 = 0       # indice absoluto de _y[0]
+        self._n_in = 0
+        self._k = 0        # indice absoluto da proxima amostra de saida
+
+    def _filter(self, x: np.ndarray) -> None:
+        self._raw = np.concatenate([self._raw, np.asarray(x, dtype=np.float32)])
+        if len(self._raw) < len(self._h):
+            return
+        y = np.convolve(self._raw, self._h, mode="valid")
+        self._raw = self._raw[len(y):]
+        self._y = np.concatenate([self._y, y])
+
+    def _interp(self, k_end: int) -> np.ndarray:
+        if k_end <= self._k:
+            return np.zeros(0, dtype=np.float32)
+        t = np.arange(self._k, k_end, dtype=np.float64) * self._step
+        out = np.interp(t, self._y0 + np.arange(len(self._y)), self._y).astype(np.float32)
+        self._k = k_end
+        drop = min(len(self._y), int(k_end * self._step) - self._y0)
+        if drop > 0:
+            self._y = self._y[drop:]
+            self._y0 += drop
+        return out
+
+    def push(self, x: np.ndarray) -> np.ndarray:
+        if self.src_rate == self.dst_rate:
+            return x
+        self._n_in += len(x)
+        self._filter(x)
+        last = self._y0 + len(self._y) - 1
+        # Sai a amostra k quando os dois vizinhos (floor(t), floor(t) + 1) ja existem
+        k_end = int(np.ceil(last / self._step)) if last > 0 else 0
+        while k_end > self._k and (k_end - 1) * self._step >= last:
+            k_end -= 1
+        while k_end * self._step < last:
+            k_end += 1
+        return self._interp(k_end)
+
+    def finish(self) -> np.ndarray:
+        if self.src_rate == self.dst_rate or self._n_in == 0:
+            return np.zeros(0, dtype=np.float32)
+        self._filter(np.zeros(self._half, dtype=np.float32))  # borda direita do mode="same"
+        return self._interp(int(self._n_in * self.dst_rate / self.src_rate))
+
+
+def trim_silence(x: np.ndarray, rate: int, pad_ms: int) -> np.ndarray:
+    """Corta o silencio do comeco e do fim (energia RMS por quadros de 20 ms).
+
+    O limiar e o menor entre 3x o ruido de fundo (percentil 10) e 10% do pico,
+    e nunca abaixo de AUDIO_VAD_MIN_RMS, que por sua vez fica limitado a
+    metade do pico: fala baixa (microfone longe/ganho baixo) nao some inteira
+    so por nao passar do piso absoluto. Na duvida, mantem a fala.
+    Devolve vazio (so silencio) quando nada passa do limiar ou quando a
+    gravacao e baixa e sem contraste (pico ate 3x o fundo).
+    """
+    n = max(1, rate * _FRAME_MS // 1000)
+    k = len(x) // n
+    if k == 0:
+        return x
+    frames = x[: k * n].reshape(k, n)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+    noise, peak = np.percentile(rms, 10), rms.max()
+    if peak < config.AUDIO_VAD_MIN_RMS and peak <= noise * 3:
+        return x[:0]
+    threshold = max(min(config.AUDIO_VAD_MIN_RMS, peak * 0.5),
+                    min(noise * 3, peak * 0.1))
+    voiced = np.flatnonzero(rms > threshold)
+    if voiced.size == 0:
+        return x[:0]
+    pad = pad_ms // _FRAME_MS
+    start = max(0, voiced[0] - pad) * n
+    last = voiced[-1] + 1 + pad
+    end = len(x) if last >= k else last * n
+    return x[start:end]
+
+
+def to_pcm16(x: np.ndarray) -> bytes:
+    return np.clip(np.rint(x), -32768, 32767).astype("<i2").tobytes()
+
+
+def prepare(wav_bytes: bytes, target_rate: Optional[int] = None) -> tuple[bytes, int, dict]:
+    """WAV do navegador -> (PCM 16-bit mono na taxa do modelo, taxa, relatorio)."""
+    t0 = time.perf_counter()
+    target_rate = target_rate or config.AUDIO_TARGET_RATE
+    x, rate, channels = decode_wav(wav_bytes)
+    samples_in = x.size
+
+    mono = downmix(x)
+    voiced = trim_silence(mono, rate, config.AUDIO_VAD_PAD_MS) if config.AUDIO_VAD else mono
+    capped = voiced[: int(config.AUDIO_MAX_SECONDS * rate)]
+    out = resample(capped, rate, target_rate)
+
+    report = {
+        "source_rate": rate,
+        "source_channels": channels,
+        "samples_in": samples_in,
+        "samples_out": len(out),
+        "samples_saved": samples_in - len(out),
+        "trimmed_s": round((len(mono) - len(voiced)) / rate, 2),
+        "capped_s": round((len(voiced) - len(capped)) / rate, 2),
+        "frontend_ms": round((time.perf_counter() - t0) * 1000, 1),
+    }
+    return to_pcm16(out), target_rate, report
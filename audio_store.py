@@ -0,0 +1,371 @@
+# audio_store.py — Cache de audio sintetizado enderecado por conteudo
+#
+# Cada audio e guardado uma vez so, com nome = SHA-1 de
+# (texto normalizado, backend + idioma, velocidade, formato). A mesma frase em
+# dois modulos, na aula, na prova oral e no coach cai no mesmo arquivo; mudar
+# o texto no CSV muda a chave, entao nunca se serve audio velho.
+#
+#   - indice em disco (index.json) com tamanho e ultimo acesso de cada audio;
+#     arquivos sem entrada no indice (ex.: copiados de outra maquina) sao
+#     adotados ao abrir o store;
+#   - limite de tamanho (AUDIO_STORE_MAX_MB): acima dele, sai o audio usado ha
+#     mais tempo (LRU). As frases dos modulos (lista gravada pelo
+#     prerender_tts em pinned.json) sao fixas: nao contam no limite nem sao
+#     despejadas, senao um limite pequeno faria as paginas voltarem a
+#     sintetizar no request;
+#   - os MP3 da versao antiga (`{modulo}_{id}.mp3` e `prova_{id}.mp3` soltos
+#     em AUDIOS_DIR, todos gerados pelo gTTS) sao movidos para o store na
+#     primeira abertura, sob a chave da frase do CSV com backend "gtts";
+#   - contadores de acerto/falta/escrita/despejo em `stats()`.
+#
+# No request, as paginas usam `serve()` (devolve o arquivo ou agenda a sintese
+# em background, sem esperar) ou `get_or_create()` quando o audio e pedido pelo
+# aluno e vale a espera (palavra errada no coach).
+
+import atexit
+import csv
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import config
+import tts
+
+INDEX_NAME = "index.json"
+PINNED_NAME = "pinned.json"
+_KEY_RE = re.compile(r"^[0-9a-f]{40}\.(mp3|wav)$")
+
+_lock = threading.RLock()
+_index: Optional[OrderedDict] = None  # chave -> {"size", "fmt", "last"}; ordem = LRU
+_bytes = 0          # audios despejaveis (contam no limite)
+_pinned_bytes = 0   # audios fixos (pinned.json)
+_pins: frozenset = frozenset()
+_pins_mtime: Optional[int] = None
+_dirty = False
+_last_flush = 0.0
+_counters = {"hits": 0, "misses": 0, "puts": 0, "evictions": 0, "errors": 0}
+_pending: set = set()
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+# ---------------------------------------------------------------------------
+# Chave e caminho
+# ---------------------------------------------------------------------------
+
+def normalize_text(text: str) -> str:
+    """Texto como chave: NFC, espacos colapsados. Caixa e pontuacao ficam (mudam a fala)."""
+    return " ".join(unicodedata.normalize("NFC", str(text)).split())
+
+
+def key_for(text: str, lang: str = "en", rate: float = 1.0, fmt: str = "mp3",
+            backend: Optional[str] = None) -> str:
+    voice = f"{(backend or config.TTS_BACKEND).lower()}:{lang}"
+    raw = f"{voice}|{rate:.2f}|{fmt}|{normalize_text(text)}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def path_for(key: str, fmt: str = "mp3") -> str:
+    return os.path.join(config.AUDIO_STORE_DIR, f"{key}.{fmt}")
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+# ---------------------------------------------------------------------------
+# Indice (em memoria + index.json)
+# ---------------------------------------------------------------------------
+
+def _account(key: str, entry: dict, sign: int) -> None:
+    global _bytes, _pinned_bytes
+    if key in _pins:
+        _pinned_bytes += sign * entry["size"]
+    else:
+        _bytes += sign * entry["size"]
+
+
+def _refresh_pins() -> None:
+    """Rele pinned.json se mudou (o prerender_tts roda em outro processo)."""
+    global _pins, _pins_mtime, _bytes, _pinned_bytes
+    path = os.path.join(config.AUDIO_STORE_DIR, PINNED_NAME)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        mtime = None
+    if mtime == _pins_mtime:
+        return
+    try:
+        with open(path, encoding="utf-8") as f:
+            _pins = frozenset(json.load(f))
+    except (OSError, ValueError):
+        _pins = frozenset()
+    _pins_mtime = mtime
+    if _index is not None:
+        _bytes = _pinned_bytes = 0
+        for key, entry in _index.items():
+            _account(key, entry, +1)
+
+
+def _legacy_texts() -> dict:
+    """{nome do MP3 antigo: frase em ingles} para todos os ids dos CSVs dos modulos."""
+    names = {}
+    for _, arquivo, _ in config.MODULOS:
+        modulo = os.path.splitext(arquivo)[0]
+        try:
+            with open(os.path.join(config.CSV_DIR, arquivo), encoding="utf-8", newline="") as f:
+                for row in csv.DictReader(f):
+                    item_id, text = row.get("id"), row.get("en")
+                    if item_id and text and normalize_text(text):
+                        names[f"{modulo}_{item_id}.mp3"] = text
+                        names[f"prova_{item_id}.mp3"] = text
+        except (OSError, csv.Error) as e:
+            print(f"[ERR] audio_store._legacy_texts({arquivo}): {e}")
+    return names
+
+
+def _import_legacy(entries: dict) -> None:
+    """Move para o store os MP3 por modulo/id da versao antiga (gTTS) que ainda estao em AUDIOS_DIR."""
+    try:
+        candidates = [n for n in os.listdir(config.AUDIOS_DIR)
+                      if n.endswith(".mp3") and not _KEY_RE.match(n)]
+    except OSError:
+        return
+    if not candidates:
+        return
+    texts = _legacy_texts()
+    imported = 0
+    for name in candidates:
+        text = texts.get(name)
+        if text is None:
+            continue
+        src = os.path.join(config.AUDIOS_DIR, name)
+        key = key_for(text, backend="gtts")
+        if key in entries:
+            continue  # mesma frase ja veio de outro modulo (ou ja e do store)
+        dst = path_for(key)
+        try:
+            os.replace(src, dst)
+        except OSError:
+            try:  # store em outro disco: copia e deixa o original
+                shutil.copyfile(src, f"{dst}.tmp")
+                os.replace(f"{dst}.tmp", dst)
+            except OSError as e:
+                print(f"[ERR] audio_store._import_legacy({name}): {e}")
+                continue
+        st_ = os.stat(dst)
+        entries[key] = {"size": st_.st_size, "fmt": "mp3", "last": st_.st_mtime}
+        imported += 1
+    if imported:
+        print(f"[INFO] audio_store: {imported} audios antigos importados de {config.AUDIOS_DIR}")
+
+
+def _ensure_loaded() -> OrderedDict:
+    global _index, _last_flush, _pins_mtime
+    if _index is not None:
+        return _index
+    os.makedirs(config.AUDIO_STORE_DIR, exist_ok=True)
+    try:
+        with open(os.path.join(config.AUDIO_STORE_DIR, INDEX_NAME), encoding="utf-8") as f:
+            saved = json.load(f).get("entries", {})
+    except (OSError, ValueError):
+        saved = {}
+
+    entries = {}
+    for name in os.listdir(config.AUDIO_STORE_DIR):
+        if not _KEY_RE.match(name):
+            continue
+        key, fmt = name.split(".")
+        try:
+            st_ = os.stat(os.path.join(config.AUDIO_STORE_DIR, name))
+        except OSError:
+            continue
+        last = saved.get(key, {}).get("last", st_.st_mtime)
+        entries[key] = {"size": st_.st_size, "fmt": fmt, "last": last}
+    if os.path.normpath(config.AUDIOS_DIR) != os.path.normpath(config.AUDIO_STORE_DIR):
+        _import_legacy(entries)
+
+    _index = OrderedDict(sorted(entries.items(), key=lambda kv: kv[1]["last"]))
+    _pins_mtime = -1  # forca a releitura: recalcula _bytes / _pinned_bytes
+    _refresh_pins()
+    _last_flush = time.monotonic()
+    return _index
+
+
+def _flush(force: bool = False) -> None:
+    global _dirty, _last_flush
+    if not _dirty or (not force and time.monotonic() - _last_flush < config.AUDIO_STORE_FLUSH_SECONDS):
+        return
+    try:
+        data = json.dumps({"entries": _index}, separators=(",", ":")).encode("utf-8")
+        write_atomic(os.path.join(config.AUDIO_STORE_DIR, INDEX_NAME), data)
+        _dirty = False
+        _last_flush = time.monotonic()
+    except OSError as e:
+        print(f"[ERR] audio_store._flush: {e}")
+
+
+def _evict(keep: str) -> None:
+    """Despeja do mais antigo para o mais novo ate caber no limite (nunca `keep` nem fixos)."""
+    limit = config.AUDIO_STORE_MAX_MB * 1024 * 1024
+    if _bytes <= limit:
+        return
+    _refresh_pins()
+    for key in list(_index):
+        if _bytes <= limit:
+            break
+        entry = _index[key]
+        if key == keep or key in _pins:
+            continue
+        del _index[key]
+        _account(key, entry, -1)
+        _counters["evictions"] += 1
+        try:
+            os.remove(path_for(key, entry["fmt"]))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"[ERR] audio_store._evict({key}): {e}")
+
+
+# ---------------------------------------------------------------------------
+# API
+# ---------------------------------------------------------------------------
+
+def lookup(key: str, fmt: str = "mp3") -> Optional[str]:
+    """Caminho do audio `key` se esta no store (conta acerto/falta)."""
+    global _dirty
+    with _lock:
+        index = _ensure_loaded()
+        entry = index.get(key)
+        path = path_for(key, fmt)
+        if entry is not None and not os.path.exists(path):  # apagado por fora
+            index.pop(key)
+            _account(key, entry, -1)
+            _dirty = True
+            entry = None
+        if entry is None:
+            _counters["misses"] += 1
+            return None
+        _counters["hits"] += 1
+        entry["last"] = time.time()
+        index.move_to_end(key)
+        _dirty = True
+        _flush()
+        return path
+
+
+def contains(key: str) -> bool:
+    with _lock:
+        return key in _ensure_loaded()
+
+
+def set_pins(keys, replace: bool = True) -> None:
+    """Grava a lista de audios fixos (fora do limite/LRU). Sem `replace`, soma a atual."""
+    with _lock:
+        _ensure_loaded()
+        _refresh_pins()
+        pins = set(keys) if replace else set(_pins) | set(keys)
+        write_atomic(os.path.join(config.AUDIO_STORE_DIR, PINNED_NAME),
+                     json.dumps(sorted(pins)).encode("utf-8"))
+        _refresh_pins()
+
+
+def put(key: str, data: bytes, fmt: str = "mp3") -> str:
+    """Grava o audio (atomico), registra no indice e despeja o excedente."""
+    global _dirty
+    path = path_for(key, fmt)
+    with _lock:
+        index = _ensure_loaded()
+    write_atomic(path, data)
+    with _lock:
+        old = index.pop(key, None)
+        if old is not None:
+            _account(key, old, -1)
+        entry = index[key] = {"size": len(data), "fmt": fmt, "last": time.time()}
+        _account(key, entry, +1)
+        _counters["puts"] += 1
+        _evict(keep=key)
+        _dirty = True
+        _flush()  # arquivo sem entrada no indice e adotado ao abrir; o indice so guarda o LRU
+    return path
+
+
+def get_or_create(text: str, lang: str = "en", rate: float = 1.0, fmt: str = "mp3") -> str:
+    """Caminho do audio de `text`, sintetizando agora se ainda nao existe."""
+    key = key_for(text, lang, rate, fmt)
+    path = lookup(key, fmt)
+    if path is None:
+        path = put(key, tts.synthesize(text, lang=lang, rate=rate, fmt=fmt), fmt)
+    return path
+
+
+def _create_in_background(text: str, lang: str, rate: float, fmt: str, key: str) -> None:
+    try:
+        put(key, tts.synthesize(text, lang=lang, rate=rate, fmt=fmt), fmt)
+    except Exception as e:
+        with _lock:
+            _counters["errors"] += 1
+        print(f"[ERR] audio_store({text[:40]!r}): {e}")
+    finally:
+        with _lock:
+            _pending.discard(key)
+
+
+def serve(text: str, lang: str = "en", rate: float = 1.0, fmt: str = "mp3") -> Optional[str]:
+    """Caminho do audio se ja existe; senao agenda a sintese em background e devolve None."""
+    global _executor
+    if not normalize_text(text):
+        return None
+    key = key_for(text, lang, rate, fmt)
+    path = lookup(key, fmt)
+    if path is not None or not config.TTS_ON_DEMAND:
+        return path
+    with _lock:
+        if key in _pending:
+            return None
+        _pending.add(key)
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=config.TTS_PRERENDER_WORKERS,
+                                           thread_name_prefix="tts-render")
+    _executor.submit(_create_in_background, str(text), lang, rate, fmt, key)
+    return None
+
+
+def flush() -> None:
+    with _lock:
+        if _index is not None:
+            _flush(force=True)
+
+
+atexit.register(flush)  # ultimos acessos (LRU) nao se perdem no shutdown
+
+
+def stats() -> dict:
+    with _lock:
+        index = _ensure_loaded()
+        _refresh_pins()
+        lookups = _counters["hits"] + _counters["misses"]
+        return {
+            **_counters,
+            "hit_rate": round(_counters["hits"] / lookups, 3) if lookups else None,
+            "entries": len(index),
+            "bytes": _bytes,
+            "pinned_bytes": _pinned_bytes,
+            "max_bytes": int(config.AUDIO_STORE_MAX_MB * 1024 * 1024),
+            "pending": len(_pending),
+        }
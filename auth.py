@@ -4,6 +4,7 @@ from __future__ import annotations
 import streamlit as st
 import streamlit_authenticator as stauth
 import database
+import progress_journal
 import config
 import email_service
 import random
@@ -16,10 +17,51 @@ import base64
 from typing import Optional
 
 
+class _OnDemandUsers(dict):
+    """Mapa username -> credenciais que busca cada usuario no banco sob demanda.
+
+    O authenticator so consulta quem esta logando (ou o dono do cookie); em vez
+    de carregar a tabela inteira, com hashes, em cada sessao, cada entrada e
+    buscada no primeiro acesso e guardada.
+    """
+    def _load(self, username):
+        if not isinstance(username, str):
+            return None
+        creds = database.get_user_credentials(username)
+        if creds is not None:
+            dict.__setitem__(self, username, creds)
+        return creds
+
+    def __missing__(self, username):
+        creds = self._load(username)
+        if creds is None:
+            raise KeyError(username)
+        return creds
+
+    def __contains__(self, username):
+        return dict.__contains__(self, username) or self._load(username) is not None
+
+    def get(self, username, default=None):
+        if dict.__contains__(self, username):
+            return dict.__getitem__(self, username)
+        creds = self._load(username)
+        return creds if creds is not None else default
+
+
+class _Credentials(dict):
+    """Mantem o mapa sob demanda quando o authenticator reatribui 'usernames'
+    (ele troca o dict por uma copia com logins minusculos ao inicializar)."""
+    def __setitem__(self, key, value):
+        current = self.get(key)
+        if key == "usernames" and isinstance(current, _OnDemandUsers):
+            current.update(value)
+            return
+        super().__setitem__(key, value)
+
+
 def _build_authenticator():
-    """Constrói o objeto Authenticate a partir dos usuários no banco."""
-    creds = database.get_all_users()
-    if not creds["usernames"]:
+    """Constrói o objeto Authenticate com credenciais buscadas sob demanda."""
+    if not database.has_users():
         return None
 
     # Ler SECRET_KEY em tempo real (st.secrets > config)
@@ -29,7 +71,7 @@ def _build_authenticator():
         cookie_secret = config.SECRET_KEY
 
     authenticator = stauth.Authenticate(
-        credentials={"usernames": creds["usernames"]},
+        credentials=_Credentials(usernames=_OnDemandUsers()),
         cookie_name="ingles_pro_session_v2",
         cookie_key=cookie_secret,
         cookie_expiry_days=30,
@@ -483,6 +525,9 @@ def render_logout(location="sidebar"):
 
         # CUSTOM LOGOUT IMPLEMENTATION (MAIN AREA)
         if st.button("🚪 ENCERRAR SESSÃO", key="logout_btn_main", use_container_width=True):
+            # 0. Grava o progresso que ainda esta na fila write-behind
+            progress_journal.flush(st.session_state.get("username"))
+
             # 1. Clear Authenticator State
             st.session_state["authentication_status"] = None
             st.session_state["username"] = None
@@ -513,6 +558,9 @@ def render_logout(location="sidebar"):
         # CUSTOM LOGOUT IMPLEMENTATION
         # Bypass authenticator.logout bug by handling it manually
         if st.button("🚪 ENCERRAR SESSÃO", key=f"logout_btn_{location}", use_container_width=True):
+            # 0. Grava o progresso que ainda esta na fila write-behind
+            progress_journal.flush(st.session_state.get("username"))
+
             # 1. Clear Authenticator State
             st.session_state["authentication_status"] = None
             st.session_state["username"] = None
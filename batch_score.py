@@ -0,0 +1,218 @@
+"""Pontuacao em lote de gravacoes, fora do Streamlit.
+
+Decodifica uma pasta de WAVs contra as frases de um modulo (CSV) usando o
+mesmo caminho do app (audio_frontend -> Vosk com gramatica da frase ->
+scoring), em paralelo em todos os nucleos: um pool de processos em que cada
+worker carrega o proprio modelo Vosk. Gera CSV ou JSON com transcricao, nota
+e latencia de cada etapa; serve para teste de regressao do scoring e para
+dimensionar a capacidade do servidor.
+
+Cada WAV e casado com a frase pelo `id` do CSV: o nome do arquivo deve
+comecar com o id (ex.: aeroporto_A1_001.wav, aeroporto_A1_001_take2.wav).
+Nomes so com numero (ex.: 7.wav) usam a linha do CSV (1 = primeira frase).
+
+Uso:
+    python batch_score.py gravacoes/ aeroporto.csv
+    python batch_score.py gravacoes/ aeroporto.csv --out resultado.json --workers 4
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd  # noqa: E402
+
+import config  # noqa: E402
+
+FIELDS = [
+    "file", "id", "phrase", "transcript", "score", "correct", "total",
+    "wrong_words", "extra_words", "duration_s", "samples_saved",
+    "read_ms", "frontend_ms", "decode_ms", "score_ms", "total_ms", "pid", "model_load_s", "error",
+]
+
+# Estado de cada processo do pool (preenchido por _init_worker)
+_service = None
+_use_grammar = True
+_load_s = 0.0
+
+
+def _init_worker(model_dir: str, use_grammar: bool) -> None:
+    global _service, _use_grammar, _load_s
+    from vosk import Model, SetLogLevel
+    import recognition_service
+
+    SetLogLevel(-1)
+    t0 = time.perf_counter()
+    model = Model(model_dir)
+    _load_s = time.perf_counter() - t0
+    _service = recognition_service.RecognitionService(model, workers=1, max_queue=1, timeout=3600)
+    _use_grammar = use_grammar
+
+
+def _score_file(path: str, row_id: str, phrase: str) -> dict:
+    import phrase_grammar
+    import scoring
+
+    out = {"file": os.path.basename(path), "id": row_id, "phrase": phrase,
+           "pid": os.getpid(), "model_load_s": round(_load_s, 2)}
+    t0 = time.perf_counter()
+    try:
+        with open(path, "rb") as f:
+            wav_bytes = f.read()
+        t_read = time.perf_counter()
+
+        grammar = phrase_grammar.grammar_for(phrase) if _use_grammar else None
+        result = _service.recognize_result(wav_bytes, grammar=grammar)
+        t_rec = time.perf_counter()
+
+        avaliacao = scoring.score(phrase, result)
+        t_score = time.perf_counter()
+
+        out.update({
+            "transcript": result["text"],
+            "score": avaliacao["score"],
+            "correct": avaliacao["correct_count"],
+            "total": avaliacao["total"],
+            "wrong_words": " ".join(avaliacao["wrong_words"]),
+            "extra_words": " ".join(e["word"] for e in avaliacao["extra"]),
+            "duration_s": round(result["duration_s"], 2),
+            "samples_saved": result["frontend"]["samples_saved"],
+            "read_ms": round((t_read - t0) * 1000, 1),
+            "frontend_ms": result["frontend"]["frontend_ms"],
+            "decode_ms": round(result["decode_ms"], 1),
+            "score_ms": round((t_score - t_rec) * 1000, 1),
+            "total_ms": round((t_score - t0) * 1000, 1),
+        })
+    except Exception as e:
+        out["error"] = str(e)
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Casamento WAV -> frase
+# ---------------------------------------------------------------------------
+
+def load_phrases(csv_arg: str) -> list[dict]:
+    caminho = csv_arg if os.path.exists(csv_arg) else os.path.join(config.CSV_DIR, csv_arg)
+    df = pd.read_csv(caminho, on_bad_lines='skip', encoding='utf-8')
+    return df.fillna("").to_dict('records')
+
+
+def match_files(wav_dir: str, rows: list[dict]) -> tuple[list[tuple[str, str, str]], list[str]]:
+    """[(caminho, id, frase)] dos WAVs com frase conhecida + lista dos sem frase."""
+    ids = sorted((str(r["id"]) for r in rows if r.get("id")), key=len, reverse=True)
+    by_id = {str(r["id"]): r for r in rows}
+    jobs, unmatched = [], []
+    for name in sorted(os.listdir(wav_dir)):
+        if not name.lower().endswith(".wav"):
+            continue
+        stem = os.path.splitext(name)[0]
+        row = None
+        if stem.isdigit() and 1 <= int(stem) <= len(rows):
+            row = rows[int(stem) - 1]
+        else:
+            row_id = next((i for i in ids if stem.startswith(i)), None)
+            row = by_id.get(row_id) if row_id else None
+        if row is None:
+            unmatched.append(name)
+        else:
+            jobs.append((os.path.join(wav_dir, name), str(row.get("id", "")), str(row["en"])))
+    return jobs, unmatched
+
+
+# ---------------------------------------------------------------------------
+# Relatorio
+# ---------------------------------------------------------------------------
+
+def _pct(values: list[float], p: float):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def summarize(results: list[dict], wall_s: float) -> dict:
+    ok = [r for r in results if not r.get("error")]
+    load_times = {r["pid"]: r["model_load_s"] for r in results}  # um por processo
+    audio_s = sum(r["duration_s"] for r in ok)
+    summary = {
+        "files": len(results),
+        "errors": len(results) - len(ok),
+        "mean_score": round(sum(r["score"] for r in ok) / len(ok), 1) if ok else None,
+        "wall_s": round(wall_s, 2),
+        "files_per_s": round(len(results) / wall_s, 2) if wall_s else None,
+        "audio_s": round(audio_s, 1),
+        "model_load_s": load_times,
+    }
+    for stage in ("frontend_ms", "decode_ms", "total_ms"):
+        values = [r[stage] for r in ok]
+        summary[stage] = {"p50": _pct(values, 0.5), "p95": _pct(values, 0.95), "max": max(values, default=None)}
+    return summary
+
+
+def write_report(path: str, results: list[dict], summary: dict) -> None:
+    if path.lower().endswith(".json"):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"summary": summary, "results": results}, f, ensure_ascii=False, indent=2)
+        return
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Pontua uma pasta de WAVs contra um modulo (CSV).")
+    parser.add_argument("wav_dir", help="pasta com as gravacoes .wav")
+    parser.add_argument("csv", help="CSV do modulo (ex.: aeroporto.csv)")
+    parser.add_argument("--out", help="arquivo de saida .csv ou .json (padrao: batch_<modulo>.csv)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="processos (cada um carrega o proprio modelo)")
+    parser.add_argument("--model", default=config.MODEL_DIR, help="pasta do modelo Vosk")
+    parser.add_argument("--no-grammar", action="store_true", help="vocabulario aberto em vez da gramatica da frase")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.model):
+        print(f"[ERR] modelo Vosk nao encontrado em {args.model}")
+        return 1
+
+    rows = load_phrases(args.csv)
+    jobs, unmatched = match_files(args.wav_dir, rows)
+    for name in unmatched:
+        print(f"[WARN] {name}: nenhuma frase de {args.csv} casa com o nome do arquivo")
+    if not jobs:
+        print("[ERR] nenhum WAV para pontuar")
+        return 1
+
+    out = args.out or f"batch_{os.path.splitext(os.path.basename(args.csv))[0]}.csv"
+    workers = max(1, min(args.workers, len(jobs)))
+    print(f"🎙️ {len(jobs)} gravacoes, {workers} processos, modelo {args.model}")
+
+    t0 = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(args.model, not args.no_grammar)) as pool:
+            results = list(pool.map(_score_file, *zip(*jobs)))
+    except BrokenProcessPool:
+        print(f"[ERR] os workers nao conseguiram carregar o modelo em {args.model}")
+        return 1
+    wall_s = time.perf_counter() - t0
+
+    summary = summarize(results, wall_s)
+    write_report(out, results, summary)
+    for r in results:
+        if r.get("error"):
+            print(f"[ERR] {r['file']}: {r['error']}")
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    print(f"✅ Relatorio: {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -65,10 +65,100 @@ ASSETS_DIR: str = os.path.normpath(_assets_raw if os.path.isabs(_assets_raw) els
 # -- Banco de Dados --
 _db_raw: str = _get("DB_PATH", os.path.join(DATA_DIR, "ingles_pro.db"))
 DB_PATH: str = os.path.normpath(_db_raw if os.path.isabs(_db_raw) else os.path.join(BASE_DIR, _db_raw))
+# Maximo de conexoes SQLite abertas ao mesmo tempo (uma por thread de trabalho)
+DB_POOL_SIZE: int = int(_get("DB_POOL_SIZE", "16"))
+
+# -- Journal de progresso (write-behind) --
+# Base do caminho: cada processo trava o primeiro slot livre (PATH, PATH.1, ...)
+PROGRESS_JOURNAL_PATH: str = _get("PROGRESS_JOURNAL_PATH", os.path.join(DATA_DIR, "progress_journal.wal"))
+# Intervalo (s) entre descargas e n. de escritas pendentes que forca descarga imediata
+PROGRESS_FLUSH_INTERVAL: float = float(_get("PROGRESS_FLUSH_INTERVAL", "1.0"))
+PROGRESS_FLUSH_THRESHOLD: int = int(_get("PROGRESS_FLUSH_THRESHOLD", "200"))
+
+# Segundos entre revalidacoes do cache de settings (checagem do contador de versao)
+SETTINGS_REVALIDATE_SECONDS: float = float(_get("SETTINGS_REVALIDATE_SECONDS", "5"))
+
+# -- Reconhecimento de voz (model_registry / recognition_service) --
+# Carrega o modelo Vosk em background assim que o app sobe (durante o login)
+MODEL_PRELOAD: bool = _get("MODEL_PRELOAD", "1").lower() in ("1", "true", "yes")
+# Criado quando o carregamento do modelo termina (usado pelo HEALTHCHECK); vazio desliga
+MODEL_READY_FILE: str = _get("MODEL_READY_FILE", "")
+# Decodes simultaneos, pedidos aguardando na fila e espera maxima (s) por pedido
+RECOGNITION_WORKERS: int = int(_get("RECOGNITION_WORKERS", str(min(4, os.cpu_count() or 1))))
+RECOGNITION_MAX_QUEUE: int = int(_get("RECOGNITION_MAX_QUEUE", "16"))
+RECOGNITION_TIMEOUT: float = float(_get("RECOGNITION_TIMEOUT", "20"))
+# Pontuacao com gramatica restrita a frase alvo (0 = vocabulario aberto do modelo)
+RECOGNITION_GRAMMAR: bool = _get("RECOGNITION_GRAMMAR", "1").lower() in ("1", "true", "yes")
+# Captura ao vivo com reconhecimento incremental (precisa de streamlit-webrtc)
+LIVE_RECOGNITION: bool = _get("LIVE_RECOGNITION", "1").lower() in ("1", "true", "yes")
+RECOGNITION_STREAM_MAX_SECONDS: float = float(_get("RECOGNITION_STREAM_MAX_SECONDS", "30"))
+# Capturas ao vivo abertas ao mesmo tempo (decodificam fora do pool de workers)
+RECOGNITION_MAX_STREAMS: int = int(_get("RECOGNITION_MAX_STREAMS", str(2 * RECOGNITION_WORKERS)))
+WEBRTC_STUN_URL: str = _get("WEBRTC_STUN_URL", "stun:stun.l.google.com:19302")
+
+# -- Pre-processamento do audio (audio_frontend) --
+# Taxa do modelo Vosk, corte de silencio por energia e duracao maxima (s)
+AUDIO_TARGET_RATE: int = int(_get("AUDIO_TARGET_RATE", "16000"))
+AUDIO_VAD: bool = _get("AUDIO_VAD", "1").lower() in ("1", "true", "yes")
+AUDIO_VAD_MIN_RMS: float = float(_get("AUDIO_VAD_MIN_RMS", "150"))
+AUDIO_VAD_PAD_MS: int = int(_get("AUDIO_VAD_PAD_MS", "200"))
+AUDIO_MAX_SECONDS: float = float(_get("AUDIO_MAX_SECONDS", "15"))
+
+# -- Pontuacao (scoring) --
+# Palavra casada com confianca do Vosk abaixo disso nao conta como acerto
+SCORING_MIN_CONF: float = float(_get("SCORING_MIN_CONF", "0.35"))
+# Tentativas ja reconhecidas guardadas por sessao (attempt_cache, LRU)
+ATTEMPT_CACHE_SIZE: int = int(_get("ATTEMPT_CACHE_SIZE", "32"))
+
+# -- Sintese de voz (tts) --
+# Backend: "gtts" (Google, precisa de rede) ou "espeak" (espeak-ng local, offline)
+TTS_BACKEND: str = _get("TTS_BACKEND", "gtts")
+TTS_ESPEAK_BIN: str = _get("TTS_ESPEAK_BIN", "espeak-ng")
+# Espera maxima (s) por um processo de sintese/conversao
+TTS_TIMEOUT: float = float(_get("TTS_TIMEOUT", "30"))
+
+# -- Audio sintetizado (audio_store / prerender_tts) --
+# Sinteses simultaneas no build e no background do app
+TTS_PRERENDER_WORKERS: int = int(_get("TTS_PRERENDER_WORKERS", "4"))
+# Audio que faltar no request e gerado em background (0 = so serve o pre-renderizado)
+TTS_ON_DEMAND: bool = _get("TTS_ON_DEMAND", "1").lower() in ("1", "true", "yes")
+# Enquanto o audio gera, a pagina confere a cada POLL s (desiste apos WAIT s)
+TTS_POLL_SECONDS: float = float(_get("TTS_POLL_SECONDS", "1.5"))
+TTS_WAIT_SECONDS: float = float(_get("TTS_WAIT_SECONDS", "30"))
+# Store enderecado por conteudo: pasta, limite (MB, LRU) e intervalo (s) de gravacao do indice
+_store_raw: str = _get("AUDIO_STORE_DIR", os.path.join(AUDIOS_DIR, "store"))
+AUDIO_STORE_DIR: str = os.path.normpath(_store_raw if os.path.isabs(_store_raw) else os.path.join(BASE_DIR, _store_raw))
+AUDIO_STORE_MAX_MB: float = float(_get("AUDIO_STORE_MAX_MB", "500"))
+AUDIO_STORE_FLUSH_SECONDS: float = float(_get("AUDIO_STORE_FLUSH_SECONDS", "30"))
+# Sessoes prontas do Neural Sleep (uma por modulo / recorte / velocidade)
+_sessions_raw: str = _get("SLEEP_SESSIONS_DIR", os.path.join(AUDIOS_DIR, "sessions"))
+SLEEP_SESSIONS_DIR: str = os.path.normpath(_sessions_raw if os.path.isabs(_sessions_raw) else os.path.join(BASE_DIR, _sessions_raw))
+# Mixagem das sessoes (sleep_mixer): silencio depois de cada fala (s), taxa, volumes e bitrate
+SLEEP_GAP_PT_SECONDS: float = float(_get("SLEEP_GAP_PT_SECONDS", "1.0"))
+SLEEP_GAP_EN_SECONDS: float = float(_get("SLEEP_GAP_EN_SECONDS", "2.5"))
+SLEEP_MIX_RATE: int = int(_get("SLEEP_MIX_RATE", "24000"))
+SLEEP_BINAURAL_BASE_HZ: float = float(_get("SLEEP_BINAURAL_BASE_HZ", "200"))
+SLEEP_VOICE_VOLUME: float = float(_get("SLEEP_VOICE_VOLUME", "1.0"))
+SLEEP_BINAURAL_VOLUME: float = float(_get("SLEEP_BINAURAL_VOLUME", "0.08"))
+SLEEP_AMBIENT_VOLUME: float = float(_get("SLEEP_AMBIENT_VOLUME", "0.25"))
+SLEEP_AMBIENT_MAX_SECONDS: float = float(_get("SLEEP_AMBIENT_MAX_SECONDS", "120"))
+SLEEP_MP3_BITRATE: str = _get("SLEEP_MP3_BITRATE", "96k")
 
 # -- Turso (Banco de Dados Externo) --
 TURSO_DB_URL: str = _get("TURSO_DB_URL", "")
 TURSO_AUTH_TOKEN: str = _get("TURSO_AUTH_TOKEN", "")
+# Replica local opcional (arquivo SQLite sincronizado do Turso para leituras).
+# Vazio = desligado. Acima de MAX_STALENESS segundos sem sync, le do primario.
+_replica_raw: str = _get("TURSO_REPLICA_PATH", "")
+TURSO_REPLICA_PATH: str = (
+    os.path.normpath(_replica_raw if os.path.isabs(_replica_raw) else os.path.join(BASE_DIR, _replica_raw))
+    if _replica_raw else ""
+)
+TURSO_REPLICA_MAX_STALENESS: float = float(_get("TURSO_REPLICA_MAX_STALENESS", "30"))
+TURSO_REPLICA_SYNC_INTERVAL: float = float(_get("TURSO_REPLICA_SYNC_INTERVAL", "10"))
+# Os syncs sao incrementais (updated_at) e detectam deletes pela impressao de cada
+# tabela; a cada N syncs recarrega tudo mesmo assim (rede de seguranca)
+TURSO_REPLICA_FULL_SYNC_EVERY: int = int(_get("TURSO_REPLICA_FULL_SYNC_EVERY", "30"))
 
 # -- Mercado Pago --
 MP_ACCESS_TOKEN: str = _get("MP_ACCESS_TOKEN", "")
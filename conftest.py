@@ -0,0 +1,22 @@
+"""Configuracao comum dos testes (pytest).
+
+A raiz do projeto tem __init__.py, entao o pytest nao a coloca no sys.path
+sozinho: os modulos do app (`import scoring`, `import database`, ...) so sao
+encontrados com a raiz inserida aqui.
+
+O ambiente e fixado antes de qualquer modulo de teste ser importado (o
+config.py le as variaveis no import): banco e journal em um diretorio
+temporario e credenciais do Turso vazias, entao nenhum teste toca o
+ingles_pro.db nem o banco remoto, mesmo com elas exportadas no shell.
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+_TMP = tempfile.mkdtemp(prefix="ingles_pro_test_")
+os.environ["DB_PATH"] = os.path.join(_TMP, "test.db")
+os.environ["PROGRESS_JOURNAL_PATH"] = os.path.join(_TMP, "progress_journal.wal")
+os.environ["TURSO_DB_URL"] = ""
+os.environ["TURSO_AUTH_TOKEN"] = ""
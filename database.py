@@ -1,75 +1,161 @@
 import sqlite3
 import requests
 import json
-from datetime import datetime, timezone
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
 from config import DB_PATH
-from typing import Optional, Any
+from typing import Optional, Any, Iterator
 import streamlit as st
 
 
 # ---------------------------------------------------------------------------
 # DictRow — wrapper p/ acessar resultados como row["coluna"] ou row[0]
 # ---------------------------------------------------------------------------
-class DictRow(dict):
-    """Permite acesso por nome (row['col']) e por indice (row[0])."""
-    def __init__(self, columns: list[str], values: tuple | list):
-        super().__init__(zip(columns, values))
-        self._values = list(values)
+def _decode_row(raw: list) -> tuple:
+    """Converte as celulas Hrana ({"type", "value"}) de uma linha em valores Python.
+
+    Laco inline de proposito: evita uma chamada de funcao por celula.
+    """
+    out = []
+    append = out.append
+    for cell in raw:
+        if cell.__class__ is dict:
+            t = cell.get("type")
+            if t == "text":
+                append(cell.get("value"))
+            elif t == "integer":
+                v = cell.get("value")
+                append(int(v) if v is not None else None)
+            elif t == "null":
+                append(None)
+            elif t == "float":
+                v = cell.get("value")
+                append(float(v) if v is not None else None)
+            elif t is None:
+                append(cell)
+            else:
+                append(cell.get("value"))
+        else:
+            append(cell)
+    return tuple(out)
+
+
+class DictRow:
+    """Permite acesso por nome (row['col']) e por indice (row[0]).
+
+    Linha compacta (`__slots__`): o mapa coluna -> posicao e compartilhado por
+    todas as linhas do resultado, e as celulas cruas so sao decodificadas no
+    primeiro acesso a linha.
+    """
+    __slots__ = ("_index", "_raw", "_values")
+
+    def __init__(self, index: dict[str, int], raw: list):
+        self._index = index
+        self._raw = raw
+        self._values = None
+
+    def _decoded(self) -> tuple:
+        values = self._values
+        if values is None:
+            values = self._values = _decode_row(self._raw)
+            self._raw = None
+        return values
 
     def __getitem__(self, key):
-        if isinstance(key, int):
-            return self._values[key]
-        return super().__getitem__(key)
+        values = self._values
+        if values is None:
+            values = self._decoded()
+        if key.__class__ is str:
+            return values[self._index[key]]
+        return values[key]
+
+    def as_dict(self) -> dict:
+        """Copia para dict (bem mais rapido que dict(row), que vai coluna a coluna)."""
+        values = self._decoded()
+        if len(self._index) == len(values):
+            return dict(zip(self._index, values))
+        return {k: values[i] for k, i in self._index.items()}
+
+    def get(self, key, default=None):
+        pos = self._index.get(key)
+        return default if pos is None else self._decoded()[pos]
 
     def keys(self):
-        return super().keys()
+        return list(self._index)
+
+    def values(self):
+        values = self._decoded()
+        return [values[i] for i in self._index.values()]
+
+    def items(self):
+        values = self._decoded()
+        return [(k, values[i]) for k, i in self._index.items()]
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __eq__(self, other):
+        if isinstance(other, (DictRow, dict)):
+            return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"DictRow({dict(self.items())!r})"
+
+
+def _row_dict(row) -> dict:
+    """dict(row) para linhas de qualquer backend (DictRow usa o caminho rapido)."""
+    if isinstance(row, DictRow):
+        return row.as_dict()
+    return dict(row)
 
 
 # ---------------------------------------------------------------------------
 # Custom Turso Client (Bypass libsql-client compatibility issues)
 # ---------------------------------------------------------------------------
 class CustomResultSet:
+    """Resultado de um statement Hrana; as celulas ficam cruas ate serem lidas."""
     def __init__(self, result_dict):
         self.columns = [c["name"] for c in result_dict.get("cols", [])]
-        raw_rows = result_dict.get("rows", [])
-        self.rows = []
-        for r in raw_rows:
-            parsed_row = []
-            for cell in r:
-                if isinstance(cell, dict) and "type" in cell:
-                    t = cell["type"]
-                    v = cell.get("value")
-                    if t == "integer":
-                        parsed_row.append(int(v) if v is not None else None)
-                    elif t == "float":
-                        parsed_row.append(float(v) if v is not None else None)
-                    elif t == "null":
-                        parsed_row.append(None)
-                    else:
-                        parsed_row.append(v)
-                else:
-                    parsed_row.append(cell)
-            self.rows.append(tuple(parsed_row))
+        self.index = {name: i for i, name in enumerate(self.columns)}
+        self.raw_rows = result_dict.get("rows", [])
+
+    @property
+    def rows(self) -> list[tuple]:
+        """Todas as linhas decodificadas como tuplas."""
+        return [_decode_row(r) for r in self.raw_rows]
 
 class TursoClientCustom:
     def __init__(self, url: str, auth_token: str):
-        self.url = url.replace("libsql://", "https://")
-        if "/v1/execute" not in self.url:
-            self.url = self.url.rstrip("/") + "/v1/execute"
+        base_url = url.replace("libsql://", "https://").rstrip("/")
+        if base_url.endswith("/v1/execute"):
+            base_url = base_url[:-len("/v1/execute")]
+        self.url = base_url + "/v1/execute"
+        # Endpoint Hrana v2: varios statements por request HTTP
+        self.pipeline_url = base_url + "/v2/pipeline"
         self.auth_token = auth_token
         self.headers = {"Authorization": f"Bearer {auth_token}", "Content-Type": "application/json"}
         # Use a Session for connection pooling (HTTP Keep-Alive)
         self.session = requests.Session()
 
-    def execute(self, sql: str, params: list | tuple | None = None) -> CustomResultSet:
-        stmt = {"sql": sql}
-        if params:
-            stmt["args"] = [self._encode_value(v) for v in params]
-        
-        payload = {"stmt": stmt}
+    def _post(self, url: str, payload: dict) -> dict:
+        """POST no Turso com tratamento de erro HTTP. Retorna o JSON da resposta."""
         # Connection management via Session.post
-        resp = self.session.post(self.url, json=payload, headers=self.headers, timeout=15)
-        
+        resp = self.session.post(url, json=payload, headers=self.headers, timeout=15)
+
         if resp.status_code != 200:
             msg = f"Turso HTTP {resp.status_code}: {resp.text}"
             print(f"[TURSO ERR] {msg}")
@@ -80,8 +166,18 @@ class TursoClientCustom:
             except Exception as e:
                 if not isinstance(e, requests.exceptions.JSONDecodeError): raise
             resp.raise_for_status()
-        data = resp.json()
-        
+        return resp.json()
+
+    def _build_stmt(self, sql: str, params: list | tuple | None = None) -> dict:
+        stmt = {"sql": sql}
+        if params:
+            stmt["args"] = [self._encode_value(v) for v in params]
+        return stmt
+
+    def execute(self, sql: str, params: list | tuple | None = None) -> CustomResultSet:
+        payload = {"stmt": self._build_stmt(sql, params)}
+        data = self._post(self.url, payload)
+
         if "result" not in data:
             if "error" in data:
                 raise Exception(f"Turso Error: {data['error']}")
@@ -95,6 +191,83 @@ class TursoClientCustom:
             
         return CustomResultSet(data["result"])
 
+    def execute_batch(self, statements: list[tuple[str, list | tuple | None]]) -> list[CustomResultSet]:
+        """Executa varios statements em UM unico round trip (Hrana /v2/pipeline).
+
+        Os statements rodam em ordem, cada um em auto-commit. Retorna um
+        CustomResultSet por statement; se algum falhar, levanta excecao
+        indicando qual (os anteriores ja foram aplicados).
+        """
+        if not statements:
+            return []
+        requests_list = [
+            {"type": "execute", "stmt": self._build_stmt(sql, params)}
+            for sql, params in statements
+        ]
+        requests_list.append({"type": "close"})
+        data = self._post(self.pipeline_url, {"baton": None, "requests": requests_list})
+
+        results = data.get("results")
+        if not isinstance(results, list) or len(results) < len(statements):
+            raise KeyError(f"Unexpected Turso pipeline response format: {data}")
+
+        result_sets = []
+        for i, res in enumerate(results[:len(statements)]):
+            if res.get("type") != "ok":
+                err = res.get("error") or {}
+                raise Exception(
+                    f"Turso Error (statement {i + 1}/{len(statements)}): "
+                    f"{err.get('message', err)} (Code: {err.get('code', 'UNKNOWN')})"
+                )
+            result_sets.append(CustomResultSet(res["response"].get("result", {})))
+        return result_sets
+
+    def execute_transaction(self, statements: list[tuple[str, list | tuple | None]]) -> list[CustomResultSet]:
+        """Executa statements atomicamente (BEGIN ... COMMIT) em um unico round trip.
+
+        Usa um batch Hrana com condicoes: cada passo so roda se o anterior
+        deu certo, e um ROLLBACK roda no servidor se o COMMIT nao acontecer.
+        Levanta excecao com o primeiro erro (nada fica aplicado nesse caso).
+        """
+        if not statements:
+            return []
+        steps = [{"stmt": {"sql": "BEGIN"}}]
+        for sql, params in statements:
+            steps.append({
+                "condition": {"type": "ok", "step": len(steps) - 1},
+                "stmt": self._build_stmt(sql, params),
+            })
+        commit_step = len(steps)
+        steps.append({"condition": {"type": "ok", "step": commit_step - 1}, "stmt": {"sql": "COMMIT"}})
+        steps.append({
+            "condition": {"type": "not", "cond": {"type": "ok", "step": commit_step}},
+            "stmt": {"sql": "ROLLBACK"},
+        })
+        data = self._post(self.pipeline_url, {
+            "baton": None,
+            "requests": [{"type": "batch", "batch": {"steps": steps}}, {"type": "close"}],
+        })
+
+        results = data.get("results")
+        if not isinstance(results, list) or not results:
+            raise KeyError(f"Unexpected Turso pipeline response format: {data}")
+        res = results[0]
+        if res.get("type") != "ok":
+            err = res.get("error") or {}
+            raise Exception(f"Turso Error: {err.get('message', err)} (Code: {err.get('code', 'UNKNOWN')})")
+
+        batch = res["response"].get("result", {})
+        step_results = batch.get("step_results", [])
+        step_errors = batch.get("step_errors", [])
+        for i, err in enumerate(step_errors[:commit_step + 1]):
+            if err:
+                where = "BEGIN" if i == 0 else ("COMMIT" if i == commit_step else f"statement {i}/{len(statements)}")
+                raise Exception(
+                    f"Turso Error ({where}, transacao revertida): "
+                    f"{err.get('message', err)} (Code: {err.get('code', 'UNKNOWN')})"
+                )
+        return [CustomResultSet(r or {}) for r in step_results[1:commit_step]]
+
     def _encode_value(self, v):
         if isinstance(v, bool):
             return {"type": "integer", "value": "1" if v else "0"}
@@ -116,51 +289,129 @@ class TursoCursor:
     """Emula cursor sqlite3 a partir de um ResultSet."""
     def __init__(self, result_set):
         self._rs = result_set
-        self._rows = []
-        if result_set is not None and hasattr(result_set, 'rows'):
-            cols = list(result_set.columns) if hasattr(result_set, 'columns') else []
-            self._rows = [DictRow(cols, r) for r in result_set.rows]
+        # Linhas cruas + mapa de colunas compartilhado; DictRow so e criada no fetch
+        self._raw = result_set.raw_rows if result_set is not None else []
+        self._cols = result_set.index if result_set is not None else {}
         self._index = 0
         self.description = None
 
     def fetchone(self):
-        if self._index < len(self._rows):
-            row = self._rows[self._index]
+        if self._index < len(self._raw):
+            row = DictRow(self._cols, self._raw[self._index])
             self._index += 1
             return row
         return None
 
     def fetchall(self):
-        remaining = self._rows[self._index:]
-        self._index = len(self._rows)
+        cols = self._cols
+        remaining = [DictRow(cols, r) for r in self._raw[self._index:]]
+        self._index = len(self._raw)
         return remaining
 
     def __iter__(self):
-        return iter(self._rows)
+        cols = self._cols
+        return (DictRow(cols, r) for r in self._raw)
 
 
 # ---------------------------------------------------------------------------
 # TursoConnection — wrapper que faz o client parecer sqlite3.Connection
 # ---------------------------------------------------------------------------
 class TursoConnection:
-    """Adapta o client custom pra interface sqlite3."""
+    """Adapta o client custom pra interface sqlite3.
+
+    Fora de transacao cada statement faz auto-commit no remoto. Dentro de
+    `with conn:` (ou apos `begin()`), as escritas ficam em buffer ate o
+    `commit()`, que envia BEGIN + statements + COMMIT em um unico batch
+    atomico. Leituras dentro da transacao rodam na hora e enxergam apenas
+    o estado ja commitado. O buffer e por thread, pois a conexao e singleton.
+    """
     def __init__(self, client):
         self._client = client
         self._closed = False
+        self._local = threading.local()
+        # Replica local opcional (TursoReplica): recebe as escritas confirmadas
+        self.replica = None
+
+    # -- Estado da transacao (por thread) --
+    @property
+    def _staged(self) -> list[tuple[str, list | tuple | None]]:
+        if not hasattr(self._local, "staged"):
+            self._local.staged = []
+        return self._local.staged
+
+    @property
+    def _depth(self) -> int:
+        return getattr(self._local, "depth", 0)
+
+    @property
+    def in_transaction(self) -> bool:
+        return self._depth > 0
+
+    def begin(self):
+        """Inicia (ou aninha) uma transacao com buffer de escritas."""
+        self._local.depth = self._depth + 1
 
     def execute(self, sql: str, params=None) -> TursoCursor:
-        """Executa SQL e retorna TursoCursor."""
-        rs = self._client.execute(sql, params)
+        """Executa SQL e retorna TursoCursor (escritas em transacao ficam em buffer)."""
+        is_read = _is_read_statement(sql)
+        if self.in_transaction and not is_read:
+            self._staged.append((sql, params))
+            return TursoCursor(None)
+        if is_read:
+            return TursoCursor(self._client.execute(sql, params))
+        with self._writing([(sql, params)]):
+            rs = self._client.execute(sql, params)
         return TursoCursor(rs)
 
+    def execute_batch(self, statements: list[tuple[str, list | tuple | None]]) -> list[TursoCursor]:
+        """Executa varios statements em um unico round trip. Retorna um cursor por statement."""
+        if self.in_transaction:
+            self._staged.extend(statements)
+            return [TursoCursor(None) for _ in statements]
+        with self._writing(statements):
+            result_sets = self._client.execute_batch(statements)
+        return [TursoCursor(rs) for rs in result_sets]
+
     def executescript(self, script: str):
-        """Executa multiplos statements separados por ';'."""
+        """Executa multiplos statements separados por ';' (um unico round trip)."""
         statements = [s.strip() for s in script.split(';') if s.strip()]
-        for stmt in statements:
-            self._client.execute(stmt)
+        self.execute_batch([(stmt, None) for stmt in statements])
 
     def commit(self):
-        pass
+        """Envia as escritas pendentes como um batch atomico (no-op se nao houver)."""
+        staged = self._staged
+        if not staged:
+            return
+        self._local.staged = []
+        with self._writing(staged):
+            self._client.execute_transaction(staged)
+
+    @contextmanager
+    def _writing(self, statements):
+        """Repassa a replica as escritas que o primario confirmou.
+
+        Se o primario falhar, o estado remoto e incerto (o pipeline fora de
+        transacao pode ter aplicado parte): a replica deixa de ser usada ate
+        o proximo sync.
+        """
+        replica = self.replica
+        if replica is None:
+            yield
+            return
+        replica.begin_write()
+        try:
+            try:
+                yield
+            except Exception:
+                replica.invalidate()
+                raise
+            replica.apply(statements)
+        finally:
+            replica.end_write()
+
+    def rollback(self):
+        """Descarta as escritas pendentes (nada foi enviado ao remoto)."""
+        self._local.staged = []
 
     def close(self):
         pass
@@ -170,10 +421,507 @@ class TursoConnection:
             self._closed = True
 
     def __enter__(self):
+        self.begin()
         return self
 
-    def __exit__(self, *args):
-        pass
+    def __exit__(self, exc_type, exc, tb):
+        depth = self._depth - 1
+        self._local.depth = depth
+        if exc_type is not None:
+            # Erro em qualquer nivel invalida a transacao inteira
+            self.rollback()
+        elif depth == 0:
+            try:
+                self.commit()
+            except Exception:
+                self.rollback()
+                raise
+        return False
+
+
+def _is_read_statement(sql: str) -> bool:
+    """True para statements que apenas leem (podem rodar fora do buffer)."""
+    head = sql.lstrip().split(None, 1)
+    return bool(head) and head[0].upper() in ("SELECT", "PRAGMA", "EXPLAIN")
+
+
+# ---------------------------------------------------------------------------
+# Pool de conexoes SQLite (backend local)
+# ---------------------------------------------------------------------------
+# Aplicados uma unica vez, quando a conexao e aberta
+_SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA cache_size=-16000",      # ~16 MB de page cache por conexao
+    "PRAGMA mmap_size=134217728",    # 128 MB mapeados em memoria
+)
+
+
+class PooledSQLiteConnection(sqlite3.Connection):
+    """sqlite3.Connection cujo close() devolve a conexao ao pool em vez de fechar."""
+    _pool: "SQLitePool | None" = None
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.checkin(self)
+        else:
+            super().close()
+
+    def close_for_real(self):
+        super().close()
+
+
+_POOL_WAIT_SLICE = 0.1  # s entre tentativas de recuperar conexoes de threads mortas
+
+
+class SQLitePool:
+    """Pool limitado de conexoes SQLite, com afinidade por thread.
+
+    `checkout()` devolve sempre a mesma conexao para a mesma thread (com
+    contagem de referencias), reaproveita conexoes ociosas e so abre uma nova
+    se houver vaga; com o pool cheio, recupera conexoes de threads que ja
+    morreram (o Streamlit cria uma thread por rerun e muitos chamadores nunca
+    fecham a conexao) e, em ultimo caso, espera ate `timeout` segundos.
+    """
+
+    def __init__(self, path: str, max_size: int = 16, timeout: float = 10.0):
+        self.path = path
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._idle: list[PooledSQLiteConnection] = []
+        # ident da thread -> [thread, conexao, refcount]
+        self._owned: dict[int, list] = {}
+        self._open = 0
+        # hits = conexao ociosa reaproveitada; affine = a thread ja tinha a sua
+        self._stats = {"hits": 0, "affine": 0, "misses": 0, "waits": 0, "reclaimed": 0, "timeouts": 0}
+
+    def _connect(self) -> PooledSQLiteConnection:
+        conn = sqlite3.connect(self.path, factory=PooledSQLiteConnection, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for pragma in _SQLITE_PRAGMAS:
+            conn.execute(pragma)
+        conn._pool = self
+        return conn
+
+    def _release(self, conn: PooledSQLiteConnection):
+        """Devolve a conexao para a fila de ociosas (chamar com o lock)."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            pass
+        self._idle.append(conn)
+        self._cond.notify()
+
+    def _reclaim_dead(self) -> int:
+        """Recupera conexoes presas a threads encerradas (chamar com o lock)."""
+        reclaimed = 0
+        for ident, (thread, conn, _refs) in list(self._owned.items()):
+            if not thread.is_alive():
+                del self._owned[ident]
+                self._release(conn)
+                reclaimed += 1
+        self._stats["reclaimed"] += reclaimed
+        return reclaimed
+
+    def checkout(self) -> PooledSQLiteConnection:
+        me = threading.current_thread()
+        with self._cond:
+            owned = self._owned.get(me.ident)
+            if owned is not None:
+                if owned[0] is me:
+                    owned[2] += 1
+                    self._stats["affine"] += 1
+                    return owned[1]
+                # ident reaproveitado por uma thread nova: a antiga ja morreu
+                del self._owned[me.ident]
+                self._release(owned[1])
+
+            deadline = time.monotonic() + self.timeout
+            waited = False
+            while True:
+                if self._idle or self._reclaim_dead():
+                    conn = self._idle.pop()
+                    self._stats["hits"] += 1
+                    break
+                if self._open < self.max_size:
+                    conn = self._connect()
+                    self._open += 1
+                    self._stats["misses"] += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise sqlite3.OperationalError(
+                        f"Pool SQLite esgotado ({self.max_size} conexoes em uso)"
+                    )
+                if not waited:
+                    self._stats["waits"] += 1
+                    waited = True
+                # Fatias curtas: thread que morre com a conexao nao avisa a
+                # condicao, entao o _reclaim_dead() do topo precisa rodar de novo
+                self._cond.wait(min(remaining, _POOL_WAIT_SLICE))
+
+            self._owned[me.ident] = [me, conn, 1]
+            return conn
+
+    def checkin(self, conn: PooledSQLiteConnection):
+        with self._cond:
+            for ident, owned in self._owned.items():
+                if owned[1] is conn:
+                    owned[2] -= 1
+                    if owned[2] <= 0:
+                        del self._owned[ident]
+                        self._release(conn)
+                    return
+
+    def close_all(self):
+        """Fecha todas as conexoes ociosas e as de threads encerradas."""
+        with self._cond:
+            self._reclaim_dead()
+            while self._idle:
+                self._idle.pop().close_for_real()
+                self._open -= 1
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                **self._stats,
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": len(self._owned),
+                "max_size": self.max_size,
+            }
+
+
+_sqlite_pool: SQLitePool | None = None
+_sqlite_pool_lock = threading.Lock()
+
+
+def _get_sqlite_pool() -> SQLitePool:
+    global _sqlite_pool
+    if _sqlite_pool is None:
+        with _sqlite_pool_lock:
+            if _sqlite_pool is None:
+                import config
+                _sqlite_pool = SQLitePool(DB_PATH, max_size=config.DB_POOL_SIZE)
+    return _sqlite_pool
+
+
+def pool_stats() -> dict:
+    """Estatisticas do pool SQLite local.
+
+    `hits` = conexao ociosa reaproveitada, `misses` = conexao nova,
+    `affine` = re-checkout da thread que ja tinha conexao (nao mede o pool).
+    """
+    return _get_sqlite_pool().stats()
+
+
+# ---------------------------------------------------------------------------
+# Replica local do Turso (leituras em SQLite, escritas no primario)
+# ---------------------------------------------------------------------------
+# Tabelas lidas a cada rerun; o resto (pagamentos, erros por palavra) vai ao primario
+_REPLICA_TABLES = ("users", "settings", "progress", "module_progress", "lesson_scores")
+
+# Colunas que nunca saem do primario: a replica guarda o valor SQL ao lado (o
+# login e a verificacao de email leem direto do primario)
+_REPLICA_REDACTED = {"users": {"password_hash": "''", "verification_code": "NULL"}}
+
+# O sync incremental rele as linhas com updated_at ate este tanto antes da
+# marca: updated_at vem do relogio de cada instancia, que pode estar atrasado
+_REPLICA_MARK_OVERLAP_S = 120
+
+_WRITE_TARGET_RE = re.compile(
+    r"^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+[\"`\[]?(\w+)",
+    re.IGNORECASE,
+)
+
+
+def _replica_select(table: str, cols: list[str], since: str | None) -> tuple[str, tuple | None]:
+    """SELECT do sync: colunas de credencial trocadas por valor fixo; `since` = so o que mudou."""
+    redacted = _REPLICA_REDACTED.get(table, {})
+    exprs = ", ".join(f"{redacted[c]} AS {c}" if c in redacted else c for c in cols)
+    if since is None:
+        return f"SELECT {exprs} FROM {table}", None
+    return f"SELECT {exprs} FROM {table} WHERE updated_at >= ?", (since,)
+
+
+def _replica_fingerprint(table: str, cols: list[str]) -> str:
+    """Impressao barata da tabela (COUNT + soma dos ids): muda com delete ou linha perdida."""
+    return f"SELECT COUNT(*), {'TOTAL(id)' if 'id' in cols else '0'} FROM {table}"
+
+
+def _rewind_mark(mark: str | None) -> str | None:
+    """Marca de updated_at menos _REPLICA_MARK_OVERLAP_S (None = buscar tudo)."""
+    if not mark:
+        return None
+    try:
+        ts = datetime.fromisoformat(mark)
+    except ValueError:
+        return None
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return (ts - timedelta(seconds=_REPLICA_MARK_OVERLAP_S)).isoformat()
+
+
+class TursoReplica:
+    """Espelho SQLite local das tabelas quentes do Turso.
+
+    - `sync()` puxa schema + linhas em UM request de pipeline e aplica tudo
+      em uma transacao (leitores continuam vendo o snapshot anterior ate o
+      commit, gracas ao WAL). O sync e incremental: das tabelas com
+      updated_at so vem o que mudou desde a maior marca vista (menos uma
+      folga para relogios atrasados). Junto vem uma impressao de cada tabela
+      incremental (COUNT + soma dos ids): se a copia local nao bater depois
+      de aplicar as linhas, houve delete (ou linha perdida) no primario e a
+      tabela e recarregada inteira na hora, dentro do mesmo sync. A cada
+      `full_sync_every` syncs (e apos mudanca de schema) tudo e recarregado.
+    - Colunas de credencial (`_REPLICA_REDACTED`) nao sao copiadas: o sync
+      le um valor fixo no lugar e `apply` apaga o que uma escrita local gravou.
+    - Escritas confirmadas pelo primario sao reaplicadas aqui (`apply`), o
+      que da read-your-writes sem esperar o proximo sync. Um contador de
+      geracao descarta syncs que se cruzaram com uma escrita, para um snapshot
+      antigo nunca sobrescrever uma escrita mais nova.
+    - `fresh()` so e True se o ultimo sync tem no maximo `max_staleness`
+      segundos; fora disso (ou apos uma escrita com resultado incerto) as
+      leituras voltam para o primario.
+    """
+
+    def __init__(self, client: TursoClientCustom, path: str,
+                 max_staleness: float = 30.0, sync_interval: float = 10.0, pool_size: int = 16,
+                 full_sync_every: int = 30):
+        self.client = client
+        self.path = path
+        self.max_staleness = max_staleness
+        self.sync_interval = sync_interval
+        self.full_sync_every = full_sync_every
+        self.pool = SQLitePool(path, max_size=pool_size)
+
+        self._lock = threading.Lock()
+        self._writer = self.pool._connect()   # conexao propria, fora do pool de leitura
+        self._writer._pool = None
+        self._generation = 0
+        self._writes_in_flight = 0
+        self._synced_at: float | None = None
+        self._marks: dict[str, str] = {}     # tabela -> maior updated_at ja aplicado
+        self._syncs_since_full = 0
+        self._reload: set[str] = set()        # tabelas divergentes: proximo fetch vem inteiro
+        self._stats_lock = threading.Lock()
+        self._stats = {"syncs": 0, "full_syncs": 0, "rows_synced": 0, "syncs_discarded": 0, "sync_errors": 0,
+                       "deletes_detected": 0,
+                       "writes_applied": 0, "invalidations": 0, "reads_local": 0, "reads_primary": 0}
+
+        self._thread = threading.Thread(target=self._run, name="turso-replica", daemon=True)
+        self._thread.start()
+
+    # -- Sync --
+
+    def sync(self, _retry: bool = True) -> bool:
+        """Traz do primario o que mudou. Retorna False se falhou ou foi descartado."""
+        with self._lock:
+            generation = self._generation
+            plan = self._plan()
+        started = time.monotonic()
+        placeholders = ", ".join("?" * len(_REPLICA_TABLES))
+        # Tabelas incrementais levam uma impressao para detectar deletes
+        checked = [t for t, (_, since) in plan.items() if since is not None]
+        try:
+            result_sets = self.client.execute_batch(
+                [(f"""
+                    SELECT type, name, tbl_name, sql FROM sqlite_master
+                    WHERE type IN ('table', 'index') AND sql IS NOT NULL
+                      AND tbl_name IN ({placeholders})
+                """, _REPLICA_TABLES)]
+                + [_replica_select(t, cols, since) for t, (cols, since) in plan.items()]
+                + [(_replica_fingerprint(t, plan[t][0]), None) for t in checked]
+            )
+        except Exception as e:
+            self._count("sync_errors")
+            print(f"[ERR] replica sync: {e}")
+            return False
+
+        schema = result_sets[0]
+        fetched = dict(zip(plan, result_sets[1:1 + len(plan)]))
+        remote = {t: tuple(rs.rows[0]) for t, rs in zip(checked, result_sets[1 + len(plan):])}
+        with self._lock:
+            if self._generation != generation or self._writes_in_flight:
+                # Uma escrita cruzou o fetch: este snapshot pode ser anterior a ela
+                self._count("syncs_discarded")
+                return False
+            try:
+                rebuilt = self._load(schema, {t: (rs, plan[t][1] is None) for t, rs in fetched.items()})
+                diverged = {t for t in checked if not rebuilt
+                            and tuple(self._writer.execute(_replica_fingerprint(t, plan[t][0])).fetchone()) != remote[t]}
+            except Exception as e:
+                self._count("sync_errors")
+                print(f"[ERR] replica sync (local): {e}")
+                return False
+            self._reload |= diverged
+            if diverged:
+                self._count("deletes_detected")
+            elif not rebuilt:
+                self._synced_at = started
+                self._count("syncs")
+        if rebuilt or diverged:
+            # Schema novo (ou primeira vez) / delete no primario: essas tabelas
+            # vem inteiras no proximo fetch, que roda ja
+            return _retry and self.sync(_retry=False)
+        return True
+
+    def _plan(self) -> dict[str, tuple[list[str], str | None]]:
+        """{tabela: (colunas locais, updated_at minimo ou None = tabela inteira)} (chamar com _lock)."""
+        full = self._syncs_since_full >= self.full_sync_every
+        plan = {}
+        for table in _REPLICA_TABLES:
+            cols = [r[1] for r in self._writer.execute(f"PRAGMA table_info({table})")]
+            if not cols:
+                continue  # ainda sem schema local: o _load cria a tabela
+            mark = None if full or table in self._reload or "updated_at" not in cols else self._marks.get(table)
+            plan[table] = (cols, _rewind_mark(mark))
+        return plan
+
+    def _load(self, schema: CustomResultSet, tables: dict[str, tuple[CustomResultSet, bool]]) -> bool:
+        """Aplica o schema e as linhas buscadas (chamar com _lock).
+
+        `tables` = {tabela: (linhas, veio inteira?)}. Retorna True se alguma
+        tabela foi criada/recriada (o conteudo dela precisa de um novo fetch).
+        """
+        conn = self._writer
+        ddl = {name: (kind, tbl, sql) for kind, name, tbl, sql in schema.rows}
+        conn.execute("CREATE TABLE IF NOT EXISTS _replica_schema (name TEXT PRIMARY KEY, sql TEXT)")
+        local = {r[0]: r[1] for r in conn.execute("SELECT name, sql FROM _replica_schema")}
+        rebuilt = set()
+        marks = {}
+        with conn:
+            for table in _REPLICA_TABLES:
+                entry = ddl.get(table)
+                if entry is None:
+                    continue
+                if local.get(table) != entry[2] or table not in tables:
+                    # Tabela nova ou schema mudou no primario: recria vazia
+                    conn.execute(f"DROP TABLE IF EXISTS {table}")
+                    conn.execute(entry[2])
+                    conn.execute("INSERT OR REPLACE INTO _replica_schema (name, sql) VALUES (?, ?)", (table, entry[2]))
+                    rebuilt.add(table)
+                    continue
+                rs, full = tables[table]
+                if full:
+                    conn.execute(f"DELETE FROM {table}")
+                    self._reload.discard(table)
+                if rs.raw_rows:
+                    rows = rs.rows
+                    cols = ", ".join(rs.columns)
+                    qmarks = ", ".join("?" * len(rs.columns))
+                    conn.executemany(f"INSERT OR REPLACE INTO {table} ({cols}) VALUES ({qmarks})", rows)
+                    self._count("rows_synced", len(rows))
+                    i = rs.index.get("updated_at")
+                    if i is not None:
+                        seen = [r[i] for r in rows if r[i]]
+                        if seen:
+                            marks[table] = max(seen)
+            for name, (kind, tbl, sql) in ddl.items():
+                if kind == "index" and (local.get(name) != sql or tbl in rebuilt):
+                    conn.execute(f"DROP INDEX IF EXISTS {name}")
+                    conn.execute(sql)
+                    conn.execute("INSERT OR REPLACE INTO _replica_schema (name, sql) VALUES (?, ?)", (name, sql))
+
+        for table in rebuilt:
+            self._marks.pop(table, None)
+        for table, mark in marks.items():
+            if mark > self._marks.get(table, ""):
+                self._marks[table] = mark
+        if rebuilt:
+            self._syncs_since_full = self.full_sync_every
+        elif all(full for _, full in tables.values()):
+            self._syncs_since_full = 0
+            self._count("full_syncs")
+        else:
+            self._syncs_since_full += 1
+        return bool(rebuilt)
+
+    def _run(self):
+        while True:
+            self.sync()
+            time.sleep(self.sync_interval)
+
+    # -- Escritas (chamadas pelo TursoConnection) --
+
+    def begin_write(self):
+        with self._lock:
+            self._generation += 1
+            self._writes_in_flight += 1
+
+    def end_write(self):
+        with self._lock:
+            self._writes_in_flight -= 1
+
+    def apply(self, statements: list[tuple[str, list | tuple | None]]):
+        """Reaplica localmente escritas ja confirmadas no primario."""
+        with self._lock:
+            if self._synced_at is None:
+                return
+            try:
+                with self._writer as conn:
+                    touched = set()
+                    for sql, params in statements:
+                        m = _WRITE_TARGET_RE.match(sql)
+                        if m is None:
+                            if not _is_read_statement(sql):
+                                raise ValueError(f"statement nao replicavel: {sql.split(None, 1)[0]}")
+                            continue
+                        table = m.group(1).lower()
+                        if table in _REPLICA_TABLES:
+                            conn.execute(sql, params or ())
+                            touched.add(table)
+                    for table in touched & _REPLICA_REDACTED.keys():
+                        redacted = _REPLICA_REDACTED[table]
+                        conn.execute(
+                            f"UPDATE {table} SET {', '.join(f'{c} = {v}' for c, v in redacted.items())} "
+                            f"WHERE {' OR '.join(f'{c} IS NOT {v}' for c, v in redacted.items())}"
+                        )
+                self._count("writes_applied", len(statements))
+            except Exception as e:
+                print(f"[WARN] replica: escrita nao reaplicada ({e}); lendo do primario ate o proximo sync")
+                self._invalidate_locked()
+
+    def invalidate(self):
+        with self._lock:
+            self._invalidate_locked()
+
+    def _invalidate_locked(self):
+        self._synced_at = None
+        self._count("invalidations")
+
+    # -- Leitura --
+
+    def fresh(self) -> bool:
+        synced_at = self._synced_at
+        return synced_at is not None and time.monotonic() - synced_at <= self.max_staleness
+
+    def _count(self, name: str, n: int = 1):
+        # Lock proprio: leitores contam sem esperar um sync que segura _lock
+        with self._stats_lock:
+            self._stats[name] += n
+
+    def stats(self) -> dict:
+        synced_at = self._synced_at
+        with self._stats_lock:
+            counters = dict(self._stats)
+        return {
+            **counters,
+            "age_s": None if synced_at is None else round(time.monotonic() - synced_at, 3),
+            "fresh": self.fresh(),
+            "pool": self.pool.stats(),
+        }
+
+
+def replica_stats() -> dict | None:
+    """Estado da replica local do Turso (None se o modo replica estiver desligado)."""
+    if _turso_singleton is None or _turso_singleton.replica is None:
+        return None
+    return _turso_singleton.replica.stats()
 
 
 # ---------------------------------------------------------------------------
@@ -184,7 +932,10 @@ _turso_singleton: TursoConnection | None = None
 
 
 def _get_conn():
-    """Retorna conexao reutilizavel (singleton para Turso, nova para SQLite)."""
+    """Retorna conexao reutilizavel (singleton para Turso, do pool para SQLite).
+
+    No SQLite a conexao pertence a thread atual; `close()` a devolve ao pool.
+    """
     global _using_turso, _turso_singleton
     import config
 
@@ -196,18 +947,55 @@ def _get_conn():
             client = TursoClientCustom(config.TURSO_DB_URL, config.TURSO_AUTH_TOKEN)
             _using_turso = True
             _turso_singleton = TursoConnection(client)
+            if config.TURSO_REPLICA_PATH:
+                _turso_singleton.replica = TursoReplica(
+                    TursoClientCustom(config.TURSO_DB_URL, config.TURSO_AUTH_TOKEN),
+                    config.TURSO_REPLICA_PATH,
+                    max_staleness=config.TURSO_REPLICA_MAX_STALENESS,
+                    sync_interval=config.TURSO_REPLICA_SYNC_INTERVAL,
+                    pool_size=config.DB_POOL_SIZE,
+                    full_sync_every=config.TURSO_REPLICA_FULL_SYNC_EVERY,
+                )
             return _turso_singleton
         except Exception as e:
             print(f"ERRO DE CONEXAO TURSO CUSTOM: {e}. Usando SQLite local.")
 
     # Fallback SQLite Local
     _using_turso = False
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA journal_mode=WAL")
+    return _get_sqlite_pool().checkout()
+
+
+def _get_read_conn():
+    """Conexao para leituras quentes: a replica local se estiver fresca.
+
+    Sem replica (ou com ela atrasada alem de TURSO_REPLICA_MAX_STALENESS)
+    devolve a mesma conexao de `_get_conn()`. Nunca usar para escrever.
+    """
+    conn = _get_conn()
+    replica = getattr(conn, "replica", None)
+    if replica is None:
+        return conn
+    if replica.fresh():
+        replica._count("reads_local")
+        return replica.pool.checkout()
+    replica._count("reads_primary")
     return conn
 
 
+def _execute_batch(conn, statements: list[tuple[str, list | tuple | None]]) -> list:
+    """Executa uma lista de (sql, params) e faz commit.
+
+    No Turso vira um unico request de pipeline (ou entra no buffer, se houver
+    transacao aberta); no SQLite local roda em sequencia na mesma conexao.
+    Retorna um cursor por statement.
+    """
+    if isinstance(conn, TursoConnection):
+        return conn.execute_batch(statements)
+    cursors = [conn.execute(sql, params or ()) for sql, params in statements]
+    conn.commit()
+    return cursors
+
+
 def init_db() -> None:
     """Cria as tabelas se nao existirem."""
     conn = _get_conn()
@@ -264,93 +1052,172 @@ def init_db() -> None:
             created_at  TEXT    DEFAULT (datetime('now')),
             FOREIGN KEY (username) REFERENCES users(username)
         );
+
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version     INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at  TEXT    DEFAULT (datetime('now'))
+        );
     """)
     conn.commit()
     _check_migrations()
 
-def _check_migrations():
-    """Verifica e aplica migracoes de schema necessarias (ex: is_admin).
-    OTIMIZADO: usa uma unica conexao e um unico commit."""
-    conn = _get_conn()
-    try:
-        # Check if is_admin exists
-        cursor = conn.execute("PRAGMA table_info(users)")
-        columns = [row[1] for row in cursor.fetchall()]
-        if "is_admin" not in columns:
-            print("[MIGRATION] Adicionando coluna is_admin na tabela users...")
-            conn.execute("ALTER TABLE users ADD COLUMN is_admin BOOLEAN DEFAULT 0")
-
-        # Email auth migrations
-        if "email" not in columns:
-            print("[MIGRATION] Adicionando colunas de email na tabela users...")
-            conn.execute("ALTER TABLE users ADD COLUMN email TEXT")
-            conn.execute("ALTER TABLE users ADD COLUMN email_verified BOOLEAN DEFAULT 0")
-            conn.execute("ALTER TABLE users ADD COLUMN verification_code TEXT")
-
-        if "is_premium" not in columns:
-            print("[MIGRATION] Adicionando coluna is_premium na tabela users...")
-            conn.execute("ALTER TABLE users ADD COLUMN is_premium BOOLEAN DEFAULT 0")
-
-        if "plan_type" not in columns:
-            print("[MIGRATION] Adicionando colunas de plano na tabela users...")
-            conn.execute("ALTER TABLE users ADD COLUMN plan_type TEXT DEFAULT 'free'")
-            conn.execute("ALTER TABLE users ADD COLUMN premium_until TEXT")
-
-        # Settings table migration
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS settings (
-                key   TEXT PRIMARY KEY,
-                value TEXT
-            )
-        """)
-        
-        # Initialize default settings if not present
-        _init_default_settings(conn)
+# ---------------------------------------------------------------------------
+# Migracoes versionadas (tabela schema_version)
+# ---------------------------------------------------------------------------
 
-        # Lesson scores table (best score per lesson for badges)
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS lesson_scores (
-                id          INTEGER PRIMARY KEY AUTOINCREMENT,
-                username    TEXT    NOT NULL,
-                module_file TEXT    NOT NULL,
-                lesson_idx  INTEGER NOT NULL,
-                best_score  INTEGER DEFAULT 0,
-                updated_at  TEXT    DEFAULT (datetime('now')),
-                UNIQUE(username, module_file, lesson_idx),
-                FOREIGN KEY (username) REFERENCES users(username)
-            )
-        """)
+def _migration_v1(conn):
+    """Schema legado: colunas novas de users + tabelas auxiliares + settings padrao."""
+    cursor = conn.execute("PRAGMA table_info(users)")
+    columns = [row[1] for row in cursor.fetchall()]
+    if "is_admin" not in columns:
+        conn.execute("ALTER TABLE users ADD COLUMN is_admin BOOLEAN DEFAULT 0")
+
+    # Email auth migrations
+    if "email" not in columns:
+        conn.execute("ALTER TABLE users ADD COLUMN email TEXT")
+    if "email_verified" not in columns:
+        conn.execute("ALTER TABLE users ADD COLUMN email_verified BOOLEAN DEFAULT 0")
+    if "verification_code" not in columns:
+        conn.execute("ALTER TABLE users ADD COLUMN verification_code TEXT")
+
+    if "is_premium" not in columns:
+        conn.execute("ALTER TABLE users ADD COLUMN is_premium BOOLEAN DEFAULT 0")
+
+    if "plan_type" not in columns:
+        conn.execute("ALTER TABLE users ADD COLUMN plan_type TEXT DEFAULT 'free'")
+    if "premium_until" not in columns:
+        conn.execute("ALTER TABLE users ADD COLUMN premium_until TEXT")
+
+    # Initialize default settings if not present
+    _init_default_settings(conn)
+
+    # Lesson scores table (best score per lesson for badges)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS lesson_scores (
+            id          INTEGER PRIMARY KEY AUTOINCREMENT,
+            username    TEXT    NOT NULL,
+            module_file TEXT    NOT NULL,
+            lesson_idx  INTEGER NOT NULL,
+            best_score  INTEGER DEFAULT 0,
+            updated_at  TEXT    DEFAULT (datetime('now')),
+            UNIQUE(username, module_file, lesson_idx),
+            FOREIGN KEY (username) REFERENCES users(username)
+        )
+    """)
 
-        # Word errors table (adaptive learning — tracks per-word error counts)
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS word_errors (
-                id          INTEGER PRIMARY KEY AUTOINCREMENT,
-                username    TEXT    NOT NULL,
-                word        TEXT    NOT NULL,
-                error_count INTEGER DEFAULT 0,
-                total_seen  INTEGER DEFAULT 0,
-                last_seen   TEXT,
-                UNIQUE(username, word),
-                FOREIGN KEY (username) REFERENCES users(username)
-            )
-        """)
+    # Word errors table (adaptive learning — tracks per-word error counts)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS word_errors (
+            id          INTEGER PRIMARY KEY AUTOINCREMENT,
+            username    TEXT    NOT NULL,
+            word        TEXT    NOT NULL,
+            error_count INTEGER DEFAULT 0,
+            total_seen  INTEGER DEFAULT 0,
+            last_seen   TEXT,
+            UNIQUE(username, word),
+            FOREIGN KEY (username) REFERENCES users(username)
+        )
+    """)
 
-        # Payments table migration
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS payments (
-                id          INTEGER PRIMARY KEY AUTOINCREMENT,
-                username    TEXT,
-                payment_id  TEXT,
-                status      TEXT,
-                amount      REAL,
-                currency    TEXT,
-                external_reference TEXT,
-                created_at  TEXT    DEFAULT (datetime('now')),
-                FOREIGN KEY (username) REFERENCES users(username)
-            )
-        """)
-        # Um unico commit para todas as migracoes
-        conn.commit()
+
+def _migration_v2(conn):
+    """Indices secundarios para as consultas quentes."""
+    # get_weak_words / analytics: filtra por aluno, ordena por erros (cobre a consulta)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_word_errors_user_errors
+            ON word_errors (username, error_count DESC, word, total_seen)
+    """)
+    # analytics: todas as notas do aluno sem tocar na tabela
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_lesson_scores_user
+            ON lesson_scores (username, module_file, lesson_idx, best_score)
+    """)
+    # subconsulta de get_all_users_detailed: ultimo pagamento aprovado do aluno
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_payments_user_created
+            ON payments (username, created_at, status, payment_id)
+    """)
+    # get_all_payments: listagem por data sem ordenar em memoria
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_payments_created
+            ON payments (created_at)
+    """)
+    # get_expiring_users: indice parcial por data de expiracao
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_users_premium_until
+            ON users (date(premium_until))
+            WHERE is_premium = 1 AND premium_until IS NOT NULL
+    """)
+    # cadastro: checagem de email duplicado (case-insensitive)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_users_email_lower
+            ON users (lower(email))
+    """)
+
+
+def _migration_v3(conn):
+    """Busca de credenciais por login sem diferenciar maiusculas."""
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_users_username_lower
+            ON users (lower(username))
+    """)
+
+
+def _migration_v4(conn):
+    """users.updated_at mantido por triggers (marca do sync incremental da replica)."""
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(users)").fetchall()]
+    if "updated_at" not in columns:
+        conn.execute("ALTER TABLE users ADD COLUMN updated_at TEXT")
+    # Mesmo formato do datetime.isoformat() das outras tabelas (UTC)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_users_touch_insert AFTER INSERT ON users
+        BEGIN
+            UPDATE users SET updated_at = strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now') WHERE id = NEW.id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_users_touch_update AFTER UPDATE ON users
+        WHEN NEW.updated_at IS OLD.updated_at
+        BEGIN
+            UPDATE users SET updated_at = strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now') WHERE id = NEW.id;
+        END
+    """)
+
+
+# (versao, descricao, funcao) — sempre acrescentar no final, nunca reordenar
+_MIGRATIONS = [
+    (1, "colunas de users, lesson_scores, word_errors e settings padrao", _migration_v1),
+    (2, "indices secundarios (word_errors, lesson_scores, payments, users)", _migration_v2),
+    (3, "indice em lower(username) para o login sob demanda", _migration_v3),
+    (4, "users.updated_at para o sync incremental da replica", _migration_v4),
+]
+
+
+def _schema_version(conn) -> int:
+    row = conn.execute("SELECT MAX(version) AS version FROM schema_version").fetchone()
+    return (row["version"] if row else None) or 0
+
+
+def _check_migrations():
+    """Aplica, em ordem, as migracoes com versao maior que a registrada.
+
+    Cada migracao roda em sua propria transacao junto com o registro em
+    schema_version; num banco ja atualizado o custo e um unico SELECT.
+    """
+    conn = _get_conn()
+    try:
+        current = _schema_version(conn)
+        for version, description, migrate in _MIGRATIONS:
+            if version <= current:
+                continue
+            print(f"[MIGRATION] v{version}: {description}")
+            with conn:
+                migrate(conn)
+                conn.execute(
+                    "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                    (version, description),
+                )
     except Exception as e:
         print(f"[ERR] Falha na migracao: {e}")
 
@@ -367,25 +1234,72 @@ def _init_default_settings(conn):
     for k, v in defaults.items():
         conn.execute("INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)", (k, v))
 
+# -- Cache de settings (processo inteiro) --
+# A tabela inteira fica em memoria. update_setting invalida o cache local e
+# incrementa a linha __version__; os outros processos percebem a mudanca ao
+# revalidar (um SELECT por chave primaria a cada SETTINGS_REVALIDATE_SECONDS).
+_SETTINGS_VERSION_KEY = "__version__"
+_settings_lock = threading.Lock()
+_settings_cache: dict | None = None     # {"values": {...}, "version": str, "checked": float}
+
+
+def _load_settings(conn) -> dict:
+    rows = conn.execute("SELECT key, value FROM settings").fetchall()
+    values = {r["key"]: r["value"] for r in rows}
+    version = values.pop(_SETTINGS_VERSION_KEY, None) or "0"
+    return {"values": values, "version": version, "checked": time.monotonic()}
+
+
+def _get_settings() -> dict:
+    """Retorna o dict de settings do cache, recarregando se estiver invalido."""
+    global _settings_cache
+    import config
+    with _settings_lock:
+        cache = _settings_cache
+        if cache is not None and time.monotonic() - cache["checked"] < config.SETTINGS_REVALIDATE_SECONDS:
+            return cache["values"]
+        conn = _get_read_conn()
+        try:
+            if cache is not None:
+                row = conn.execute(
+                    "SELECT value FROM settings WHERE key = ?", (_SETTINGS_VERSION_KEY,)
+                ).fetchone()
+                if (row["value"] if row else "0") == cache["version"]:
+                    cache["checked"] = time.monotonic()
+                    return cache["values"]
+            _settings_cache = cache = _load_settings(conn)
+            return cache["values"]
+        finally:
+            conn.close()
+
+
+def invalidate_settings_cache() -> None:
+    global _settings_cache
+    with _settings_lock:
+        _settings_cache = None
+
+
 def get_setting(key: str, default: str = "") -> str:
-    conn = _get_conn()
     try:
-        row = conn.execute("SELECT value FROM settings WHERE key=?", (key,)).fetchone()
-        return row["value"] if row else default
+        value = _get_settings().get(key)
+        return value if value is not None else default
     except Exception:
         return default
-    finally:
-        conn.close()
 
 def update_setting(key: str, value: str):
     conn = _get_conn()
     try:
-        conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, str(value)))
-        conn.commit()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, str(value)))
+            conn.execute("""
+                INSERT INTO settings (key, value) VALUES (?, '1')
+                ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+            """, (_SETTINGS_VERSION_KEY,))
     except Exception as e:
         print(f"[ERR] update_setting: {e}")
     finally:
         conn.close()
+        invalidate_settings_cache()
 
 
 # -- Usuarios --
@@ -469,20 +1383,20 @@ def is_email_verified(username: str) -> bool:
 @st.cache_data(ttl=60, show_spinner=False)
 def get_user(username: str) -> Optional[dict]:
     """Retorna dict do usuario ou None. Cacheado por 60s."""
-    conn = _get_conn()
+    conn = _get_read_conn()
     row = conn.execute(
-        "SELECT username, name, password_hash, is_premium, plan_type, premium_until FROM users WHERE username = ?",
+        "SELECT username, name, is_premium, plan_type, premium_until FROM users WHERE username = ?",
         (username,),
     ).fetchone()
     if row:
-        return dict(row)
+        return _row_dict(row)
     return None
 
 
 @st.cache_data(ttl=120, show_spinner=False)
 def is_user_admin(username: str) -> bool:
     """Verifica se usuario eh admin. Cacheado por 2 min."""
-    conn = _get_conn()
+    conn = _get_read_conn()
     row = conn.execute(
         "SELECT is_admin FROM users WHERE username = ?",
         (username,),
@@ -537,6 +1451,7 @@ def update_user_premium(username: str, is_premium: bool, plan_type: str = "free"
     conn.commit()
     # Limpa cache para refletir a mudanca imediatamente
     get_all_users_detailed.clear()
+    get_users_page.clear()
     get_user.clear()
 
 def update_user_expiry(username: str, expiry_date: str | None) -> bool:
@@ -549,6 +1464,7 @@ def update_user_expiry(username: str, expiry_date: str | None) -> bool:
         )
         conn.commit()
         get_all_users_detailed.clear()
+        get_users_page.clear()
         return True
     except Exception as e:
         print(f"[ERR] update_user_expiry: {e}")
@@ -567,7 +1483,7 @@ def get_expiring_users(days: int) -> list[dict]:
               AND date(premium_until) = date('now', 'localtime', ?)
         """
         rows = conn.execute(query, (f"+{days} days",)).fetchall()
-        return [dict(r) for r in rows]
+        return [_row_dict(r) for r in rows]
     except Exception as e:
         print(f"[ERR] get_expiring_users: {e}")
         return []
@@ -586,64 +1502,176 @@ def log_payment(username: str, payment_id: str, status: str, amount: float, curr
     finally:
         conn.close()
 
+_PAYMENTS_SQL = """
+    SELECT p.*, u.name as user_fullname
+    FROM payments p
+    LEFT JOIN users u ON p.username = u.username
+"""
+
+
 def get_all_payments() -> list[dict[str, Any]]:
-    """Retorna todos os registros de pagamentos para o painel ADM."""
-    conn = _get_conn()
+    """Retorna todos os registros de pagamentos para o painel ADM.
+
+    Materializa a tabela inteira; para listagens grandes use `iter_payments`
+    ou `get_payments_page`.
+    """
     try:
-        cursor = conn.execute("""
-            SELECT p.*, u.name as user_fullname 
-            FROM payments p
-            LEFT JOIN users u ON p.username = u.username
-            ORDER BY created_at DESC
-        """)
-        rows = cursor.fetchall()
-        return [dict(r) for r in rows]
+        return list(iter_payments())
     except Exception as e:
         print(f"[ERR] get_all_payments: {e}")
         return []
-    finally:
-        conn.close()
+
+
+def get_payments_page(before: tuple[str, int] | None = None, page_size: int = 50) -> list[dict[str, Any]]:
+    """Uma pagina de pagamentos, do mais recente ao mais antigo.
+
+    `before` e a chave (created_at, id) do ultimo item da pagina anterior.
+    """
+    conn = _get_conn()
+    if before is None:
+        sql, params = _PAYMENTS_SQL + " ORDER BY p.created_at DESC, p.id DESC LIMIT ?", (page_size,)
+    else:
+        sql = _PAYMENTS_SQL + """
+            WHERE p.created_at < ? OR (p.created_at = ? AND p.id < ?)
+            ORDER BY p.created_at DESC, p.id DESC LIMIT ?
+        """
+        params = (before[0], before[0], before[1], page_size)
+    rows = conn.execute(sql, params).fetchall()
+    return [_row_dict(r) for r in rows]
+
+
+def iter_payments(before: tuple[str, int] | None = None, page_size: int = 500) -> Iterator[dict[str, Any]]:
+    """Itera todos os pagamentos (mais recente primeiro), uma pagina por consulta."""
+    while True:
+        page = get_payments_page(before, page_size)
+        yield from page
+        if len(page) < page_size:
+            return
+        before = (page[-1]["created_at"], page[-1]["id"])
+
+
+def get_payment_totals() -> dict:
+    """Totais de vendas sem carregar a lista: {'count', 'revenue'} (aprovados)."""
+    conn = _get_conn()
+    try:
+        row = conn.execute("""
+            SELECT COUNT(*) AS count,
+                   COALESCE(SUM(CASE WHEN status IN ('approved', 'success') THEN amount END), 0) AS revenue
+            FROM payments
+        """).fetchone()
+        return {"count": row["count"] or 0, "revenue": float(row["revenue"] or 0)}
+    except Exception as e:
+        print(f"[ERR] get_payment_totals: {e}")
+        return {"count": 0, "revenue": 0.0}
+
+
+def _xp_stmt(username: str, xp: int) -> tuple[str, tuple]:
+    """Statement de upsert do XP (cria a row zerada com o XP novo se nao existir)."""
+    return ("""
+        INSERT INTO progress (username, xp, pagina, arquivo_atual, indice, porc_atual, tentativa, updated_at)
+        VALUES (?, ?, 'inicio', 'palavras.csv', 0, 0, 0, ?)
+        ON CONFLICT(username) DO UPDATE SET xp = excluded.xp, updated_at = excluded.updated_at
+    """, (username, xp, datetime.now(timezone.utc).isoformat()))
 
 
 def update_user_xp(username: str, xp: int) -> None:
     """Atualiza XP do usuario diretamente (Admin)."""
-    # Atualiza na tabela progress (upsert se nao existir)
-    # Mas primeiro precisamos garantir que existe row na progress
     conn = _get_conn()
-    # Verifica
-    has_prog = conn.execute("SELECT 1 FROM progress WHERE username=?", (username,)).fetchone()
-    if has_prog:
-        conn.execute("UPDATE progress SET xp = ? WHERE username = ?", (xp, username))
-    else:
-        # Cria zerado com XP novo
-        conn.execute("""
-            INSERT INTO progress (username, xp, pagina, arquivo_atual, indice, porc_atual, tentativa, updated_at)
-            VALUES (?, ?, 'inicio', 'palavras.csv', 0, 0, 0, datetime('now'))
-        """, (username, xp))
-    conn.commit()
+    with conn:
+        conn.execute(*_xp_stmt(username, xp))
+
+
+_USERS_DETAILED_SQL = """
+    SELECT u.id, u.username, u.name, u.email, u.is_admin, u.is_premium, u.plan_type, u.premium_until, p.xp,
+    (SELECT payment_id FROM payments WHERE username = u.username AND (status = 'success' OR status = 'approved') ORDER BY created_at DESC LIMIT 1) as last_payment_id
+    FROM users u
+    LEFT JOIN progress p ON u.username = p.username
+"""
 
 
 @st.cache_data(ttl=10, show_spinner=False)
 def get_all_users_detailed() -> list[dict]:
-    """Retorna lista completa de usuarios com XP, status Admin e Premium."""
-    conn = _get_conn()
-    # Join users and progress
+    """Retorna lista completa de usuarios com XP, status Admin e Premium.
+
+    Materializa a tabela inteira; para listagens grandes use `iter_users`
+    ou `get_users_page`.
+    """
     try:
-        query = """
-            SELECT u.id, u.username, u.name, u.email, u.is_admin, u.is_premium, u.plan_type, u.premium_until, p.xp,
-            (SELECT payment_id FROM payments WHERE username = u.username AND (status = 'success' OR status = 'approved') ORDER BY created_at DESC LIMIT 1) as last_payment_id
-            FROM users u
-            LEFT JOIN progress p ON u.username = p.username
-            ORDER BY u.id ASC
-        """
-        rows = conn.execute(query).fetchall()
-        # Convert sqlite3.Row to dict to be safe
-        return [dict(r) for r in rows]
+        return list(iter_users())
     except Exception as e:
         print(f"[ERR] get_all_users_detailed: {e}")
         return []
 
 
+# -- Paginacao por chave (keyset) para listagens grandes --
+
+@st.cache_data(ttl=10, show_spinner=False)
+def get_users_page(after_id: int = 0, page_size: int = 50) -> list[dict]:
+    """Uma pagina de usuarios (colunas de get_all_users_detailed) com id > after_id."""
+    conn = _get_conn()
+    try:
+        rows = conn.execute(
+            _USERS_DETAILED_SQL + " WHERE u.id > ? ORDER BY u.id ASC LIMIT ?",
+            (after_id, page_size),
+        ).fetchall()
+        return [_row_dict(r) for r in rows]
+    except Exception as e:
+        print(f"[ERR] get_users_page: {e}")
+        return []
+
+
+def iter_users(after_id: int = 0, page_size: int = 500) -> Iterator[dict]:
+    """Itera todos os usuarios em ordem de id, uma pagina por consulta.
+
+    Memoria constante (uma pagina); bom para exportacoes e relatorios.
+    """
+    conn = _get_conn()
+    while True:
+        rows = conn.execute(
+            _USERS_DETAILED_SQL + " WHERE u.id > ? ORDER BY u.id ASC LIMIT ?",
+            (after_id, page_size),
+        ).fetchall()
+        for r in rows:
+            yield _row_dict(r)
+        if len(rows) < page_size:
+            return
+        after_id = rows[-1]["id"]
+
+
+def get_user_stats() -> dict:
+    """Totais para o painel admin sem carregar a lista: {'total', 'premium'}."""
+    conn = _get_conn()
+    try:
+        row = conn.execute(
+            "SELECT COUNT(*) AS total, COALESCE(SUM(is_premium = 1), 0) AS premium FROM users"
+        ).fetchone()
+        return {"total": row["total"] or 0, "premium": row["premium"] or 0}
+    except Exception as e:
+        print(f"[ERR] get_user_stats: {e}")
+        return {"total": 0, "premium": 0}
+
+
+def get_user_credentials(username: str) -> Optional[dict]:
+    """Credenciais de UM usuario no formato do streamlit-authenticator, ou None.
+
+    A busca ignora maiusculas, como o authenticator (que minusculiza o login).
+    Le do primario: a replica local nao guarda o hash da senha.
+    """
+    conn = _get_conn()
+    row = conn.execute(
+        "SELECT name, password_hash FROM users WHERE lower(username) = ? LIMIT 1",
+        (username.lower(),),
+    ).fetchone()
+    if row:
+        return {"name": row["name"], "password": row["password_hash"]}
+    return None
+
+
+def has_users() -> bool:
+    conn = _get_conn()
+    return conn.execute("SELECT 1 FROM users LIMIT 1").fetchone() is not None
+
+
 @st.cache_data(ttl=300, show_spinner=False)
 def get_all_users() -> dict:
     """
@@ -663,11 +1691,10 @@ def get_all_users() -> dict:
 
 # -- Progresso Global (tela atual, XP, etc) --
 
-def save_progress(username: str, pagina: str, arquivo_atual: str,
-                  indice: int, xp: int, porc_atual: int, tentativa: int) -> None:
-    """Upsert do progresso global do usuario."""
-    conn = _get_conn()
-    conn.execute("""
+def _progress_stmt(username: str, pagina: str, arquivo_atual: str,
+                   indice: int, xp: int, porc_atual: int, tentativa: int) -> tuple[str, tuple]:
+    """Statement de upsert do progresso global (para uso em batch)."""
+    return ("""
         INSERT INTO progress (username, pagina, arquivo_atual, indice, xp, porc_atual, tentativa, updated_at)
         VALUES (?, ?, ?, ?, ?, ?, ?, ?)
         ON CONFLICT(username) DO UPDATE SET
@@ -680,39 +1707,51 @@ def save_progress(username: str, pagina: str, arquivo_atual: str,
             updated_at=excluded.updated_at
     """, (username, pagina, arquivo_atual, indice, xp, porc_atual, tentativa,
           datetime.now(timezone.utc).isoformat()))
-    conn.commit()
+
+
+def save_progress(username: str, pagina: str, arquivo_atual: str,
+                  indice: int, xp: int, porc_atual: int, tentativa: int) -> None:
+    """Upsert do progresso global do usuario."""
+    conn = _get_conn()
+    _execute_batch(conn, [
+        _progress_stmt(username, pagina, arquivo_atual, indice, xp, porc_atual, tentativa),
+    ])
 
 
 def load_progress(username: str) -> Optional[dict]:
     """Carrega progresso global do usuario. Retorna dict ou None."""
-    conn = _get_conn()
+    conn = _get_read_conn()
     row = conn.execute(
         "SELECT pagina, arquivo_atual, indice, xp, porc_atual, tentativa FROM progress WHERE username = ?",
         (username,),
     ).fetchone()
     if row:
-        return dict(row)
+        return _row_dict(row)
     return None
 
 
 # -- Progresso por Modulo (indice salvo por CSV) --
 
-def save_module_progress(username: str, module_file: str, indice: int) -> None:
-    """Salva o indice atual do usuario em um modulo especifico."""
-    conn = _get_conn()
-    conn.execute("""
+def _module_progress_stmt(username: str, module_file: str, indice: int) -> tuple[str, tuple]:
+    """Statement de upsert do indice por modulo (mantem o maior indice)."""
+    return ("""
         INSERT INTO module_progress (username, module_file, indice, updated_at)
         VALUES (?, ?, ?, ?)
         ON CONFLICT(username, module_file) DO UPDATE SET
             indice=MAX(excluded.indice, module_progress.indice),
             updated_at=excluded.updated_at
     """, (username, module_file, indice, datetime.now(timezone.utc).isoformat()))
-    conn.commit()
+
+
+def save_module_progress(username: str, module_file: str, indice: int) -> None:
+    """Salva o indice atual do usuario em um modulo especifico."""
+    conn = _get_conn()
+    _execute_batch(conn, [_module_progress_stmt(username, module_file, indice)])
 
 
 def load_module_progress(username: str, module_file: str) -> int:
     """Carrega o indice salvo do usuario em um modulo. Retorna 0 se nao existir."""
-    conn = _get_conn()
+    conn = _get_read_conn()
     row = conn.execute(
         "SELECT indice FROM module_progress WHERE username = ? AND module_file = ?",
         (username, module_file),
@@ -724,7 +1763,7 @@ def load_module_progress(username: str, module_file: str) -> int:
 
 def load_all_module_progress(username: str) -> dict:
     """Carrega progresso de todos os modulos do usuario. Retorna {module_file: indice}."""
-    conn = _get_conn()
+    conn = _get_read_conn()
     rows = conn.execute(
         "SELECT module_file, indice FROM module_progress WHERE username = ?",
         (username,),
@@ -734,10 +1773,9 @@ def load_all_module_progress(username: str) -> dict:
 
 # -- Scores por Licao (melhor nota para badges) --
 
-def save_lesson_score(username: str, module_file: str, lesson_idx: int, score: int) -> None:
-    """Salva a nota de uma licao. Mantem apenas a melhor nota (best score)."""
-    conn = _get_conn()
-    conn.execute("""
+def _lesson_score_stmt(username: str, module_file: str, lesson_idx: int, score: int) -> tuple[str, tuple]:
+    """Statement de upsert da melhor nota de uma licao."""
+    return ("""
         INSERT INTO lesson_scores (username, module_file, lesson_idx, best_score, updated_at)
         VALUES (?, ?, ?, ?, ?)
         ON CONFLICT(username, module_file, lesson_idx) DO UPDATE SET
@@ -745,12 +1783,17 @@ def save_lesson_score(username: str, module_file: str, lesson_idx: int, score: i
             updated_at = excluded.updated_at
     """, (username, module_file, lesson_idx, score,
           datetime.now(timezone.utc).isoformat()))
-    conn.commit()
+
+
+def save_lesson_score(username: str, module_file: str, lesson_idx: int, score: int) -> None:
+    """Salva a nota de uma licao. Mantem apenas a melhor nota (best score)."""
+    conn = _get_conn()
+    _execute_batch(conn, [_lesson_score_stmt(username, module_file, lesson_idx, score)])
 
 
 def load_lesson_score(username: str, module_file: str, lesson_idx: int) -> int:
     """Carrega a melhor nota de uma licao. Retorna 0 se nao existir."""
-    conn = _get_conn()
+    conn = _get_read_conn()
     row = conn.execute(
         "SELECT best_score FROM lesson_scores WHERE username = ? AND module_file = ? AND lesson_idx = ?",
         (username, module_file, lesson_idx),
@@ -762,27 +1805,87 @@ def load_lesson_score(username: str, module_file: str, lesson_idx: int) -> int:
 
 # -- Erros por Palavra (Aprendizado Adaptativo) --
 
+# Linhas por INSERT multi-row (5 parametros por linha; fica abaixo do limite
+# historico de 999 variaveis do SQLite)
+_WORD_ERRORS_CHUNK = 150
+
+
+def _word_errors_stmts(username: str, wrong_words: list[str], all_words: list[str]) -> list[tuple[str, tuple]]:
+    """Upsert dos erros por palavra em um INSERT multi-row por bloco de palavras.
+
+    Palavras repetidas na frase sao agregadas antes (cada ocorrencia conta
+    como vista e, se a palavra esta em `wrong_words`, como erro).
+    """
+    if not all_words:
+        return []
+    now = datetime.now(timezone.utc).isoformat()
+    wrong_set = set(wrong_words)
+    seen = Counter(all_words)
+    rows = [(username, w, n if w in wrong_set else 0, n, now) for w, n in seen.items()]
+
+    stmts = []
+    for i in range(0, len(rows), _WORD_ERRORS_CHUNK):
+        chunk = rows[i:i + _WORD_ERRORS_CHUNK]
+        placeholders = ", ".join(["(?, ?, ?, ?, ?)"] * len(chunk))
+        stmts.append((f"""
+            INSERT INTO word_errors (username, word, error_count, total_seen, last_seen)
+            VALUES {placeholders}
+            ON CONFLICT(username, word) DO UPDATE SET
+                error_count = word_errors.error_count + excluded.error_count,
+                total_seen = word_errors.total_seen + excluded.total_seen,
+                last_seen = excluded.last_seen
+        """, tuple(v for row in chunk for v in row)))
+    return stmts
+
+
 def record_word_errors(username: str, wrong_words: list[str], all_words: list[str]) -> None:
     """Registra erros por palavra. Incrementa error_count para erradas, total_seen para todas."""
+    stmts = _word_errors_stmts(username, wrong_words, all_words)
+    if not stmts:
+        return
     conn = _get_conn()
-    now = datetime.now(timezone.utc).isoformat()
     try:
-        wrong_set = set(wrong_words)
-        for w in all_words:
-            is_wrong = 1 if w in wrong_set else 0
-            conn.execute("""
-                INSERT INTO word_errors (username, word, error_count, total_seen, last_seen)
-                VALUES (?, ?, ?, 1, ?)
-                ON CONFLICT(username, word) DO UPDATE SET
-                    error_count = word_errors.error_count + ?,
-                    total_seen = word_errors.total_seen + 1,
-                    last_seen = ?
-            """, (username, w, is_wrong, now, is_wrong, now))
-        conn.commit()
+        _execute_batch(conn, stmts)
     except Exception as e:
         print(f"[ERR] record_word_errors: {e}")
 
 
+# Uma unica thread de escrita: preserva a ordem das tentativas do mesmo aluno
+_deferred_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+_deferred_lock = threading.Lock()
+_deferred_by_user: dict[str, set[Future]] = {}   # escritas adiadas ainda nao terminadas
+
+
+def _forget_deferred(username: str, fut: Future) -> None:
+    with _deferred_lock:
+        pending = _deferred_by_user.get(username)
+        if pending is not None:
+            pending.discard(fut)
+            if not pending:
+                del _deferred_by_user[username]
+
+
+def record_word_errors_async(username: str, wrong_words: list[str], all_words: list[str]) -> Future:
+    """Versao adiada de `record_word_errors`: agenda a escrita e retorna na hora.
+
+    Usada nas telas de gravacao para que o feedback apareca antes da escrita
+    terminar. Erros sao apenas logados (como na versao sincrona).
+    """
+    fut = _deferred_writer.submit(record_word_errors, username, list(wrong_words), list(all_words))
+    with _deferred_lock:
+        _deferred_by_user.setdefault(username, set()).add(fut)
+    fut.add_done_callback(lambda f: _forget_deferred(username, f))
+    return fut
+
+
+def cancel_deferred_writes(username: str) -> None:
+    """Cancela as escritas adiadas do usuario ainda na fila e espera a que ja esta rodando."""
+    with _deferred_lock:
+        pending = list(_deferred_by_user.get(username, ()))
+    running = [f for f in pending if not f.cancel()]
+    wait(running)
+
+
 def get_weak_words(username: str, limit: int = 30) -> list[dict]:
     """Retorna palavras com mais erros (error_count >= 2), ordenadas por frequencia de erro."""
     conn = _get_conn()
@@ -794,7 +1897,7 @@ def get_weak_words(username: str, limit: int = 30) -> list[dict]:
             ORDER BY error_count DESC
             LIMIT ?
         """, (username, limit)).fetchall()
-        return [dict(r) for r in rows]
+        return [_row_dict(r) for r in rows]
     except Exception as e:
         print(f"[ERR] get_weak_words: {e}")
         return []
@@ -846,7 +1949,7 @@ def get_student_analytics(username: str) -> dict:
             ORDER BY error_count DESC
             LIMIT 50
         """, (username,)).fetchall()
-        result['weak_words'] = [dict(r) for r in word_rows]
+        result['weak_words'] = [_row_dict(r) for r in word_rows]
     except Exception as e:
         print(f"[ERR] get_student_analytics: {e}")
     return result
@@ -854,23 +1957,26 @@ def get_student_analytics(username: str) -> dict:
 
 def delete_user(username: str) -> bool:
     """Remove completamente um usuario e seus dados."""
+    # Um upsert de word_errors ainda na fila recriaria linhas do usuario apagado
+    cancel_deferred_writes(username)
     conn = _get_conn()
     try:
         # Lista tabelas uma vez so (reusa a mesma conexao)
         tables = _get_tables(conn)
-        # Remove de todas as tabelas referenciadas
-        conn.execute("DELETE FROM progress WHERE username = ?", (username,))
-        conn.execute("DELETE FROM module_progress WHERE username = ?", (username,))
-        if "lesson_scores" in tables:
-             conn.execute("DELETE FROM lesson_scores WHERE username = ?", (username,))
-        if "word_errors" in tables:
-             conn.execute("DELETE FROM word_errors WHERE username = ?", (username,))
-        conn.execute("DELETE FROM users WHERE username = ?", (username,))
-        conn.commit()
+        # Remove de todas as tabelas referenciadas (atomico: tudo ou nada)
+        with conn:
+            conn.execute("DELETE FROM progress WHERE username = ?", (username,))
+            conn.execute("DELETE FROM module_progress WHERE username = ?", (username,))
+            if "lesson_scores" in tables:
+                 conn.execute("DELETE FROM lesson_scores WHERE username = ?", (username,))
+            if "word_errors" in tables:
+                 conn.execute("DELETE FROM word_errors WHERE username = ?", (username,))
+            conn.execute("DELETE FROM users WHERE username = ?", (username,))
         # Limpa caches apos deletar
         is_user_admin.clear()
         get_all_users.clear()
         get_all_users_detailed.clear()
+        get_users_page.clear()
         return True
     except Exception as e:
         print(f"[ERR] delete_user: {e}")
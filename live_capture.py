@@ -0,0 +1,174 @@
+# live_capture.py — Gravacao com reconhecimento ao vivo (streamlit-webrtc)
+#
+# Com streamlit-webrtc instalado, o microfone vira um stream WebRTC: cada
+# frame de audio vai direto para um RecognitionStream enquanto o aluno fala,
+# o texto parcial aparece na tela durante a captura e, ao parar, so falta
+# decodificar o ultimo pedaco. Sem streamlit-webrtc (ou com
+# LIVE_RECOGNITION=0), `recorder()` cai no mic_recorder de sempre e o WAV
+# inteiro e decodificado depois, pelo pool do recognition_service.
+#
+# As duas formas devolvem o mesmo dict ({"bytes": wav, ...}); a captura ao
+# vivo inclui tambem "text", o resultado ja reconhecido.
+
+import io
+import threading
+import wave
+from typing import Optional
+
+import numpy as np
+import streamlit as st
+from streamlit_mic_recorder import mic_recorder
+
+import audio_frontend
+import config
+import recognition_service
+
+try:
+    from streamlit_webrtc import WebRtcMode, webrtc_streamer
+    HAS_WEBRTC = True
+except ImportError:
+    HAS_WEBRTC = False
+
+
+def available() -> bool:
+    return HAS_WEBRTC and config.LIVE_RECOGNITION and recognition_service.available()
+
+
+def _frame_to_mono(frame) -> np.ndarray:
+    """av.AudioFrame -> amostras mono float32 (escala do int16) na taxa do quadro."""
+    samples = frame.to_ndarray()
+    channels = len(frame.layout.channels)
+    if frame.format.is_planar:
+        x = samples.reshape(channels, -1).T
+    else:
+        x = samples.reshape(-1, channels)
+    x = x.astype(np.float32)
+    if samples.dtype.kind == "f":
+        x *= 32767
+    return audio_frontend.downmix(x)
+
+
+def _to_wav(pcm: bytes, rate: int) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(pcm)
+    return buf.getvalue()
+
+
+class _LiveSession:
+    """Estado compartilhado entre o callback de audio (thread do webrtc) e o script."""
+
+    def __init__(self, phrase: Optional[str]):
+        self.phrase = phrase
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Prepara para uma nova captura (o callback registrado continua o mesmo)."""
+        with self._lock:
+            self.stream: Optional[recognition_service.RecognitionStream] = None
+            # Um resampler por captura: o filtro continua de um quadro para o outro
+            self.resampler: Optional[audio_frontend.StreamResampler] = None
+            self.partial = ""
+            self.result: Optional[dict] = None
+            self.error: Optional[str] = None
+
+    def on_frame(self, frame):
+        with self._lock:
+            if self.result is not None or self.error is not None:
+                return frame
+            if self.stream is None:
+                try:
+                    self.stream = recognition_service.open_stream(config.AUDIO_TARGET_RATE, self.phrase)
+                except Exception as e:
+                    self.error = str(e)
+                    print(f"[ERR] live_capture.open_stream: {e}")
+                    return frame
+            if self.resampler is None or self.resampler.src_rate != frame.sample_rate:
+                self.resampler = audio_frontend.StreamResampler(frame.sample_rate, config.AUDIO_TARGET_RATE)
+            # Reamostra e alimenta sob o lock: a ordem dos pedacos e a mesma do
+            # audio, e o finish() so fecha o resampler depois do ultimo quadro
+            stream = self.stream
+            self.partial = stream.accept_chunk(
+                audio_frontend.to_pcm16(self.resampler.push(_frame_to_mono(frame))))
+        if stream.duration_s >= config.RECOGNITION_STREAM_MAX_SECONDS:
+            self.finish()
+        return frame
+
+    def finish(self) -> Optional[dict]:
+        with self._lock:
+            if self.result is None and self.stream is not None:
+                if self.resampler is not None:
+                    self.stream.accept_chunk(audio_frontend.to_pcm16(self.resampler.finish()))
+                    self.resampler = None
+                res = self.stream.finish()
+                self.result = {
+                    "bytes": _to_wav(res["pcm"], res["sample_rate"]),
+                    "sample_rate": res["sample_rate"],
+                    "text": res["text"],
+                    "words": res["words"],
+                    "finish_ms": res["finish_ms"],
+                }
+                self.stream = None
+            return self.result
+
+
+@st.fragment(run_every=0.25)
+def _render_partial(session: _LiveSession) -> None:
+    st.caption(f"🎤 {session.partial.upper() if session.partial else '...'}")
+
+
+def _live_recorder(key: str, phrase: Optional[str]) -> Optional[dict]:
+    state_key = f"_live_{key}"
+    session = st.session_state.get(state_key)
+    if session is None:
+        session = st.session_state[state_key] = _LiveSession(phrase)
+
+    ctx = webrtc_streamer(
+        key=key,
+        mode=WebRtcMode.SENDONLY,
+        audio_frame_callback=session.on_frame,
+        media_stream_constraints={"audio": True, "video": False},
+        rtc_configuration={"iceServers": [{"urls": [config.WEBRTC_STUN_URL]}]} if config.WEBRTC_STUN_URL else None,
+        translations={"start": "🔴 GRAVAR", "stop": "⏹️ PARAR"},
+    )
+
+    if ctx.state.playing:
+        if session.result is not None or session.error is not None:
+            session.reset()  # nova captura com a mesma chave
+        _render_partial(session)
+        return None
+
+    if session.error is not None:
+        st.warning(f"⏳ {session.error}")
+        return None
+    return session.finish()
+
+
+@st.fragment(run_every=1.0)
+def _wait_for_model() -> None:
+    if not recognition_service.warming_up():
+        st.rerun()  # modelo pronto: recarrega a pagina ja com o gravador
+
+
+def recorder(key: str, phrase: Optional[str] = None) -> Optional[dict]:
+    """Gravador da pagina: ao vivo quando possivel, senao mic_recorder (WAV).
+
+    Enquanto o modelo ainda carrega, mostra o aviso de aquecimento no lugar
+    do gravador (o resto da pagina funciona normalmente).
+    """
+    if recognition_service.warming_up():
+        st.info("⏳ Aquecendo o reconhecimento de voz... o gravador aparece em instantes.")
+        _wait_for_model()
+        return None
+    if available():
+        return _live_recorder(key, phrase)
+    return mic_recorder(
+        start_prompt="🔴 GRAVAR",
+        stop_prompt="⏹️ PARAR",
+        format="wav",
+        key=key,
+    )
@@ -0,0 +1,134 @@
+# model_registry.py — Modelo Vosk unico do processo
+#
+# Uma copia so do modelo acustico em memoria, compartilhada por todas as
+# paginas (via recognition_service). O carregamento pode comecar em uma
+# thread de fundo assim que o script sobe, enquanto o aluno ainda esta na
+# tela de login; quem precisar do modelo antes disso espera o load em curso
+# em vez de carregar outra copia.
+#
+# `stats()` informa o estado, o tempo de carga e quanto a memoria residente
+# (RSS) do processo cresceu com o modelo.
+#
+# Quando o modelo termina de carregar, o arquivo MODEL_READY_FILE e criado;
+# o HEALTHCHECK do Docker so considera o container pronto depois disso (ver
+# serve.py). Sem modelo ("missing") ou com erro na carga o arquivo nao
+# existe: o container fica unhealthy em vez de receber trafego sem voz.
+
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+import config
+
+_lock = threading.Lock()
+_loaded = threading.Event()
+_thread: Optional[threading.Thread] = None
+_model = None
+_stats: dict = {"state": "idle", "load_seconds": None, "rss_before_mb": None,
+                "rss_after_mb": None, "rss_model_mb": None, "error": None}
+
+
+def _rss_mb() -> Optional[float]:
+    """Memoria residente atual do processo em MB (None se nao der para medir)."""
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        # ru_maxrss e o pico (KB no Linux, bytes no macOS) — melhor que nada
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if os.uname().sysname == "Darwin" else peak / 1024
+    except Exception:
+        return None
+
+
+def _load() -> None:
+    global _model
+    try:
+        if not os.path.exists(config.MODEL_DIR):
+            _stats["state"] = "missing"
+            return
+        from vosk import Model
+
+        _stats["state"] = "loading"
+        rss_before = _rss_mb()
+        t0 = time.perf_counter()
+        model = Model(config.MODEL_DIR)
+        elapsed = time.perf_counter() - t0
+        rss_after = _rss_mb()
+
+        _model = model
+        _stats.update({
+            "state": "ready",
+            "load_seconds": round(elapsed, 2),
+            "rss_before_mb": round(rss_before, 1) if rss_before is not None else None,
+            "rss_after_mb": round(rss_after, 1) if rss_after is not None else None,
+            "rss_model_mb": round(rss_after - rss_before, 1)
+            if rss_before is not None and rss_after is not None else None,
+        })
+        print(f"[INFO] model_registry: modelo carregado em {elapsed:.1f}s "
+              f"(+{_stats['rss_model_mb']} MB RSS)")
+    except Exception as e:
+        _stats.update({"state": "error", "error": str(e)})
+        print(f"[ERR] model_registry._load: {e}")
+    finally:
+        _loaded.set()
+        if _stats["state"] == "ready":
+            _write_ready_file()
+
+
+def _write_ready_file() -> None:
+    if not config.MODEL_READY_FILE:
+        return
+    try:
+        tmp = config.MODEL_READY_FILE + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(_stats, f)
+        os.replace(tmp, config.MODEL_READY_FILE)
+    except OSError as e:
+        print(f"[ERR] model_registry._write_ready_file: {e}")
+
+
+def preload(background: bool = True) -> None:
+    """Comeca a carregar o modelo (uma vez por processo). Nao bloqueia se `background`."""
+    global _thread
+    with _lock:
+        if _thread is not None or _loaded.is_set():
+            return
+        _stats["state"] = "loading"
+        if config.MODEL_READY_FILE and os.path.exists(config.MODEL_READY_FILE):
+            os.remove(config.MODEL_READY_FILE)  # sobra de uma execucao anterior
+        _thread = threading.Thread(target=_load, name="vosk-model-load", daemon=True)
+        _thread.start()
+    if not background:
+        _loaded.wait()
+
+
+def get_model(timeout: Optional[float] = None):
+    """O modelo compartilhado, esperando o carregamento se preciso. None sem modelo."""
+    preload(background=True)
+    _loaded.wait(timeout)
+    return _model
+
+
+def is_ready() -> bool:
+    return _model is not None
+
+
+def is_loading() -> bool:
+    return _thread is not None and not _loaded.is_set()
+
+
+def state() -> str:
+    """idle | loading | ready | missing | error"""
+    return _stats["state"]
+
+
+def stats() -> dict:
+    return dict(_stats)
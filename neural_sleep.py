@@ -2,9 +2,16 @@ import streamlit as st
 import time
 import os
 import pandas as pd
-from gtts import gTTS
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import config
+import tts
+import audio_store
+import sleep_mixer
 from io import BytesIO
+from typing import Optional
 import base64
 
 # ==============================================================================
@@ -385,37 +392,130 @@ def render_education():
 # ==============================================================================
 # FUNCOES DE LÓGICA
 # ==============================================================================
-def generate_full_lesson_audio(df: pd.DataFrame, slow_en=True) -> BytesIO:
-    """Concatena TTS (PT + Silêncio + EN + Silêncio) em um único MP3."""
-    full_audio = BytesIO()
-    
-    # Placeholder de silencio (1 seg) - gerado "na marra" ou apenas ignorado em gTTS
-    # gTTS nao gera silencio nativamente. Vamos apenas concatenar falas.
-    
-    for idx, row in df.iterrows():
+def _clips(df: pd.DataFrame, slow_en=True) -> list[tuple[str, str, float]]:
+    """(texto, idioma, velocidade) de cada fala da sessao, na ordem PT -> EN."""
+    clips = []
+    for _, row in df.iterrows():
+        clips.append((str(row['pt']), 'pt', 1.0))
+        clips.append((str(row['en']), 'en', tts.SLOW if slow_en else 1.0))
+    return clips
+
+
+def _clip_paths(df: pd.DataFrame, slow_en=True) -> list[tuple[Optional[str], str]]:
+    """(MP3 no audio_store, idioma) de cada fala, na ordem; None se o TTS falhou.
+
+    Cada fala e sintetizada uma vez so (em paralelo na primeira sessao) e
+    compartilhada com a aula e o coach.
+    """
+    def _clip(item):
+        text, lang, rate = item
         try:
-            txt_pt = str(row['pt'])
-            txt_en = str(row['en'])
-            
-            # Gera PT
-            tts_pt = gTTS(text=txt_pt, lang='pt')
-            fp_pt = BytesIO()
-            tts_pt.write_to_fp(fp_pt)
-            full_audio.write(fp_pt.getvalue())
-            
-            # Gera EN
-            tts_en = gTTS(text=txt_en, lang='en', slow=slow_en)
-            fp_en = BytesIO()
-            tts_en.write_to_fp(fp_en)
-            full_audio.write(fp_en.getvalue())
+            return audio_store.get_or_create(text, lang=lang, rate=rate), lang
         except Exception as e:
-            print(f"Erro TTS linha {idx}: {e}")
-            continue
-        
+            print(f"Erro TTS ({lang}) {text[:40]!r}: {e}")
+            return None, lang
+
+    with ThreadPoolExecutor(max_workers=config.TTS_PRERENDER_WORKERS) as pool:
+        return list(pool.map(_clip, _clips(df, slow_en)))
+
+
+def generate_full_lesson_audio(df: pd.DataFrame, slow_en=True) -> BytesIO:
+    """Concatena as falas (PT + EN) em um único MP3, sem pausas nem cama sonora.
+
+    Caminho reserva quando o sleep_mixer nao esta disponivel (sem ffmpeg).
+    """
+    full_audio = BytesIO()
+    for path, _ in _clip_paths(df, slow_en):
+        if path:
+            with open(path, "rb") as f:
+                full_audio.write(f.read())
     full_audio.seek(0)
     return full_audio
 
 
+def _mix_settings(binaural: Optional[str], ambient: Optional[str]) -> tuple[Optional[float], Optional[str], str]:
+    """(batida binaural em Hz, arquivo do ambiente, etiqueta p/ o nome da sessao)."""
+    if not sleep_mixer.available():
+        return None, None, "concat"
+    hz = BINAURAL_PRESETS[binaural]["freq"] if binaural in BINAURAL_PRESETS else None
+    ambient_path = os.path.join(SOUNDS_DIR, AMBIENT_SOUNDS[ambient]) if ambient in AMBIENT_SOUNDS else None
+    if ambient_path and not os.path.exists(ambient_path):
+        ambient_path = None
+    settings = (hz, ambient_path and os.path.basename(ambient_path), config.SLEEP_GAP_PT_SECONDS,
+                config.SLEEP_GAP_EN_SECONDS, config.SLEEP_MIX_RATE, config.SLEEP_BINAURAL_BASE_HZ,
+                config.SLEEP_VOICE_VOLUME, config.SLEEP_BINAURAL_VOLUME, config.SLEEP_AMBIENT_VOLUME,
+                config.SLEEP_MP3_BITRATE)
+    return hz, ambient_path, "mix" + hashlib.sha1(repr(settings).encode("utf-8")).hexdigest()[:8]
+
+
+# Uma trava por sessao: dois alunos pedindo o mesmo modulo geram uma vez so.
+# Cada entrada e [trava, quantos esperam/usam]; sai do dicionario quando zera,
+# entao ele nao cresce com cada combinacao de modulo/recorte/mixagem ja gerada.
+_session_locks: dict[str, list] = {}
+_session_locks_guard = threading.Lock()
+
+
+@contextmanager
+def _session_lock(path: str):
+    with _session_locks_guard:
+        entry = _session_locks.setdefault(path, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _session_locks_guard:
+            entry[1] -= 1
+            if not entry[1]:
+                del _session_locks[path]
+
+
+def session_audio_path(arquivo_csv: str, df: pd.DataFrame, slow_en=True,
+                       binaural: Optional[str] = None, ambient: Optional[str] = None) -> str:
+    """MP3 da sessao (modulo, recorte, lenta, mixagem), gerado so na primeira vez.
+
+    Com ffmpeg, a sessao e mixada pelo sleep_mixer (pausas entre as falas,
+    ondas binaurais do preset `binaural` e o som `ambient` por baixo); sem
+    ffmpeg, e so a concatenacao das falas. O nome leva um hash do texto das
+    frases e do backend de TTS: editar o CSV ou trocar a voz gera uma sessao
+    nova (e a antiga do mesmo recorte e mixagem e apagada).
+    """
+    hz, ambient_path, mix_tag = _mix_settings(binaural, ambient)
+    modulo = os.path.splitext(os.path.basename(arquivo_csv))[0]
+    prefix = f"{modulo}_{len(df)}_{'slow' if slow_en else 'normal'}_{mix_tag}_"
+    digest = hashlib.sha1(
+        "\n".join(f"{t}|{l}|{r}" for t, l, r in _clips(df, slow_en)).encode("utf-8")
+        + config.TTS_BACKEND.encode("utf-8")
+    ).hexdigest()[:12]
+    path = os.path.join(config.SLEEP_SESSIONS_DIR, f"{prefix}{digest}.mp3")
+    if os.path.exists(path):
+        return path
+
+    with _session_lock(path):
+        if os.path.exists(path):  # outro aluno acabou de gerar
+            return path
+        os.makedirs(config.SLEEP_SESSIONS_DIR, exist_ok=True)
+        if mix_tag == "concat":
+            audio = generate_full_lesson_audio(df, slow_en).getvalue()
+            if not audio:
+                raise RuntimeError("nenhuma fala foi sintetizada")
+            audio_store.write_atomic(path, audio)
+        else:
+            gaps = {'pt': config.SLEEP_GAP_PT_SECONDS, 'en': config.SLEEP_GAP_EN_SECONDS}
+            clips = [(p, gaps[lang]) for p, lang in _clip_paths(df, slow_en) if p]
+            if not clips:
+                raise RuntimeError("nenhuma fala foi sintetizada")
+            report = sleep_mixer.mix_session(clips, path, binaural_hz=hz, ambient_path=ambient_path)
+            print(f"[INFO] neural_sleep: sessao {os.path.basename(path)} mixada: {report}")
+        for old in os.listdir(config.SLEEP_SESSIONS_DIR):
+            if old.startswith(prefix) and old.endswith(".mp3") and old != os.path.basename(path):
+                try:
+                    os.remove(os.path.join(config.SLEEP_SESSIONS_DIR, old))
+                except OSError:
+                    pass
+    return path
+
+
 def render_neural_mode(username: str):
     # -- HEADER --
     col_back, col_title = st.columns([1, 5])
@@ -449,6 +549,15 @@ def render_neural_mode(username: str):
 
     with c_config:
         st.markdown("### 🎛️ Configuração Sonora", unsafe_allow_html=True)
+
+        # Com a mixagem ligada, ambiente e ondas vao dentro do MP3 da sessao:
+        # os players do navegador ficam desligados para nao tocar tudo em dobro
+        mixar = st.toggle(
+            "🎚️ Mixar ondas binaurais e som ambiente na sessão",
+            value=False,
+            disabled=not sleep_mixer.available(),
+            help="Mixa no servidor o preset e o ambiente escolhidos na sessão gerada (precisa de ffmpeg).",
+        )
         
         # 1. Seletor de Som Ambiente
         # Importante: key='selected_sound_name' conecta isso ao loop de renderizacao acima
@@ -466,7 +575,9 @@ def render_neural_mode(username: str):
         st.divider()
 
         # Player Customizado com LOOP (HTML5)
-        if os.path.exists(sound_path):
+        if mixar:
+            st.caption("🎚️ O som ambiente vai mixado na sessão gerada.")
+        elif os.path.exists(sound_path):
             try:
                 # Le arquivo binario e converte para base64 - CACHED
                 audio_b64 = load_media_base64(sound_path)
@@ -505,7 +616,10 @@ def render_neural_mode(username: str):
         st.info(f"**{preset_name}:** {preset['desc']}")
         
         # Injeta JS Engine com a frequencia escolhida
-        st.components.v1.html(AUDIO_JS_TEMPLATE.format(freq=preset['freq']), height=320)
+        if mixar:
+            st.caption("🎚️ As ondas binaurais vão mixadas na sessão gerada.")
+        else:
+            st.components.v1.html(AUDIO_JS_TEMPLATE.format(freq=preset['freq']), height=320)
 
     
     with c_player:
@@ -591,10 +705,14 @@ def render_neural_mode(username: str):
                         # Pega apenas 30 frases para nao travar o servidor (Premium)
                         df_slice = df.head(30)
                     
-                    audio_bytes = generate_full_lesson_audio(df_slice)
+                    session_path = session_audio_path(
+                        arquivo_csv, df_slice,
+                        binaural=preset_name if mixar else None,
+                        ambient=selected_sound_name if mixar else None,
+                    )
                     
                     st.success("✅ Sessão pronta! Coloque seus fones.")
-                    st.audio(audio_bytes, format="audio/mp3", autoplay=False)
+                    st.audio(session_path, format="audio/mp3", autoplay=False)
                     
                 except Exception as e:
                     st.error(f"Falha ao gerar aula: {e}")
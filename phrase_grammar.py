@@ -0,0 +1,105 @@
+# phrase_grammar.py — Gramaticas restritas por frase para o reconhecimento
+#
+# Na pontuacao sempre sabemos a frase alvo, entao o KaldiRecognizer nao
+# precisa do vocabulario aberto do modelo: basta aceitar as palavras da frase,
+# o token de lixo "[unk]" (qualquer outra coisa que o aluno diga) e um pequeno
+# conjunto de distratores (palavras curtas que o aluno costuma inserir ou
+# trocar). O grafo fica minusculo, o decode e mais rapido e a transcricao nao
+# "inventa" palavras parecidas fora da frase.
+#
+# As gramaticas de todas as frases dos CSVs de modulos sao montadas de uma vez
+# na primeira consulta; frases fora dos CSVs sao montadas sob demanda.
+
+import json
+import os
+import re
+import threading
+from typing import Optional
+
+import pandas as pd
+
+import config
+
+UNK = "[unk]"
+
+# Palavras funcionais que aparecem sobrando/trocadas nas tentativas dos alunos
+DISTRACTORS: tuple[str, ...] = (
+    "a", "an", "the", "to", "and", "is", "are", "it", "in", "on", "of",
+    "i", "you", "he", "she", "we", "they", "do", "does", "have", "has",
+)
+
+_WORD_RE = re.compile(r"[a-z]+(?:'[a-z]+)*")
+
+_lock = threading.Lock()
+_cache: dict[str, Optional[str]] = {}
+_built = False
+_vocab: Optional[set[str]] = None
+
+
+def _load_vocab() -> Optional[set[str]]:
+    """Vocabulario do modelo (graph/words.txt), quando o modelo traz a lista."""
+    path = os.path.join(config.MODEL_DIR, "graph", "words.txt")
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return {line.split(maxsplit=1)[0] for line in f if line.strip()}
+
+
+def phrase_words(phrase: str) -> list[str]:
+    """Palavras da frase como o Vosk as escreve (minusculas, com apostrofo)."""
+    text = str(phrase).lower().replace("’", "'")
+    return _WORD_RE.findall(text)
+
+
+def build_grammar(phrase: str) -> Optional[str]:
+    """JSON para KaldiRecognizer/SetGrammar, ou None se a frase nao tem palavras."""
+    words = phrase_words(phrase)
+    if _vocab is not None:
+        words = [w for w in words if w in _vocab]  # fora do vocabulario o Vosk ignora
+    if not words:
+        return None
+    alternatives = [" ".join(words)]
+    seen = set()
+    for w in words + list(DISTRACTORS):
+        if w not in seen and (_vocab is None or w in _vocab):
+            seen.add(w)
+            alternatives.append(w)
+    alternatives.append(UNK)
+    return json.dumps(alternatives)
+
+
+def precompute() -> int:
+    """Monta as gramaticas de todas as frases dos modulos. Retorna quantas."""
+    global _built, _vocab
+    with _lock:
+        if _built:
+            return len(_cache)
+        _vocab = _load_vocab()
+        for _, arquivo, _ in config.MODULOS:
+            caminho = os.path.join(config.CSV_DIR, arquivo)
+            if not os.path.exists(caminho):
+                continue
+            try:
+                df = pd.read_csv(caminho, on_bad_lines='skip', encoding='utf-8')
+            except Exception as e:
+                print(f"[ERR] phrase_grammar.precompute({arquivo}): {e}")
+                continue
+            for phrase in df["en"].dropna().astype(str):
+                if phrase not in _cache:
+                    _cache[phrase] = build_grammar(phrase)
+        _built = True
+        return len(_cache)
+
+
+def grammar_for(phrase: str) -> Optional[str]:
+    """Gramatica da frase alvo (do cache pre-montado ou montada na hora)."""
+    if not _built:
+        precompute()
+    phrase = str(phrase)
+    try:
+        return _cache[phrase]
+    except KeyError:
+        grammar = build_grammar(phrase)
+        with _lock:
+            _cache[phrase] = grammar
+        return grammar
@@ -0,0 +1,124 @@
+"""Pre-renderizacao do audio (TTS) das frases de todos os modulos.
+
+A aula, o coach e a prova oral tocam o audio de referencia de cada frase,
+servido pelo audio_store (cache enderecado por conteudo em
+config.AUDIO_STORE_DIR). Antes, o audio que faltava era sintetizado na hora,
+dentro do request, e a primeira visita a cada frase esperava o TTS. Este
+script gera tudo antes:
+
+  - percorre os CSVs de config.MODULOS e sintetiza cada texto distinto uma vez
+    so (frases repetidas entre modulos e a prova oral usam o mesmo audio) com
+    o backend de config.TTS_BACKEND, em um pool limitado de threads;
+  - grava cada arquivo de forma atomica (arquivo temporario + os.replace), entao
+    o app nunca serve um MP3 pela metade;
+  - a chave do store e o hash do texto (e do backend): so as frases novas ou
+    alteradas no CSV sao sintetizadas em uma nova execucao;
+  - as frases dos modulos ficam fixas no store (pinned.json): nao contam no
+    AUDIO_STORE_MAX_MB nem sao despejadas pelo LRU.
+
+No app, as paginas so servem arquivos (`audio_store.serve()`): se o audio ainda
+nao existe, ele e agendado em background e a pagina segue sem esperar.
+
+No Docker o script roda no build (ver Dockerfile): a imagem ja sai com o
+audio dos modulos em AUDIO_STORE_DIR, gerado com o TTS_BACKEND da imagem.
+Fora dele, rodar no deploy com o mesmo AUDIO_STORE_DIR e TTS_BACKEND do app.
+
+Uso:
+    python prerender_tts.py
+    python prerender_tts.py --workers 8 --modules aeroporto.csv hotel.csv
+    python prerender_tts.py --backend espeak
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd  # noqa: E402
+
+import audio_store  # noqa: E402
+import config  # noqa: E402
+import tts  # noqa: E402
+
+LANG = "en"
+
+
+def render(text: str, key: str) -> str:
+    """Sintetiza `text` e grava no store sob `key`. Retorna o caminho."""
+    return audio_store.put(key, tts.synthesize(text, lang=LANG))
+
+
+def collect_texts(modules: Optional[list[str]] = None) -> dict[str, str]:
+    """{chave do store: texto} de todas as frases dos modulos (sem repeticao)."""
+    texts: dict[str, str] = {}
+    for _, arquivo, _ in config.MODULOS:
+        if modules and arquivo not in modules:
+            continue
+        caminho = os.path.join(config.CSV_DIR, arquivo)
+        if not os.path.exists(caminho):
+            print(f"[WARN] {arquivo} nao encontrado")
+            continue
+        try:
+            df = pd.read_csv(caminho, on_bad_lines='skip', encoding='utf-8')
+        except Exception as e:
+            print(f"[ERR] prerender_tts.collect_texts({arquivo}): {e}")
+            continue
+        for text in df["en"].dropna().astype(str):
+            if audio_store.normalize_text(text):
+                texts.setdefault(audio_store.key_for(text, LANG), text)
+    return texts
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Gera o audio TTS de todas as frases dos modulos.")
+    parser.add_argument("--workers", type=int, default=config.TTS_PRERENDER_WORKERS,
+                        help="sinteses simultaneas")
+    parser.add_argument("--modules", nargs="+", help="so estes CSVs (ex.: aeroporto.csv)")
+    parser.add_argument("--backend", default=config.TTS_BACKEND, choices=sorted(tts.BACKENDS),
+                        help="backend de TTS (padrao: config.TTS_BACKEND)")
+    parser.add_argument("--dry-run", action="store_true", help="so mostra o que seria gerado")
+    args = parser.parse_args(argv)
+    config.TTS_BACKEND = args.backend
+
+    texts = collect_texts(args.modules)
+    todo = {k: t for k, t in texts.items() if not audio_store.contains(k)}
+    print(f"🔊 {len(texts)} frases distintas, {len(todo)} para sintetizar, "
+          f"backend {args.backend}, {args.workers} workers")
+    if args.dry_run:
+        return 0
+    # Frases dos modulos ficam fixas no store (fora do limite/LRU) antes de
+    # sintetizar, para o proprio build nao despejar o que acabou de gerar.
+    # Execucao completa substitui a lista (frases removidas do CSV saem dela).
+    audio_store.set_pins(texts, replace=not args.modules)
+    if not todo:
+        return 0
+
+    t0 = time.perf_counter()
+    done, errors = 0, 0
+    with ThreadPoolExecutor(max_workers=max(1, args.workers), thread_name_prefix="tts-render") as pool:
+        futures = {pool.submit(render, text, key): text for key, text in todo.items()}
+        for fut in as_completed(futures):
+            try:
+                fut.result()
+            except Exception as e:
+                errors += 1
+                print(f"[ERR] {futures[fut][:50]!r}: {e}")
+                continue
+            done += 1
+            if done % 50 == 0:
+                print(f"[INFO] {done}/{len(todo)}")
+    audio_store.flush()
+
+    wall = time.perf_counter() - t0
+    store = audio_store.stats()
+    print(f"✅ {done} frases sintetizadas, {errors} erros em {wall:.1f}s "
+          f"({done / wall:.1f} frases/s); store: {store['entries']} audios, "
+          f"{(store['bytes'] + store['pinned_bytes']) / 1024 / 1024:.1f} MB")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,380 @@
+# progress_journal.py — Fila write-behind do progresso dos alunos
+#
+# As tentativas pontuadas nao escrevem mais direto no banco: cada escrita vai
+# para um journal local (append + fsync, um JSON por linha) e para um estado
+# em memoria coalescido por usuario. Uma thread em background descarrega tudo
+# em uma unica transacao a cada PROGRESS_FLUSH_INTERVAL segundos, ou antes se
+# houver PROGRESS_FLUSH_THRESHOLD escritas pendentes.
+#
+# Coalescencia (todas idempotentes, por isso o replay do journal e seguro):
+#   progress  -> ultima linha gravada vence
+#   module    -> maior indice por modulo
+#   score     -> maior nota por (modulo, licao)
+#   xp        -> ultimo valor
+#   discard   -> zera o que estava pendente (usuario deletado)
+#
+# Cada journal tem um dono so: o processo trava PATH.lock (flock exclusivo).
+# Com varios processos (workers do Streamlit/serve, batch_score), cada um
+# pega o primeiro slot livre (PATH, PATH.1, PATH.2, ...); assim nenhum
+# reaplica nem apaga o journal de outro, e um processo reiniciado reaplica o
+# que ficou no slot que ele pegar.
+
+import atexit
+import json
+import os
+import threading
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava (desenvolvimento, um processo so)
+    fcntl = None
+
+import config
+import database
+
+_MAX_SLOTS = 64
+
+
+class JournalLocked(RuntimeError):
+    """O journal ja tem dono (outro processo, ou outro ProgressJournal neste)."""
+
+
+def _lock_exclusive(lock_path: str):
+    """Abre e trava `lock_path` (flock sem esperar). Levanta JournalLocked se ocupado."""
+    fh = open(lock_path, "a")
+    if fcntl is None:
+        return fh
+    try:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        fh.close()
+        raise JournalLocked(f"journal {lock_path[:-len('.lock')]} em uso por outro processo")
+    return fh
+
+
+def _new_pending() -> dict:
+    return {"progress": None, "modules": {}, "scores": {}, "xp": None}
+
+
+def _apply(pending: dict, entry: dict) -> None:
+    """Aplica uma entrada do journal ao estado coalescido de um usuario."""
+    op = entry["op"]
+    if op == "discard":
+        pending.update(_new_pending())
+    elif op == "progress":
+        pending["progress"] = dict(entry["data"])
+        pending["xp"] = None  # o XP ja vem na linha de progresso
+    elif op == "module":
+        mod, idx = entry["module"], int(entry["indice"])
+        pending["modules"][mod] = max(idx, pending["modules"].get(mod, idx))
+    elif op == "score":
+        key = (entry["module"], int(entry["lesson"]))
+        score = int(entry["score"])
+        pending["scores"][key] = max(score, pending["scores"].get(key, score))
+    elif op == "xp":
+        if pending["progress"] is not None:
+            pending["progress"]["xp"] = int(entry["xp"])
+        else:
+            pending["xp"] = int(entry["xp"])
+
+
+def _merge_older(newer: dict, older: dict) -> None:
+    """Junta um snapshot antigo (descarga que falhou) por baixo do estado atual."""
+    if newer["progress"] is None:
+        if older["progress"] is not None:
+            # A linha antiga volta inteira; um XP chegado depois vai por cima
+            # (como no op "xp" de _apply), senao so o XP seria gravado
+            newer["progress"] = dict(older["progress"])
+            if newer["xp"] is not None:
+                newer["progress"]["xp"] = newer["xp"]
+                newer["xp"] = None
+        elif newer["xp"] is None:
+            newer["xp"] = older["xp"]
+    for mod, idx in older["modules"].items():
+        newer["modules"][mod] = max(idx, newer["modules"].get(mod, idx))
+    for key, score in older["scores"].items():
+        newer["scores"][key] = max(score, newer["scores"].get(key, score))
+
+
+def _statements(username: str, pending: dict) -> list[tuple[str, tuple]]:
+    stmts = []
+    p = pending["progress"]
+    if p is not None:
+        stmts.append(database._progress_stmt(
+            username, p["pagina"], p["arquivo_atual"], p["indice"],
+            p["xp"], p["porc_atual"], p["tentativa"],
+        ))
+    elif pending["xp"] is not None:
+        stmts.append(database._xp_stmt(username, pending["xp"]))
+    for mod, idx in pending["modules"].items():
+        stmts.append(database._module_progress_stmt(username, mod, idx))
+    for (mod, lesson), score in pending["scores"].items():
+        stmts.append(database._lesson_score_stmt(username, mod, lesson, score))
+    return stmts
+
+
+class ProgressJournal:
+    """Journal duravel + fila coalescida + thread de descarga."""
+
+    def __init__(self, path: str, interval: float = 1.0, threshold: int = 200):
+        self.path = path
+        self.flushing_path = path + ".flushing"
+        self.interval = interval
+        self.threshold = max(1, threshold)
+
+        self._lock = threading.Lock()          # estado em memoria + arquivo
+        self._flush_lock = threading.Lock()    # uma descarga por vez
+        self._wake = threading.Event()
+        self._pending: dict[str, dict] = {}
+        self._inflight: dict[str, dict] = {}   # snapshot sendo gravado agora
+        self._writes = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Trava antes de ler: o journal (e o .flushing) passam a ser so deste objeto
+        self._owner = _lock_exclusive(path + ".lock")
+        self._replay()
+        self._fh = open(self.path, "a", encoding="utf-8")
+
+        self._thread = threading.Thread(target=self._run, name="progress-journal", daemon=True)
+        self._thread.start()
+        if self._pending:
+            self._wake.set()
+
+    # -- Journal em disco --
+
+    def _replay(self) -> None:
+        """Reaplica escritas que nao chegaram ao banco (crash ou descarga com erro)."""
+        replayed = 0
+        for p in (self.flushing_path, self.path):
+            if not os.path.exists(p):
+                continue
+            with open(p, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # ultima linha truncada por um crash
+                    _apply(self._pending.setdefault(entry["u"], _new_pending()), entry)
+                    replayed += 1
+        if replayed:
+            self._writes = replayed
+            print(f"[INFO] progress_journal: {replayed} escritas reaplicadas do journal")
+
+    def _rotate(self) -> None:
+        """Move o journal atual para .flushing (chamar com _lock)."""
+        self._fh.close()
+        if os.path.exists(self.flushing_path):
+            # Descarga anterior falhou: acumula no mesmo arquivo
+            with open(self.path, "rb") as src, open(self.flushing_path, "ab") as dst:
+                dst.write(src.read())
+                dst.flush()
+                os.fsync(dst.fileno())
+            os.remove(self.path)
+        else:
+            os.replace(self.path, self.flushing_path)
+        self._fh = open(self.path, "a", encoding="utf-8")
+
+    # -- API --
+
+    def record(self, username: str, entry: dict) -> None:
+        self.record_many(username, [entry])
+
+    def record_many(self, username: str, entries: list[dict]) -> None:
+        """Grava varias entradas de uma vez: um write + um fsync para todas."""
+        entries = [{"u": username, **e} for e in entries]
+        lines = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries)
+        with self._lock:
+            self._fh.write(lines)
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+            pending = self._pending.setdefault(username, _new_pending())
+            for entry in entries:
+                _apply(pending, entry)
+            self._writes += len(entries)
+            if self._writes >= self.threshold:
+                self._wake.set()
+
+    def has_pending(self, username: str) -> bool:
+        with self._lock:
+            return username in self._pending or username in self._inflight
+
+    def discard(self, username: str) -> None:
+        """Esquece escritas pendentes de um usuario (ex.: antes de deleta-lo).
+
+        Espera a descarga em andamento e registra o descarte no journal, para
+        que um replay apos crash nao ressuscite os dados. Os erros por palavra
+        (fila propria do database) sao cancelados pelo `delete_user`.
+        """
+        with self._flush_lock:
+            self.record(username, {"op": "discard"})
+
+    def overlay(self, username: str) -> list[dict]:
+        """Estados ainda nao gravados do usuario, do mais antigo ao mais novo."""
+        with self._lock:
+            return [
+                {**s, "modules": dict(s["modules"]), "scores": dict(s["scores"])}
+                for s in (self._inflight.get(username), self._pending.get(username)) if s
+            ]
+
+    def flush(self, username: Optional[str] = None) -> bool:
+        """Descarrega a fila no banco. Retorna False se a gravacao falhou.
+
+        Com `username`, so faz algo se ele tiver escritas pendentes (a fila
+        inteira vai junto: e uma transacao so de qualquer forma).
+        """
+        if username is not None and not self.has_pending(username):
+            return True
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return True
+                snapshot, self._pending = self._pending, {}
+                self._inflight = snapshot
+                self._writes = 0
+                self._rotate()
+
+            stmts = []
+            for user, pending in snapshot.items():
+                stmts.extend(_statements(user, pending))
+            if not stmts:
+                with self._lock:
+                    self._inflight = {}
+                    os.remove(self.flushing_path)
+                return True
+            try:
+                conn = database._get_conn()
+                with conn:
+                    database._execute_batch(conn, stmts)
+            except Exception as e:
+                print(f"[ERR] progress_journal.flush: {e}")
+                with self._lock:
+                    for user, older in snapshot.items():
+                        _merge_older(self._pending.setdefault(user, _new_pending()), older)
+                    self._inflight = {}
+                return False
+
+            with self._lock:
+                self._inflight = {}
+                try:
+                    os.remove(self.flushing_path)
+                except FileNotFoundError:
+                    pass
+            return True
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._pending:
+                self.flush()
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._fh.close()
+            self._owner.close()  # solta o flock
+
+
+# ---------------------------------------------------------------------------
+# Singleton do processo
+# ---------------------------------------------------------------------------
+_journal: Optional[ProgressJournal] = None
+_journal_lock = threading.Lock()
+
+
+def get_journal() -> ProgressJournal:
+    global _journal
+    if _journal is None:
+        with _journal_lock:
+            if _journal is None:
+                # Primeiro slot sem dono; com um processo so e sempre o PATH
+                for slot in range(_MAX_SLOTS):
+                    path = config.PROGRESS_JOURNAL_PATH + (f".{slot}" if slot else "")
+                    try:
+                        _journal = ProgressJournal(
+                            path,
+                            interval=config.PROGRESS_FLUSH_INTERVAL,
+                            threshold=config.PROGRESS_FLUSH_THRESHOLD,
+                        )
+                        break
+                    except JournalLocked:
+                        continue
+                else:
+                    raise JournalLocked(f"{_MAX_SLOTS} journals de progresso em uso "
+                                        f"({config.PROGRESS_JOURNAL_PATH}.*)")
+                atexit.register(_journal.flush)
+    return _journal
+
+
+def record_attempt(username: str, pagina: str, arquivo_atual: str,
+                   indice: int, xp: int, porc_atual: int, tentativa: int,
+                   lesson_score: Optional[int] = None) -> None:
+    """Enfileira progresso global + indice do modulo (+ nota da licao atual), com um fsync so."""
+    entries = [
+        {"op": "progress", "data": {
+            "pagina": pagina, "arquivo_atual": arquivo_atual, "indice": int(indice),
+            "xp": int(xp), "porc_atual": int(porc_atual), "tentativa": int(tentativa),
+        }},
+        {"op": "module", "module": arquivo_atual, "indice": int(indice)},
+    ]
+    if lesson_score is not None:
+        entries.append({"op": "score", "module": arquivo_atual,
+                        "lesson": int(indice), "score": int(lesson_score)})
+    get_journal().record_many(username, entries)
+
+
+def record_module_progress(username: str, module_file: str, indice: int) -> None:
+    get_journal().record(username, {"op": "module", "module": module_file, "indice": int(indice)})
+
+
+def record_xp(username: str, xp: int) -> None:
+    get_journal().record(username, {"op": "xp", "xp": int(xp)})
+
+
+def flush(username: Optional[str] = None) -> bool:
+    """Garante que as escritas pendentes (de `username`, ou todas) estao no banco."""
+    if _journal is None:
+        return True
+    return _journal.flush(username)
+
+
+def discard(username: str) -> None:
+    if _journal is not None:
+        _journal.discard(username)
+
+
+# ---------------------------------------------------------------------------
+# Leituras com as escritas pendentes sobrepostas
+# ---------------------------------------------------------------------------
+
+def load_progress(username: str) -> Optional[dict]:
+    dados = database.load_progress(username)
+    for state in get_journal().overlay(username):
+        if state["progress"] is not None:
+            dados = dict(state["progress"])
+        elif state["xp"] is not None and dados is not None:
+            dados = {**dados, "xp": state["xp"]}
+    return dados
+
+
+def load_module_progress(username: str, module_file: str) -> int:
+    indice = database.load_module_progress(username, module_file)
+    for state in get_journal().overlay(username):
+        indice = max(indice, state["modules"].get(module_file, indice))
+    return indice
+
+
+def load_all_module_progress(username: str) -> dict:
+    progresso = database.load_all_module_progress(username)
+    for state in get_journal().overlay(username):
+        for mod, idx in state["modules"].items():
+            progresso[mod] = max(idx, progresso.get(mod, idx))
+    return progresso
+
+
+def load_lesson_score(username: str, module_file: str, lesson_idx: int) -> int:
+    score = database.load_lesson_score(username, module_file, lesson_idx)
+    for state in get_journal().overlay(username):
+        score = max(score, state["scores"].get((module_file, int(lesson_idx)), score))
+    return score
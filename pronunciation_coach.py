@@ -7,17 +7,18 @@ from __future__ import annotations
 
 import streamlit as st
 import os
-import io
-import json
-import wave
 import string
 import random
-from gtts import gTTS
-from vosk import Model, KaldiRecognizer
-from streamlit_mic_recorder import mic_recorder
+from typing import Optional
 
 import config
 import database
+import recognition_service
+import live_capture
+import scoring
+import attempt_cache
+import audio_store
+import tts
 
 # ---------------------------------------------------------------------------
 # DICIONÁRIO FONÉTICO BR — Pronúncia "aportuguesada" das palavras mais comuns
@@ -258,22 +259,25 @@ def _detect_difficult_sounds(word: str) -> list[str]:
     return tips
 
 
-def analyze_pronunciation(target_phrase: str, spoken_text: str) -> dict:
+def analyze_pronunciation(target_phrase: str, spoken_text: str,
+                          words: Optional[list[dict]] = None) -> dict:
     """
     Analisa pronúncia comparando frase alvo com o que foi falado.
+    O alinhamento e feito pelo scoring (distancia de edicao); `words` sao as
+    palavras do Vosk com confianca/tempo, quando disponiveis.
     Retorna dict com feedback detalhado.
     """
-    target_words = _clean(target_phrase).split()
-    spoken_words = _clean(spoken_text).split()
+    avaliacao = scoring.score(target_phrase, {"text": spoken_text, "words": words or []})
 
     results = []
     correct_count = 0
     tips_shown = set()
     tip_messages = []
 
-    for i, target_w in enumerate(target_words):
-        spoken_w = spoken_words[i] if i < len(spoken_words) else ""
-        is_correct = (spoken_w == target_w)
+    for w in avaliacao["words"]:
+        target_w = w["target"]
+        spoken_w = w["spoken"] if not w["spoken"].startswith("[") else ""
+        is_correct = w["correct"]
 
         phonetic_target = get_word_phonetic(target_w)
         phonetic_spoken = get_word_phonetic(spoken_w) if spoken_w else "(silêncio)"
@@ -284,13 +288,18 @@ def analyze_pronunciation(target_phrase: str, spoken_text: str) -> dict:
             "correct": is_correct,
             "phonetic_target": phonetic_target,
             "phonetic_spoken": phonetic_spoken,
+            "conf": w["conf"],
+            "start": w["start"],
+            "end": w["end"],
         }
 
         if is_correct:
             correct_count += 1
         else:
             # Gera mensagem do professor
-            if spoken_w:
+            if w["low_conf"]:
+                result["feedback"] = f"Quase! Não ficou claro. A pronúncia é '{phonetic_target}'"
+            elif spoken_w:
                 result["feedback"] = f"Você disse '{phonetic_spoken}', o correto é '{phonetic_target}'"
             else:
                 result["feedback"] = f"Palavra não detectada. A pronúncia é '{phonetic_target}'"
@@ -303,14 +312,12 @@ def analyze_pronunciation(target_phrase: str, spoken_text: str) -> dict:
 
         results.append(result)
 
-    total = len(target_words)
-    score = int((correct_count / total) * 100) if total > 0 else 0
-
     return {
         "results": results,
-        "score": score,
+        "score": avaliacao["score"],
         "correct_count": correct_count,
-        "total": total,
+        "total": avaliacao["total"],
+        "extra": [e["word"] for e in avaliacao["extra"] if not e["word"].startswith("[")],
         "tips": tip_messages,
     }
 
@@ -322,15 +329,9 @@ def analyze_pronunciation(target_phrase: str, spoken_text: str) -> dict:
 def render_pronunciation_coach(username: str):
     """Renderiza o módulo Professor de Pronúncia AI."""
 
-    # Load Vosk model (cached)
-    @st.cache_resource
-    def _load_vosk():
-        if os.path.exists(config.MODEL_DIR):
-            return Model(config.MODEL_DIR)
-        return None
-
-    model_vosk = _load_vosk()
-    if not model_vosk:
+    # Modelo Vosk compartilhado (recognition_service); durante o aquecimento
+    # a pagina abre e o gravador mostra o aviso de espera
+    if not recognition_service.warming_up() and not recognition_service.available():
         st.error("⚠️ Modelo de reconhecimento de voz não encontrado. Verifique a pasta 'model'.")
         return
 
@@ -563,21 +564,14 @@ def render_pronunciation_coach(username: str):
 """, unsafe_allow_html=True)
 
     # --- AUDIO DO PROFESSOR ---
-    modulo_slug = os.path.splitext(arquivo)[0]
-    audio_id = atual.get("id", f"{modulo_slug}_{idx}")
-    path_ref = os.path.join(config.AUDIOS_DIR, f"{modulo_slug}_{audio_id}.mp3")
-    if not os.path.exists(path_ref):
-        try:
-            gTTS(text=frase_en, lang='en').save(path_ref)
-        except Exception:
-            pass
+    path_ref = audio_store.serve(frase_en)
 
     st.markdown("""
 <div style="display:flex; align-items:center; gap:10px; margin-bottom:8px;">
 <span style="font-size:13px; color:#a78bfa; font-weight:700; letter-spacing:1px;">🔊 OUÇA O PROFESSOR</span>
 </div>""", unsafe_allow_html=True)
 
-    if os.path.exists(path_ref):
+    if path_ref:
         st.audio(path_ref)
 
     st.markdown("<div style='height:12px'></div>", unsafe_allow_html=True)
@@ -590,11 +584,9 @@ def render_pronunciation_coach(username: str):
 
     c_mic, c_retry = st.columns([3, 1], gap="small")
     with c_mic:
-        gravacao = mic_recorder(
-            start_prompt="🔴 GRAVAR",
-            stop_prompt="⏹️ PARAR",
-            format="wav",
-            key=f"coach_mic_{idx}_{st.session_state['coach_attempt']}"
+        gravacao = live_capture.recorder(
+            key=f"coach_mic_{idx}_{st.session_state['coach_attempt']}",
+            phrase=frase_en,
         )
     with c_retry:
         if st.button("🔄 REPETIR", key="coach_retry", use_container_width=True):
@@ -603,11 +595,19 @@ def render_pronunciation_coach(username: str):
 
     # --- ANÁLISE & FEEDBACK ---
     if gravacao:
-        audio_data = io.BytesIO(gravacao['bytes'])
-        with wave.open(audio_data, 'rb') as wf:
-            rec = KaldiRecognizer(model_vosk, wf.getframerate())
-            rec.AcceptWaveform(wf.readframes(wf.getnframes()))
-            ouvida = json.loads(rec.FinalResult()).get("text", "").lower()
+        def _reconhecer() -> dict:
+            if "text" in gravacao:
+                return gravacao  # captura ao vivo: ja reconhecido
+            return recognition_service.recognize_result(gravacao['bytes'], phrase=frase_en)
+
+        # Uma decodificacao por gravacao; reruns reaproveitam (attempt_cache)
+        try:
+            tentativa = attempt_cache.evaluate(gravacao, frase_en, _reconhecer)
+        except (recognition_service.RecognitionBusy, recognition_service.RecognitionTimeout) as e:
+            st.warning(f"⏳ {e}")
+            return
+        reconhecido = tentativa["recognized"]
+        ouvida = reconhecido["text"]
 
         if not ouvida.strip():
             st.warning("🤔 Não consegui ouvir nada. Tente falar mais alto e perto do microfone.")
@@ -617,7 +617,7 @@ def render_pronunciation_coach(username: str):
         st.session_state["coach_last_spoken"] = f"Você disse: '{ouvida}' 😮"
         
         # Analisa pronúncia
-        analysis = analyze_pronunciation(frase_en, ouvida)
+        analysis = analyze_pronunciation(frase_en, ouvida, reconhecido.get("words"))
 
         # O que o sistema ouviu
         st.markdown(f"""
@@ -679,23 +679,25 @@ def render_pronunciation_coach(username: str):
 </div>""", unsafe_allow_html=True)
 
         # Salva no histórico
-        st.session_state["coach_history"].append({
-            "phrase": frase_en,
-            "score": analysis["score"],
-            "errors": [r["target"] for r in analysis["results"] if not r["correct"]],
-        })
-
-        # Registra erros no banco (aprendizado adaptativo)
-        target_words = _clean(frase_en).split()
-        wrong_words = [r["target"] for r in analysis["results"] if not r["correct"]]
-        database.record_word_errors(username, wrong_words, target_words)
-
-        # XP
-        if analysis["correct_count"] > 0:
-            xp_gain = analysis["correct_count"] * 2  # 2 XP por acerto no modo professor
-            current_xp = int(st.session_state.get("xp", 0))
-            st.session_state["xp"] = current_xp + xp_gain
-            st.toast(f"+{xp_gain} XP (Modo Professor)", icon="🎓")
+        # Historico, erros e XP: uma vez por gravacao (reruns nao repetem)
+        if attempt_cache.claim(tentativa):
+            st.session_state["coach_history"].append({
+                "phrase": frase_en,
+                "score": analysis["score"],
+                "errors": [r["target"] for r in analysis["results"] if not r["correct"]],
+            })
+
+            # Registra erros no banco (aprendizado adaptativo)
+            target_words = _clean(frase_en).split()
+            wrong_words = [r["target"] for r in analysis["results"] if not r["correct"]]
+            database.record_word_errors_async(username, wrong_words, target_words)
+
+            # XP
+            if analysis["correct_count"] > 0:
+                xp_gain = analysis["correct_count"] * 2  # 2 XP por acerto no modo professor
+                current_xp = int(st.session_state.get("xp", 0))
+                st.session_state["xp"] = current_xp + xp_gain
+                st.toast(f"+{xp_gain} XP (Modo Professor)", icon="🎓")
 
         # Botões de ação
         st.markdown("<br>", unsafe_allow_html=True)
@@ -725,12 +727,10 @@ def render_pronunciation_coach(username: str):
             for err in errors[:5]:  # Max 5
                 word = err["target"]
                 phonetic = err["phonetic_target"]
-                word_audio_path = os.path.join(config.AUDIOS_DIR, f"_word_{word}.mp3")
-                if not os.path.exists(word_audio_path):
-                    try:
-                        gTTS(text=word, lang='en', slow=True).save(word_audio_path)
-                    except Exception:
-                        continue
+                try:
+                    word_audio_path = audio_store.get_or_create(word, rate=tts.SLOW)
+                except Exception:
+                    continue
                 col_w, col_a = st.columns([1, 2])
                 with col_w:
                     st.markdown(f"""
@@ -0,0 +1,426 @@
+# recognition_service.py — Servico compartilhado de reconhecimento de voz (Vosk)
+#
+# Pool fixo de threads com recognizers quentes sobre o modelo compartilhado
+# do processo (model_registry).
+# As paginas (aula, prova oral, professor de pronuncia) chamam `recognize()`
+# em vez de montar um KaldiRecognizer na thread do script:
+#   - no maximo RECOGNITION_WORKERS decodes ao mesmo tempo;
+#   - no maximo RECOGNITION_MAX_QUEUE pedidos esperando; acima disso o pedido
+#     e recusado na hora com RecognitionBusy (controle de admissao);
+#   - `recognize_text()` espera ate RECOGNITION_TIMEOUT segundos;
+#   - latencia de fila e de decode por pedido fica em `stats()`.
+#
+# Todo WAV passa antes pelo audio_frontend (mono, 16 kHz, sem silencio nas
+# pontas, duracao limitada); as amostras poupadas tambem vao para `stats()`.
+#
+# Com `phrase`, o decode usa a gramatica restrita da frase alvo
+# (phrase_grammar) em vez do vocabulario aberto; RECOGNITION_GRAMMAR=0 volta
+# ao vocabulario aberto em todo lugar.
+#
+# `open_stream()` entrega um RecognitionStream para captura ao vivo: os
+# pedacos de audio vao para o recognizer conforme chegam (na thread de quem
+# captura, fora do pool), com resultado parcial a cada pedaco; no fim so
+# falta decodificar o ultimo pedaco. Como decodificam fora do pool, as
+# capturas tem limite proprio: no maximo RECOGNITION_MAX_STREAMS abertas
+# (acima disso, RecognitionBusy). Captura sem audio ha mais de
+# RECOGNITION_STREAM_MAX_SECONDS (pagina fechada no meio) e encerrada para
+# liberar a vaga.
+
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Optional
+
+from vosk import KaldiRecognizer
+
+import audio_frontend
+import config
+import model_registry
+import phrase_grammar
+
+
+class RecognitionBusy(RuntimeError):
+    """Fila de reconhecimento cheia: o pedido foi recusado sem ser enfileirado."""
+
+
+class RecognitionTimeout(RuntimeError):
+    """O reconhecimento nao terminou dentro do tempo limite."""
+
+
+def _clean_text(text: str) -> str:
+    """Tira o "[unk]" (fala fora da gramatica) do texto comparado."""
+    return " ".join(w for w in text.split() if w != phrase_grammar.UNK)
+
+
+class RecognitionStream:
+    """Reconhecimento incremental de uma captura ao vivo (PCM 16-bit mono)."""
+
+    def __init__(self, service: "RecognitionService", rate: int, grammar: Optional[str]):
+        self._service = service
+        self.rate = rate
+        self.grammar = grammar
+        self._item = service._acquire(rate, grammar)
+        self._lock = threading.Lock()
+        self.last_chunk = time.monotonic()
+        self._segments: list[str] = []   # trechos ja fechados pelo endpointer do Vosk
+        self._words: list[dict] = []     # palavras com conf/start/end desses trechos
+        self._partial = ""
+        self._pcm = bytearray()
+        self.result: Optional[dict] = None
+
+    @property
+    def text(self) -> str:
+        """Tudo que ja foi reconhecido, incluindo o trecho parcial atual."""
+        return " ".join(t for t in self._segments + [self._partial] if t)
+
+    @property
+    def duration_s(self) -> float:
+        return len(self._pcm) / 2 / self.rate
+
+    def accept_chunk(self, pcm: bytes) -> str:
+        """Alimenta um pedaco de audio; retorna o texto parcial ate aqui."""
+        with self._lock:
+            if self.result is not None:
+                return self.result["text"]
+            self._pcm += pcm
+            self.last_chunk = time.monotonic()
+            rec = self._item[0]
+            if rec.AcceptWaveform(pcm):
+                seg = json.loads(rec.Result())
+                self._segments.append(_clean_text(seg.get("text", "")))
+                self._words.extend(seg.get("result", []))
+                self._partial = ""
+            else:
+                self._partial = _clean_text(json.loads(rec.PartialResult()).get("partial", ""))
+            return self.text
+
+    def finish(self) -> dict:
+        """Fecha a captura: decodifica o que falta e devolve o recognizer ao pool."""
+        with self._lock:
+            return self._finish_locked()
+
+    def _finish_locked(self) -> dict:
+        if self.result is not None:
+            return self.result
+        started = time.perf_counter()
+        rec = self._item[0]
+        raw = json.loads(rec.FinalResult())
+        rec.Reset()
+        self._service._release(self.rate, self._item)
+        self._segments.append(_clean_text(raw.get("text", "")))
+        self._words.extend(raw.get("result", []))
+        self._partial = ""
+        finish_ms = (time.perf_counter() - started) * 1000
+        self.result = {
+            "text": self.text.lower(),
+            "words": list(self._words),
+            "raw": raw,
+            "grammar": self.grammar is not None,
+            "sample_rate": self.rate,
+            "duration_s": self.duration_s,
+            "finish_ms": finish_ms,
+            "pcm": bytes(self._pcm),
+        }
+        self._service._stream_finished(self, finish_ms)
+        return self.result
+
+
+class RecognitionService:
+    """Pool limitado de decodes Vosk com recognizers reaproveitados."""
+
+    def __init__(self, model, workers: int = 2, max_queue: int = 16, timeout: float = 20.0,
+                 recognizer_factory=KaldiRecognizer, warm_rate: int = 16000,
+                 max_streams: int = 8, stream_idle_timeout: float = 30.0):
+        self.model = model
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.max_streams = max(1, max_streams)
+        self.stream_idle_timeout = stream_idle_timeout
+        self.timeout = timeout
+        self._factory = recognizer_factory
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="vosk")
+        # Vagas = decodes em andamento + fila; sem vaga, recusa na hora
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_queue)
+        # Capturas ao vivo decodificam na thread de quem captura: vagas proprias
+        self._stream_slots = threading.BoundedSemaphore(self.max_streams)
+        self._streams: set = set()
+
+        # Recognizers ociosos por (taxa de amostragem, com gramatica?): o
+        # KaldiRecognizer e fixo na taxa, e um recognizer com gramatica so troca
+        # de frase via SetGrammar. Cada item e [recognizer, gramatica_atual].
+        self._lock = threading.Lock()
+        self._idle: dict[tuple[int, bool], list] = {}
+        self._latencies: deque = deque(maxlen=500)   # (fila_ms, decode_ms, com_gramatica)
+        self._counters = {"submitted": 0, "completed": 0, "rejected": 0,
+                          "timeouts": 0, "errors": 0, "recognizers_created": 0,
+                          "grammar_decodes": 0, "streams": 0, "streams_rejected": 0,
+                          "streams_reclaimed": 0,
+                          "samples_in": 0, "samples_saved": 0}
+        self._finish_latencies: deque = deque(maxlen=500)   # fim da captura -> resultado
+        self._in_flight = 0
+
+        # Aquece um recognizer por worker na taxa mais comum
+        for _ in range(self.workers):
+            self._release(warm_rate, self._new_recognizer(warm_rate, None))
+
+    # -- Recognizers --
+
+    def _new_recognizer(self, rate: int, grammar: Optional[str]) -> list:
+        with self._lock:
+            self._counters["recognizers_created"] += 1
+        if grammar is None:
+            rec = self._factory(self.model, rate)
+        else:
+            rec = self._factory(self.model, rate, grammar)
+        rec.SetWords(True)  # confianca e tempo por palavra (scoring)
+        return [rec, grammar]
+
+    def _acquire(self, rate: int, grammar: Optional[str]) -> list:
+        with self._lock:
+            idle = self._idle.get((rate, grammar is not None))
+            item = idle.pop() if idle else None
+        if item is None:
+            return self._new_recognizer(rate, grammar)
+        if grammar is not None and item[1] != grammar:
+            item[0].SetGrammar(grammar)
+            item[1] = grammar
+        return item
+
+    def _release(self, rate: int, item: list) -> None:
+        with self._lock:
+            idle = self._idle.setdefault((rate, item[1] is not None), [])
+            if len(idle) < self.workers:
+                idle.append(item)
+
+    # -- Decode --
+
+    def _decode(self, wav_bytes: bytes, enqueued: float, grammar: Optional[str] = None) -> dict:
+        started = time.perf_counter()
+        pcm, rate, frontend = audio_frontend.prepare(wav_bytes)
+        prepared = time.perf_counter()
+
+        if not pcm:
+            raw = {"text": ""}  # so silencio: nem passa pelo decoder
+        else:
+            item = self._acquire(rate, grammar)
+            try:
+                rec = item[0]
+                rec.AcceptWaveform(pcm)
+                raw = json.loads(rec.FinalResult())
+                rec.Reset()
+            except Exception:
+                item = None  # estado incerto: nao volta para o pool
+                raise
+            finally:
+                if item is not None:
+                    self._release(rate, item)
+
+        done = time.perf_counter()
+        queue_ms = (started - enqueued) * 1000
+        decode_ms = (done - prepared) * 1000
+        with self._lock:
+            self._counters["samples_in"] += frontend["samples_in"]
+            self._counters["samples_saved"] += frontend["samples_saved"]
+            self._latencies.append((queue_ms, decode_ms, grammar is not None))
+            if grammar is not None:
+                self._counters["grammar_decodes"] += 1
+        return {
+            "text": _clean_text(raw.get("text", "")),
+            "words": raw.get("result", []),
+            "raw": raw,
+            "grammar": grammar is not None,
+            "sample_rate": rate,
+            "duration_s": frontend["samples_out"] / rate,
+            "frontend": frontend,
+            "queue_ms": queue_ms,
+            "decode_ms": decode_ms,
+        }
+
+    def _done(self, fut: Future) -> None:
+        self._slots.release()
+        with self._lock:
+            self._in_flight -= 1
+            if fut.cancelled():
+                return
+            if fut.exception() is not None:
+                self._counters["errors"] += 1
+            else:
+                self._counters["completed"] += 1
+
+    def recognize(self, wav_bytes: bytes, grammar: Optional[str] = None) -> Future:
+        """Agenda o reconhecimento de um WAV. Retorna Future com o dict do resultado.
+
+        `grammar` (JSON de phrase_grammar) restringe o vocabulario do decode.
+        Levanta RecognitionBusy se ja houver `workers + max_queue` pedidos.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._counters["rejected"] += 1
+            raise RecognitionBusy("Reconhecimento de voz ocupado, tente novamente em instantes.")
+        with self._lock:
+            self._counters["submitted"] += 1
+            self._in_flight += 1
+        fut = self._executor.submit(self._decode, wav_bytes, time.perf_counter(), grammar)
+        fut.add_done_callback(self._done)
+        return fut
+
+    def recognize_result(self, wav_bytes: bytes, timeout: Optional[float] = None,
+                         grammar: Optional[str] = None) -> dict:
+        """Atalho bloqueante: dict do resultado (texto minusculo) ou RecognitionTimeout."""
+        fut = self.recognize(wav_bytes, grammar)
+        try:
+            result = fut.result(timeout=self.timeout if timeout is None else timeout)
+            return {**result, "text": result["text"].lower()}
+        except FutureTimeout:
+            fut.cancel()  # so tem efeito se ainda estiver na fila
+            with self._lock:
+                self._counters["timeouts"] += 1
+            raise RecognitionTimeout("O reconhecimento demorou demais, tente novamente.")
+
+    def recognize_text(self, wav_bytes: bytes, timeout: Optional[float] = None,
+                       grammar: Optional[str] = None) -> str:
+        """So o texto reconhecido (minusculo)."""
+        return self.recognize_result(wav_bytes, timeout, grammar)["text"]
+
+    # -- Captura ao vivo --
+
+    def open_stream(self, rate: int, grammar: Optional[str] = None) -> RecognitionStream:
+        """Sessao incremental; o decode roda na thread que chama accept_chunk().
+
+        Levanta RecognitionBusy se ja houver `max_streams` capturas abertas
+        (depois de encerrar as paradas ha mais de `stream_idle_timeout`).
+        """
+        if not self._stream_slots.acquire(blocking=False):
+            self._reclaim_idle_streams()
+            if not self._stream_slots.acquire(blocking=False):
+                with self._lock:
+                    self._counters["streams_rejected"] += 1
+                raise RecognitionBusy("Reconhecimento de voz ocupado, tente novamente em instantes.")
+        try:
+            stream = RecognitionStream(self, rate, grammar)
+        except BaseException:
+            self._stream_slots.release()
+            raise
+        with self._lock:
+            self._counters["streams"] += 1
+            self._streams.add(stream)
+        return stream
+
+    def _reclaim_idle_streams(self) -> None:
+        """Encerra capturas abandonadas (sem audio ha mais de stream_idle_timeout)."""
+        limit = time.monotonic() - self.stream_idle_timeout
+        with self._lock:
+            idle = [s for s in self._streams if s.last_chunk < limit]
+        for stream in idle:
+            # Sob a trava da captura: um pedaco que chegou depois da selecao
+            # (ou um finish() do dono) ganha, e a captura nao e encerrada
+            with stream._lock:
+                if stream.result is not None or stream.last_chunk >= limit:
+                    continue
+                stream._finish_locked()
+            with self._lock:
+                self._counters["streams_reclaimed"] += 1
+
+    def _stream_finished(self, stream: RecognitionStream, finish_ms: float) -> None:
+        with self._lock:
+            self._finish_latencies.append(finish_ms)
+            self._streams.discard(stream)
+        self._stream_slots.release()
+
+    def close(self) -> None:
+        """Encerra as threads do pool (servicos temporarios: benchmark, lote)."""
+        self._executor.shutdown(wait=True)
+
+    # -- Metricas --
+
+    def stats(self) -> dict:
+        with self._lock:
+            lat = list(self._latencies)
+            finish = list(self._finish_latencies)
+            out = {**self._counters, "in_flight": self._in_flight,
+                   "workers": self.workers, "max_queue": self.max_queue,
+                   "streams_open": len(self._streams), "max_streams": self.max_streams}
+        for name, values in (
+            ("queue_ms", [x[0] for x in lat]),
+            ("decode_ms", [x[1] for x in lat if not x[2]]),
+            ("decode_ms_grammar", [x[1] for x in lat if x[2]]),
+            ("stream_finish_ms", finish),
+        ):
+            values.sort()
+            if values:
+                out[name] = {
+                    "p50": round(values[len(values) // 2], 1),
+                    "p95": round(values[min(len(values) - 1, int(len(values) * 0.95))], 1),
+                    "max": round(values[-1], 1),
+                }
+        return out
+
+
+# ---------------------------------------------------------------------------
+# Singleton do processo
+# ---------------------------------------------------------------------------
+_service: Optional[RecognitionService] = None
+_service_lock = threading.Lock()
+
+
+def get_service() -> Optional[RecognitionService]:
+    """Servico do processo (espera o modelo do model_registry). None sem modelo."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                model = model_registry.get_model()
+                if model is None:
+                    return None
+                _service = RecognitionService(
+                    model,
+                    workers=config.RECOGNITION_WORKERS,
+                    max_queue=config.RECOGNITION_MAX_QUEUE,
+                    timeout=config.RECOGNITION_TIMEOUT,
+                    max_streams=config.RECOGNITION_MAX_STREAMS,
+                    stream_idle_timeout=config.RECOGNITION_STREAM_MAX_SECONDS,
+                )
+    return _service
+
+
+def available() -> bool:
+    """Modelo pronto para uso (nao espera um carregamento em andamento)."""
+    return model_registry.is_ready() and get_service() is not None
+
+
+def warming_up() -> bool:
+    """True enquanto o modelo carrega; comeca o carregamento se ninguem comecou."""
+    model_registry.preload(background=True)
+    return model_registry.is_loading()
+
+
+def _grammar(phrase: Optional[str]) -> Optional[str]:
+    if phrase is None or not config.RECOGNITION_GRAMMAR:
+        return None
+    return phrase_grammar.grammar_for(phrase)
+
+
+def recognize(wav_bytes: bytes, phrase: Optional[str] = None) -> Future:
+    return get_service().recognize(wav_bytes, _grammar(phrase))
+
+
+def recognize_text(wav_bytes: bytes, timeout: Optional[float] = None,
+                   phrase: Optional[str] = None) -> str:
+    """Texto reconhecido; com `phrase`, restrito a gramatica da frase alvo."""
+    return get_service().recognize_text(wav_bytes, timeout, _grammar(phrase))
+
+
+def recognize_result(wav_bytes: bytes, timeout: Optional[float] = None,
+                     phrase: Optional[str] = None) -> dict:
+    """Resultado completo (texto + palavras com conf/start/end) para o scoring."""
+    return get_service().recognize_result(wav_bytes, timeout, _grammar(phrase))
+
+
+def open_stream(rate: int, phrase: Optional[str] = None) -> RecognitionStream:
+    return get_service().open_stream(rate, _grammar(phrase))
+
+
+def stats() -> Optional[dict]:
+    return _service.stats() if _service is not None else None
@@ -0,0 +1,127 @@
+# scoring.py — Motor de pontuacao por alinhamento (frase alvo x transcricao)
+#
+# A comparacao antiga era posicao a posicao (dito[i] == alvo[i]): uma palavra
+# a mais ou a menos no comeco marcava todas as seguintes como erradas.
+# Aqui a transcricao e alinhada a frase alvo por distancia de edicao
+# (Levenshtein por palavras, programacao dinamica), entao cada palavra da
+# frase e casada com o que o aluno realmente disse naquele trecho.
+#
+# Com SetWords(True) o Vosk devolve confianca e tempo de cada palavra; uma
+# palavra casada mas com confianca abaixo de SCORING_MIN_CONF nao conta como
+# acerto (o decoder "chutou"). Sem essas informacoes, a transcricao em texto
+# ja basta.
+
+import string
+from typing import Optional
+
+import config
+
+MATCH, SUB, DEL, INS = "match", "sub", "del", "ins"
+
+_PUNCT = str.maketrans('', '', string.punctuation)
+
+
+def normalize(text: str) -> list[str]:
+    """Palavras minusculas sem pontuacao (mesma regra do `limpar` das paginas)."""
+    return str(text).lower().strip().translate(_PUNCT).split()
+
+
+def align(target: list[str], spoken: list[str]) -> list[tuple[str, Optional[int], Optional[int]]]:
+    """Alinhamento de custo minimo entre as palavras.
+
+    Retorna [(op, i_alvo, j_dito)] na ordem da frase: MATCH/SUB casam alvo[i]
+    com dito[j], DEL e uma palavra do alvo que nao foi dita (j None), INS uma
+    palavra dita a mais (i None). Custos: 0 para igual, 1 para o resto.
+    """
+    n, m = len(target), len(spoken)
+    dist = [[0] * (m + 1) for _ in range(n + 1)]
+    for i in range(1, n + 1):
+        dist[i][0] = i
+    for j in range(1, m + 1):
+        dist[0][j] = j
+    for i in range(1, n + 1):
+        row, prev = dist[i], dist[i - 1]
+        t = target[i - 1]
+        for j in range(1, m + 1):
+            row[j] = min(
+                prev[j - 1] + (t != spoken[j - 1]),
+                prev[j] + 1,
+                row[j - 1] + 1,
+            )
+
+    # Caminho de volta; em empate prefere casar (diagonal) a apagar/inserir
+    ops = []
+    i, j = n, m
+    while i > 0 or j > 0:
+        if i > 0 and j > 0 and dist[i][j] == dist[i - 1][j - 1] + (target[i - 1] != spoken[j - 1]):
+            ops.append((MATCH if target[i - 1] == spoken[j - 1] else SUB, i - 1, j - 1))
+            i, j = i - 1, j - 1
+        elif i > 0 and dist[i][j] == dist[i - 1][j] + 1:
+            ops.append((DEL, i - 1, None))
+            i -= 1
+        else:
+            ops.append((INS, None, j - 1))
+            j -= 1
+    ops.reverse()
+    return ops
+
+
+def _spoken_words(recognized) -> list[dict]:
+    """Palavras ditas com conf/start/end (quando o Vosk mandou) a partir do resultado."""
+    if isinstance(recognized, str):
+        return [{"word": w} for w in normalize(recognized)]
+    words = recognized.get("words") or []
+    if not words:
+        return [{"word": w} for w in normalize(recognized.get("text", ""))]
+    out = []
+    for w in words:
+        # "[unk]" (fala fora da gramatica) continua ocupando a posicao dele
+        tokens = [w["word"]] if w["word"].startswith("[") else normalize(w["word"])
+        for token in tokens:
+            out.append({"word": token, "conf": w.get("conf"),
+                        "start": w.get("start"), "end": w.get("end")})
+    return out
+
+
+def score(target_phrase: str, recognized, min_conf: Optional[float] = None) -> dict:
+    """Pontua a tentativa.
+
+    `recognized` e o texto reconhecido ou o dict do recognition_service
+    ({"text", "words": [{"word", "conf", "start", "end"}]}).
+    Retorna {"words": [...uma entrada por palavra do alvo...], "extra": [...],
+    "correct_count", "total", "score" (0-100), "wrong_words", "target"}.
+    """
+    min_conf = config.SCORING_MIN_CONF if min_conf is None else min_conf
+    target = normalize(target_phrase)
+    spoken = _spoken_words(recognized)
+
+    words, extra = [], []
+    for op, i, j in align(target, [w["word"] for w in spoken]):
+        said = spoken[j] if j is not None else {}
+        if op == INS:
+            extra.append(said)
+            continue
+        conf = said.get("conf")
+        low_conf = op == MATCH and conf is not None and conf < min_conf
+        words.append({
+            "target": target[i],
+            "spoken": said.get("word", ""),
+            "op": op,
+            "correct": op == MATCH and not low_conf,
+            "low_conf": low_conf,
+            "conf": conf,
+            "start": said.get("start"),
+            "end": said.get("end"),
+        })
+
+    correct = sum(1 for w in words if w["correct"])
+    total = len(target)
+    return {
+        "words": words,
+        "extra": extra,
+        "correct_count": correct,
+        "total": total,
+        "score": int((correct / total) * 100) if total > 0 else 0,
+        "wrong_words": [w["target"] for w in words if not w["correct"]],
+        "target": target,
+    }
@@ -0,0 +1,26 @@
+"""Ponto de entrada do container: comeca a carregar o modelo e sobe o Streamlit.
+
+O `streamlit run` so executa o app_core.py quando chega o primeiro visitante,
+entao o modelo Vosk so comecaria a carregar nesse momento. Aqui o
+carregamento comeca em background no mesmo processo, antes do servidor subir:
+quando o script do app roda, `import model_registry` pega o mesmo modulo (e o
+mesmo modelo) ja em andamento. Ao terminar, o model_registry cria
+MODEL_READY_FILE, que o HEALTHCHECK do Dockerfile usa para so liberar trafego
+depois do aquecimento.
+
+Uso (mesmos argumentos do `streamlit run`):
+    python serve.py --server.port=8501 --server.headless=true
+"""
+import os
+import sys
+
+from streamlit.web import cli as stcli
+
+import model_registry
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app_core.py")
+
+if __name__ == "__main__":
+    model_registry.preload(background=True)
+    sys.argv = ["streamlit", "run", APP, *sys.argv[1:]]
+    sys.exit(stcli.main())
@@ -0,0 +1,205 @@
+# sleep_mixer.py — Mixagem das sessoes do Neural Sleep no servidor
+#
+# A sessao antiga era so a concatenacao dos MP3 do TTS: sem pausa entre as
+# falas, e as ondas binaurais / som ambiente dependiam do navegador (JS e um
+# <audio> em loop separados). Aqui a sessao inteira e montada em PCM:
+#
+#   - cada fala (MP3 do audio_store) e decodificada com ffmpeg para PCM mono,
+#     sob demanda: so as proximas TTS_PRERENDER_WORKERS falas ficam
+#     decodificadas a frente da mixagem (memoria limitada em sessoes longas);
+#   - entre as falas entra silencio configuravel (SLEEP_GAP_PT_SECONDS depois
+#     do portugues, SLEEP_GAP_EN_SECONDS depois do ingles);
+#   - por baixo, a portadora binaural (esquerda = base, direita = base + batida
+#     do preset de BINAURAL_PRESETS) e o som ambiente em loop (com crossfade na
+#     emenda), tudo com operacoes vetorizadas do NumPy, bloco a bloco;
+#   - o resultado e codificado uma vez so (ffmpeg -> MP3), com os blocos indo
+#     direto para o stdin do ffmpeg e o MP3 direto para o arquivo: a sessao
+#     nunca fica inteira em memoria como BytesIO.
+
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+
+import config
+
+BLOCK_SECONDS = 2.0   # tamanho dos blocos enviados ao encoder
+FADE_SECONDS = 2.0    # entrada/saida suave da cama (binaural + ambiente)
+LOOP_FADE_SECONDS = 0.5
+
+
+def available() -> bool:
+    return shutil.which("ffmpeg") is not None
+
+
+# ---------------------------------------------------------------------------
+# Decodificacao
+# ---------------------------------------------------------------------------
+
+def decode(path: str, rate: int, channels: int = 1, max_seconds: Optional[float] = None) -> np.ndarray:
+    """PCM float32 em [-1, 1]: (n,) se mono, (n, channels) se nao."""
+    cmd = ["ffmpeg", "-v", "error", "-i", path]
+    if max_seconds:
+        cmd += ["-t", str(max_seconds)]
+    cmd += ["-ac", str(channels), "-ar", str(rate), "-f", "s16le", "-"]
+    raw = subprocess.run(cmd, check=True, capture_output=True, timeout=config.TTS_TIMEOUT).stdout
+    pcm = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    return pcm.reshape(-1, channels) if channels > 1 else pcm
+
+
+def decode_ahead(clips: list[tuple[str, float]], rate: int, depth: int) -> Iterator[tuple[np.ndarray, float]]:
+    """(fala decodificada, silencio depois) na ordem de `clips`, no maximo `depth` a frente."""
+    depth = max(1, depth)
+    pending: deque = deque()
+    with ThreadPoolExecutor(max_workers=depth, thread_name_prefix="sleep-decode") as pool:
+        try:
+            for path, gap in clips:
+                pending.append((pool.submit(decode, path, rate), gap))
+                if len(pending) > depth:
+                    fut, gap_ = pending.popleft()
+                    yield fut.result(), gap_
+            while pending:
+                fut, gap_ = pending.popleft()
+                yield fut.result(), gap_
+        finally:
+            for fut, _ in pending:  # consumidor parou (erro no encode): nao decodifica o resto
+                fut.cancel()
+
+
+def loop_buffer(pcm: np.ndarray, rate: int) -> np.ndarray:
+    """Buffer que emenda sem clique quando repetido (crossfade fim -> inicio)."""
+    n = min(int(LOOP_FADE_SECONDS * rate), len(pcm) // 4)
+    if n < 2:
+        return pcm
+    ramp = np.linspace(0.0, 1.0, n, dtype=np.float32)
+    if pcm.ndim > 1:
+        ramp = ramp[:, None]
+    out = pcm[:-n].copy()
+    out[:n] = pcm[:n] * ramp + pcm[-n:] * (1.0 - ramp)
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Mixagem
+# ---------------------------------------------------------------------------
+
+def render_blocks(segments: Iterable[tuple[np.ndarray, float]], rate: int,
+                  binaural_hz: Optional[float] = None,
+                  ambient: Optional[np.ndarray] = None) -> Iterator[np.ndarray]:
+    """Blocos int16 estereo intercalados (n, 2) da sessao mixada.
+
+    `segments` = (fala mono float32, silencio depois em s), consumido aos
+    poucos (pode ser um gerador). A cama (binaural + ambiente) usa o indice
+    absoluto da amostra, entao a fase e o loop continuam sem emenda entre
+    blocos. Para a saida suave da cama sem saber o tamanho total de antemao,
+    um bloco so sai quando ha pelo menos `fade` amostras depois dele (ou
+    quando as falas acabaram e o total ja e conhecido).
+    """
+    fade = max(1, int(FADE_SECONDS * rate))
+    block = int(BLOCK_SECONDS * rate)
+    base = config.SLEEP_BINAURAL_BASE_HZ
+    v_voice, v_bin, v_amb = config.SLEEP_VOICE_VOLUME, config.SLEEP_BINAURAL_VOLUME, config.SLEEP_AMBIENT_VOLUME
+
+    def timeline() -> Iterator[np.ndarray]:
+        for pcm, gap in segments:
+            for i in range(0, len(pcm), block):
+                yield pcm[i:i + block]
+            silence = int(gap * rate)
+            for i in range(0, silence, block):
+                yield np.zeros(min(block, silence - i), dtype=np.float32)
+
+    def mix(voice: np.ndarray, pos: int, total: Optional[int]) -> np.ndarray:
+        n = len(voice)
+        idx = pos + np.arange(n)
+        out = np.repeat((voice * v_voice)[:, None], 2, axis=1)
+
+        bed = np.zeros((n, 2), dtype=np.float32)
+        if binaural_hz:
+            t = idx / rate
+            bed[:, 0] += v_bin * np.sin(2 * np.pi * base * t)
+            bed[:, 1] += v_bin * np.sin(2 * np.pi * (base + binaural_hz) * t)
+        if ambient is not None and len(ambient):
+            bed += v_amb * ambient[idx % len(ambient)]
+        if binaural_hz or ambient is not None:
+            env = np.minimum(1.0, idx / fade)
+            if total is not None:
+                env = np.minimum(env, (total - 1 - idx) / fade)
+            out += bed * env.astype(np.float32)[:, None]
+        return (np.clip(out, -1.0, 1.0) * 32767).astype("<i2")
+
+    held: deque = deque()   # blocos de voz ainda sem `fade` amostras depois deles
+    held_n = pos = 0
+    for voice in timeline():
+        if not len(voice):
+            continue
+        held.append(voice)
+        held_n += len(voice)
+        while held and held_n - len(held[0]) >= fade:
+            voice = held.popleft()
+            held_n -= len(voice)
+            yield mix(voice, pos, None)
+            pos += len(voice)
+    total = pos + held_n
+    for voice in held:
+        yield mix(voice, pos, total)
+        pos += len(voice)
+
+
+def encode(blocks: Iterator[np.ndarray], rate: int, out_path: str) -> int:
+    """Codifica os blocos em MP3 (uma passada) direto em `out_path`. Retorna bytes."""
+    tmp = f"{out_path}.{os.getpid()}.tmp"
+    cmd = ["ffmpeg", "-v", "error", "-y", "-f", "s16le", "-ar", str(rate), "-ac", "2", "-i", "-",
+           "-f", "mp3", "-b:a", config.SLEEP_MP3_BITRATE, tmp]
+    # stderr vai para arquivo: um pipe que ninguem le enche e trava o ffmpeg
+    # (e a escrita no stdin junto) se ele reclamar demais durante a sessao
+    with tempfile.TemporaryFile() as err:
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=err)
+        try:
+            for b in blocks:
+                proc.stdin.write(b.tobytes())
+            proc.stdin.close()
+            if proc.wait(timeout=config.TTS_TIMEOUT) != 0:
+                err.seek(0)
+                raise RuntimeError(f"ffmpeg saiu com {proc.returncode}: {err.read().decode(errors='replace')[:200]}")
+            os.replace(tmp, out_path)
+            return os.path.getsize(out_path)
+        except BaseException:
+            proc.kill()
+            proc.wait()
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+
+def mix_session(clips: list[tuple[str, float]], out_path: str,
+                binaural_hz: Optional[float] = None,
+                ambient_path: Optional[str] = None) -> dict:
+    """Monta a sessao em `out_path`. `clips` = [(MP3 da fala, silencio depois em s)]."""
+    rate = config.SLEEP_MIX_RATE
+    t0 = time.perf_counter()
+    ambient = None
+    if ambient_path and os.path.exists(ambient_path):
+        ambient = loop_buffer(decode(ambient_path, rate, channels=2,
+                                     max_seconds=config.SLEEP_AMBIENT_MAX_SECONDS), rate)
+
+    samples = 0
+
+    def counted() -> Iterator[tuple[np.ndarray, float]]:
+        nonlocal samples
+        for pcm, gap in decode_ahead(clips, rate, config.TTS_PRERENDER_WORKERS):
+            samples += len(pcm) + int(gap * rate)
+            yield pcm, gap
+
+    size = encode(render_blocks(counted(), rate, binaural_hz, ambient), rate, out_path)
+    return {
+        "clips": len(clips),
+        "duration_s": round(samples / rate, 1),
+        "bytes": size,
+        "mix_ms": round((time.perf_counter() - t0) * 1000, 1),
+    }
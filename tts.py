@@ -0,0 +1,138 @@
+# tts.py — Sintese de voz (TTS) com backend configuravel
+#
+# Todo audio falado do app (frase de referencia da aula/prova/coach, palavra
+# errada em camera lenta, sessoes do Neural Sleep) passa por `synthesize()`:
+#
+#     synthesize(text, lang="en", rate=1.0, fmt="mp3") -> bytes
+#
+# O backend vem de config.TTS_BACKEND:
+#   - "gtts"   : Google Translate TTS (precisa de rede; `rate` < 1 = slow=True);
+#   - "espeak" : espeak-ng local via subprocess (offline, latencia limitada pela
+#                CPU); gera WAV e converte para MP3 com ffmpeg quando pedido.
+# Um backend novo (ex.: piper) e so uma subclasse de TTSBackend registrada em
+# BACKENDS.
+
+import shutil
+import subprocess
+import threading
+from typing import Optional
+
+import config
+
+# Velocidade usada para "camera lenta" (palavra errada, ingles do Neural Sleep)
+SLOW = 0.7
+
+
+class TTSError(RuntimeError):
+    """O backend de TTS nao conseguiu sintetizar o texto."""
+
+
+class TTSBackend:
+    name = ""
+    formats: tuple[str, ...] = ()
+
+    def available(self) -> bool:
+        return True
+
+    def synthesize(self, text: str, lang: str = "en", rate: float = 1.0, fmt: str = "mp3") -> bytes:
+        raise NotImplementedError
+
+
+class GTTSBackend(TTSBackend):
+    name = "gtts"
+    formats = ("mp3",)
+
+    def available(self) -> bool:
+        try:
+            import gtts  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def synthesize(self, text: str, lang: str = "en", rate: float = 1.0, fmt: str = "mp3") -> bytes:
+        from io import BytesIO
+        from gtts import gTTS
+
+        if fmt not in self.formats:
+            raise TTSError(f"gtts nao gera {fmt}")
+        buf = BytesIO()
+        try:
+            gTTS(text=text, lang=lang, slow=rate < 1.0).write_to_fp(buf)
+        except Exception as e:
+            raise TTSError(f"gtts: {e}") from e
+        return buf.getvalue()
+
+
+class EspeakBackend(TTSBackend):
+    name = "espeak"
+    formats = ("wav", "mp3")
+    # Vozes do espeak-ng por idioma do app
+    VOICES = {"en": "en-us", "pt": "pt-br"}
+    WPM = 160  # palavras por minuto em rate=1.0
+
+    def __init__(self, binary: Optional[str] = None):
+        self.binary = binary or config.TTS_ESPEAK_BIN
+
+    def available(self) -> bool:
+        return shutil.which(self.binary) is not None
+
+    def command(self, text: str, lang: str, rate: float) -> list[str]:
+        voice = self.VOICES.get(lang, lang)
+        return [self.binary, "-v", voice, "-s", str(max(80, int(self.WPM * rate))), "--stdout", text]
+
+    def synthesize(self, text: str, lang: str = "en", rate: float = 1.0, fmt: str = "mp3") -> bytes:
+        if fmt not in self.formats:
+            raise TTSError(f"espeak nao gera {fmt}")
+        wav = _run(self.command(text, lang, rate))
+        return wav if fmt == "wav" else wav_to_mp3(wav)
+
+
+BACKENDS: dict[str, type[TTSBackend]] = {
+    GTTSBackend.name: GTTSBackend,
+    EspeakBackend.name: EspeakBackend,
+}
+
+
+def _run(cmd: list[str], stdin: Optional[bytes] = None) -> bytes:
+    try:
+        proc = subprocess.run(cmd, input=stdin, capture_output=True, timeout=config.TTS_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise TTSError(f"{cmd[0]}: {e}") from e
+    if proc.returncode != 0 or not proc.stdout:
+        raise TTSError(f"{cmd[0]} saiu com {proc.returncode}: {proc.stderr.decode(errors='replace')[:200]}")
+    return proc.stdout
+
+
+def wav_to_mp3(wav: bytes) -> bytes:
+    if not shutil.which("ffmpeg"):
+        raise TTSError("ffmpeg nao encontrado para converter WAV em MP3")
+    return _run(["ffmpeg", "-v", "error", "-f", "wav", "-i", "-", "-f", "mp3", "-q:a", "4", "-"], stdin=wav)
+
+
+# ---------------------------------------------------------------------------
+# Backend do processo
+# ---------------------------------------------------------------------------
+
+_lock = threading.Lock()
+_backends: dict[str, TTSBackend] = {}
+
+
+def get_backend(name: Optional[str] = None) -> TTSBackend:
+    name = (name or config.TTS_BACKEND).lower()
+    with _lock:
+        backend = _backends.get(name)
+        if backend is None:
+            try:
+                backend = _backends[name] = BACKENDS[name]()
+            except KeyError:
+                raise TTSError(f"backend de TTS desconhecido: {name} (opcoes: {', '.join(BACKENDS)})")
+        return backend
+
+
+def synthesize(text: str, lang: str = "en", rate: float = 1.0, fmt: str = "mp3",
+               backend: Optional[str] = None) -> bytes:
+    """Audio de `text` no formato `fmt`. Levanta TTSError se a sintese falhar."""
+    text = str(text).strip()
+    if not text:
+        raise TTSError("texto vazio")
+    return get_backend(backend).synthesize(text, lang=lang, rate=rate, fmt=fmt)